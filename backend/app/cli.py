@@ -0,0 +1,251 @@
+import re
+from collections import defaultdict
+from datetime import timedelta
+from pathlib import Path
+import click
+from flask.cli import with_appcontext
+from . import db
+from .models.job import Job
+from .services.file_service import STATUS_TO_DIR, reshard_destination, reshard_job, shard_width, storage_root
+from .services.storage_backend import get_storage_backend
+from .services.metadata_service import export_sidecar, load_metadata
+from .models.job_metadata import JobMetadata
+from .services.submission_service import pending_submissions, process_submission
+from .services.compression_service import compress_cold_files, zstd_available
+from .services.archive_service import archive_finished_jobs, restore_job
+from .services.purge_service import PURGE_STATUSES, purge_after, purge_expired_jobs
+from .services.confirmation_service import sweep_confirmations
+
+
+def _companions_by_token(directory: Path, cache: dict) -> dict:
+    """Map filename tokens (split on _ . -) to names in directory; each directory is listed once."""
+    if directory not in cache:
+        index = defaultdict(list)
+        for name in get_storage_backend().listdir(directory):
+            for part in set(re.split(r'[_.\-]', name.lower())):
+                index[part].append(name)
+        cache[directory] = index
+    return cache[directory]
+
+
+@click.command('reshard-storage')
+@click.option('--width', type=int, default=None, help='Shard prefix length (default STORAGE_SHARDING; 0 flattens).')
+@click.option('--batch-size', type=int, default=200, show_default=True)
+@click.option('--dry-run', is_flag=True, help='Report how many jobs would move without touching files.')
+@with_appcontext
+def reshard_storage_command(width, batch_size, dry_run):
+    """Move job files into (or out of) shard subdirectories while the app keeps serving.
+
+    Each batch links files into place, commits the new paths, then removes the
+    old copies, so readers always find a job's file at its stored path. Safe to
+    re-run: jobs already in place are skipped.
+    """
+    width = shard_width() if width is None else max(0, width)
+    root = storage_root()
+    moved = 0
+    listings: dict = {}
+    last_id = ''
+    while True:
+        jobs = (Job.query.filter(Job.id > last_id, Job.status.in_(list(STATUS_TO_DIR)))
+                .order_by(Job.id).limit(batch_size).all())
+        if not jobs:
+            break
+        last_id = jobs[-1].id
+        stale: list[Path] = []
+        for job in jobs:
+            if dry_run:
+                moved += reshard_destination(job, root, width) is not None
+                continue
+            companions = []
+            if job.short_id and job.file_path:
+                tokens = _companions_by_token(Path(job.file_path).parent, listings)
+                companions = tokens.get(job.short_id.lower(), [])
+            old = reshard_job(job, root, width, companions)
+            if old:
+                moved += 1
+                stale.extend(old)
+        if dry_run:
+            continue
+        db.session.commit()
+        backend = get_storage_backend()
+        for path in stale:
+            try:
+                backend.delete(path)
+            except OSError:
+                pass
+        click.echo(f'... {moved} jobs moved')
+    verb = 'would move' if dry_run else 'moved'
+    click.echo(f'Resharded storage (width={width}): {verb} {moved} jobs.')
+
+
+@click.command('import-metadata')
+@click.option('--batch-size', type=int, default=500, show_default=True)
+@with_appcontext
+def import_metadata_command(batch_size):
+    """Load *_metadata.json sidecars into job_metadata for jobs that have no row yet.
+
+    Jobs are imported lazily on first access anyway; this backfills them up front.
+    """
+    imported = 0
+    last_id = ''
+    while True:
+        jobs = (Job.query.outerjoin(JobMetadata, JobMetadata.job_id == Job.id)
+                .filter(Job.id > last_id, JobMetadata.job_id.is_(None))
+                .order_by(Job.id).limit(batch_size).all())
+        if not jobs:
+            break
+        last_id = jobs[-1].id
+        for job in jobs:
+            load_metadata(job)
+        db.session.commit()
+        imported += len(jobs)
+        click.echo(f'... {imported} jobs imported')
+    click.echo(f'Imported metadata for {imported} jobs.')
+
+
+@click.command('export-metadata')
+@click.option('--job-id', default=None, help='Export a single job (default: every job).')
+@click.option('--batch-size', type=int, default=500, show_default=True)
+@with_appcontext
+def export_metadata_command(job_id, batch_size):
+    """Write job_metadata rows out to their *_metadata.json sidecars."""
+    exported = failed = 0
+    last_id = ''
+    while True:
+        query = Job.query.filter(Job.id > last_id)
+        if job_id:
+            query = query.filter(Job.id == job_id)
+        jobs = query.order_by(Job.id).limit(batch_size).all()
+        if not jobs:
+            break
+        last_id = jobs[-1].id
+        for job in jobs:
+            load_metadata(job)
+            if export_sidecar(job):
+                exported += 1
+            else:
+                failed += 1
+        db.session.commit()
+    click.echo(f'Exported metadata for {exported} jobs ({failed} failed).')
+
+
+@click.command('process-submissions')
+@click.option('--stale-minutes', type=int, default=15, show_default=True,
+              help='Only pick up submissions untouched for this long (the worker may still be on them).')
+@click.option('--include-failed', is_flag=True, help='Also retry submissions that failed.')
+@with_appcontext
+def process_submissions_command(stale_minutes, include_failed):
+    """Finish asynchronous submissions the worker never completed (e.g. after a worker restart)."""
+    counts: dict = defaultdict(int)
+    stale_after = timedelta(minutes=stale_minutes)
+    for submission in pending_submissions(stale_after, include_failed):
+        counts[process_submission(submission.id, reclaim_after=stale_after).status] += 1
+    summary = ', '.join(f'{n} {state.lower()}' for state, n in sorted(counts.items())) or 'nothing to do'
+    click.echo(f'Processed submissions: {summary}.')
+
+
+@click.command('compress-cold-files')
+@click.option('--codec', type=click.Choice(['gzip', 'zstd']), default=None, help='Default COLD_COMPRESSION.')
+@click.option('--age-days', type=float, default=None, help='Default COLD_COMPRESSION_AGE_DAYS.')
+@click.option('--batch-size', type=int, default=100, show_default=True)
+@click.option('--dry-run', is_flag=True, help='Report what would be compressed without touching files.')
+@with_appcontext
+def compress_cold_files_command(codec, age_days, batch_size, dry_run):
+    """Compress model files of Completed/PaidPickedUp jobs that have been idle past the cut-off.
+
+    Each batch writes the compressed copies, commits the new paths, then deletes
+    the originals. Safe to re-run: compressed files are skipped.
+    """
+    if codec == 'zstd' and not zstd_available():
+        raise click.UsageError('zstd needs the zstandard package')
+    summary = compress_cold_files(
+        codec=codec, age=timedelta(days=age_days) if age_days is not None else None, batch_size=batch_size,
+        dry_run=dry_run, progress=lambda n: click.echo(f'... {n} files compressed'),
+    )
+    if summary['codec'] is None:
+        click.echo('Cold compression is off (set COLD_COMPRESSION or pass --codec).')
+        return
+    verb = 'would compress' if dry_run else 'compressed'
+    saved = ''
+    if not dry_run and summary['bytes_before']:
+        saved = f", {summary['bytes_before']} -> {summary['bytes_after']} bytes"
+    click.echo(f"Cold compression ({summary['codec']}): {verb} {summary['compressed']} files, "
+               f"skipped {summary['skipped']}, failed {summary['failed']}{saved}.")
+
+
+@click.command('archive-jobs')
+@click.option('--days', type=float, default=None, help='Idle days before archiving (default ARCHIVE_AFTER_DAYS).')
+@click.option('--batch-size', type=int, default=500, show_default=True)
+@click.option('--dry-run', is_flag=True, help='Count the jobs that would be archived.')
+@with_appcontext
+def archive_jobs_command(days, batch_size, dry_run):
+    """Move PAIDPICKEDUP/REJECTED jobs, their events, payments and metadata into the archive tables.
+
+    Each batch is one transaction; safe to interrupt and re-run. Files are not moved.
+    """
+    totals = archive_finished_jobs(
+        age=timedelta(days=days) if days is not None else None, batch_size=batch_size, dry_run=dry_run,
+        progress=lambda t: click.echo(f"... {t['jobs']} jobs archived"),
+    )
+    if dry_run:
+        click.echo(f"Would archive {totals['jobs']} jobs.")
+    else:
+        click.echo(f"Archived {totals['jobs']} jobs, {totals['events']} events, {totals['payments']} payments.")
+
+
+@click.command('restore-job')
+@click.argument('job_id')
+@with_appcontext
+def restore_job_command(job_id):
+    """Move one archived job back into the live tables."""
+    if not restore_job(job_id):
+        raise click.ClickException(f'No archived job {job_id}')
+    click.echo(f'Restored job {job_id}.')
+
+
+@click.command('purge')
+@click.option('--days', type=float, default=None, help='Delete jobs last updated this long ago (default PURGE_AFTER_DAYS).')
+@click.option('--status', 'statuses', multiple=True, default=PURGE_STATUSES, show_default=True,
+              help='Statuses eligible for purging; repeat for several.')
+@click.option('--batch-size', type=int, default=500, show_default=True)
+@click.option('--dry-run', is_flag=True, help='Count the jobs that would be purged.')
+@with_appcontext
+def purge_command(days, statuses, batch_size, dry_run):
+    """Permanently delete expired jobs (live and archived) with their events, payments, metadata and files.
+
+    Works in short batches; safe to interrupt and re-run.
+    """
+    age = timedelta(days=days) if days is not None else purge_after()
+    if age is None:
+        raise click.UsageError('No retention period: pass --days or set PURGE_AFTER_DAYS')
+    totals = purge_expired_jobs(
+        age, statuses=statuses, batch_size=batch_size, dry_run=dry_run,
+        progress=lambda t: click.echo(
+            f"... {t['jobs']}/{t['expected']} jobs, {t['files']} files purged ({t['jobs_per_s']} jobs/s)"),
+    )
+    if dry_run:
+        click.echo(f"Would purge {totals['jobs']} jobs.")
+    else:
+        click.echo(f"Purged {totals['jobs']} jobs and {totals['files']} files in {totals['elapsed_s']}s.")
+
+
+@click.command('sweep-confirmations')
+@click.option('--batch-size', type=int, default=100, show_default=True, help='Reminders per worker task.')
+@with_appcontext
+def sweep_confirmations_command(batch_size):
+    """Mark PENDING jobs whose confirmation link lapsed as expired and send due reminders."""
+    summary = sweep_confirmations(batch_size=batch_size)
+    click.echo(f"Expired {summary['expired']} confirmations; reminders queued {summary['reminders_queued']}, "
+               f"sent {summary['reminders_sent']}.")
+
+
+def init_app(app):
+    app.cli.add_command(reshard_storage_command)
+    app.cli.add_command(import_metadata_command)
+    app.cli.add_command(export_metadata_command)
+    app.cli.add_command(process_submissions_command)
+    app.cli.add_command(compress_cold_files_command)
+    app.cli.add_command(archive_jobs_command)
+    app.cli.add_command(restore_job_command)
+    app.cli.add_command(purge_command)
+    app.cli.add_command(sweep_confirmations_command)
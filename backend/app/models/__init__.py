@@ -2,5 +2,8 @@ from .job import Job
 from .event import Event
 from .staff import Staff
 from .payment import Payment
+from .job_metadata import JobMetadata
+from .submission import Submission
+from .archive import JobArchive, EventArchive, PaymentArchive
 
-__all__ = ['Job', 'Event', 'Staff', 'Payment'] 
\ No newline at end of file
+__all__ = ['Job', 'Event', 'Staff', 'Payment', 'JobMetadata', 'Submission', 'JobArchive', 'EventArchive', 'PaymentArchive'] 
\ No newline at end of file
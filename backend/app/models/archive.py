@@ -0,0 +1,51 @@
+from app import db
+from datetime import timezone
+from .job import Job
+from .event import Event
+from .payment import Payment
+
+
+def _archive_table(name: str, live: db.Table, *extra: db.Column) -> db.Table:
+    """Same columns as the live table (so rows copy across with INSERT ... SELECT), minus
+    foreign keys, unique constraints and defaults: archived rows are only ever copied in."""
+    columns = [
+        db.Column(col.name, col.type, primary_key=col.primary_key, nullable=col.nullable, autoincrement=False)
+        for col in live.columns
+    ]
+    return db.Table(name, db.metadata, *columns, *extra)
+
+
+class JobArchive(db.Model):
+    """A finished job moved out of `job` by `flask archive-jobs`, with its metadata."""
+    __table__ = _archive_table(
+        'job_archive', Job.__table__,
+        db.Column('meta', db.JSON, nullable=True),
+        db.Column('archived_at', db.DateTime, nullable=False, index=True),
+    )
+
+    def to_dict(self):
+        # Same attributes as Job, so its serializer applies
+        data = Job.to_dict(self)
+        data['archived'] = True
+        data['archived_at'] = self.archived_at.replace(tzinfo=timezone.utc).isoformat()
+        return data
+
+
+class EventArchive(db.Model):
+    __table__ = _archive_table('event_archive', Event.__table__)
+
+    def to_dict(self):
+        return Event.to_dict(self)
+
+
+class PaymentArchive(db.Model):
+    __table__ = _archive_table('payment_archive', Payment.__table__)
+
+    def to_dict(self):
+        return Payment.to_dict(self)
+
+
+# Indexes the archive read API filters on
+db.Index('ix_job_archive_status', JobArchive.__table__.c.status)
+db.Index('ix_job_archive_student_email', JobArchive.__table__.c.student_email)
+db.Index('ix_event_archive_job_id', EventArchive.__table__.c.job_id)
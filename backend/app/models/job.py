@@ -3,6 +3,9 @@ from datetime import datetime, timezone
 import uuid
 
 class Job(db.Model):
+    # The confirmation sweep scans PENDING jobs by link expiry
+    __table_args__ = (db.Index('ix_job_status_confirm_token_expires', 'status', 'confirm_token_expires'),)
+
     id = db.Column(db.String, primary_key=True, default=lambda: uuid.uuid4().hex)
     short_id = db.Column(db.String(12), unique=True, index=True, nullable=True)
     student_name = db.Column(db.String(100), nullable=False)
@@ -24,6 +27,8 @@ class Job(db.Model):
     material = db.Column(db.String(32), nullable=False)
     weight_g = db.Column(db.Float, nullable=True)
     time_hours = db.Column(db.Float, nullable=True)
+    # Mesh measurements from the analysis worker (volume, bbox, watertightness, estimated weight)
+    analysis = db.Column(db.JSON, nullable=True)
     cost_usd = db.Column(db.Numeric(6, 2), nullable=True)
     
     # Student Confirmation
@@ -48,6 +53,7 @@ class Job(db.Model):
     # Relationships
     events = db.relationship('Event', backref='job', lazy=True, cascade='all, delete-orphan')
     payment = db.relationship('Payment', backref='job', uselist=False, cascade='all, delete-orphan')
+    meta_record = db.relationship('JobMetadata', backref='job', uselist=False, cascade='all, delete-orphan')
     
     def to_dict(self):
         return {
@@ -77,6 +83,7 @@ class Job(db.Model):
             'reject_reasons': self.reject_reasons,
             'last_updated_by': self.last_updated_by,
             'notes': self.notes,
+            'analysis': self.analysis,
             'created_at': self.created_at.replace(tzinfo=timezone.utc).isoformat(),
             'updated_at': self.updated_at.replace(tzinfo=timezone.utc).isoformat()
         } 
\ No newline at end of file
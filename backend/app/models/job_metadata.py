@@ -0,0 +1,20 @@
+from app import db
+from datetime import datetime
+
+class JobMetadata(db.Model):
+    """Per-job metadata (status snapshot, authoritative file history) formerly kept only in *_metadata.json."""
+    __tablename__ = 'job_metadata'
+
+    job_id = db.Column(db.String, db.ForeignKey('job.id'), primary_key=True)
+    data = db.Column(db.JSON, nullable=False, default=dict)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Last time the JSON sidecar was written from this row (None: never exported)
+    exported_at = db.Column(db.DateTime, nullable=True)
+
+    def to_dict(self):
+        return {
+            'job_id': self.job_id,
+            'data': self.data,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+            'exported_at': self.exported_at.isoformat() if self.exported_at else None,
+        }
@@ -0,0 +1,32 @@
+from app import db
+from datetime import datetime, timezone
+
+class Submission(db.Model):
+    """An accepted upload waiting for the worker to turn it into a job (SUBMIT_ASYNC)."""
+    __tablename__ = 'submission'
+
+    # Also the id the job is created with, so clients can be told it up front
+    id = db.Column(db.String, primary_key=True)
+    # QUEUED -> PROCESSING -> DONE | DUPLICATE | FAILED
+    status = db.Column(db.String(20), nullable=False, default='QUEUED', index=True)
+    form = db.Column(db.JSON, nullable=False, default=dict)
+    original_filename = db.Column(db.String(256), nullable=False)
+    incoming_path = db.Column(db.String(512), nullable=False)
+    job_id = db.Column(db.String, nullable=True)
+    existing_job_id = db.Column(db.String, nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'status': self.status,
+            'original_filename': self.original_filename,
+            'job_id': self.job_id,
+            'existing_job_id': self.existing_job_id,
+            'error': self.error,
+            'created_at': self.created_at.replace(tzinfo=timezone.utc).isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.replace(tzinfo=timezone.utc).isoformat() if self.updated_at else None,
+        }
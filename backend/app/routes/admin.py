@@ -3,129 +3,101 @@ from flask import Blueprint, jsonify, request, g, abort
 from app.utils.decorators import token_required
 from app import db
 from app.models.job import Job
+from app.models.archive import JobArchive
 from app.models.event import Event
-from app.services.file_service import STATUS_TO_DIR
+from app.services.file_service import storage_root as _storage_root
+from app.services.audit_service import perform_audit, save_cached_report, load_cached_report, patch_cached_report
+from app.services.queue_service import enqueue, fetch_job
+from app.services.storage_backend import get_storage_backend
+from app.services.storage_index import storage_usage
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 import os
-import json
-from datetime import datetime
 
 
 bp = Blueprint('admin', __name__, url_prefix='/api/v1/admin')
 
 
-def _safe_read_json(path: Path) -> dict:
-    try:
-        return json.loads(path.read_text(encoding='utf-8'))
-    except Exception:
-        return {}
+def _queue_audit(full: bool, integrity: bool):
+    """Enqueue an audit: (202 response, None), or (None, report) after running it inline without a queue."""
+    job = enqueue('app.tasks.run_audit_job', full, integrity, queue='audit', job_timeout=3600)
+    if job is None:
+        report = perform_audit(full=full, integrity=integrity)
+        save_cached_report(report)
+        return None, report
+    return jsonify({
+        'job_id': job.id,
+        'status': 'queued',
+        'status_url': f'/api/v1/admin/audit/jobs/{job.id}',
+    }), None
 
 
-def _storage_root() -> Path:
-    root = os.environ.get('STORAGE_PATH', 'storage')
-    return Path(root)
+@bp.route('/audit/report', methods=['GET'])
+@token_required
+def audit_report():
+    """Serve the last cached report with its age. ?refresh=true (or no cache yet) starts an audit on the
+    worker and returns 202 with its status URL; it only runs inline when no queue is available.
+    ?integrity=true also verifies file hashes.
+    """
+    refresh = request.args.get('refresh', 'false').lower() == 'true'
+    full = request.args.get('full', 'false').lower() == 'true'
+    integrity = request.args.get('integrity', 'false').lower() == 'true'
+    if not refresh and not full and not integrity:
+        cached = load_cached_report()
+        if cached is not None:
+            return jsonify(cached), 200
+    queued, report = _queue_audit(full, integrity)
+    if queued is not None:
+        return queued, 202
+    report['report_age_seconds'] = 0.0
+    return jsonify(report), 200
+
+
+@bp.route('/audit/run', methods=['POST'])
+@token_required
+def start_audit():
+    """Start an audit on the worker queue; runs inline when no queue is available."""
+    data = request.get_json(silent=True) or {}
+    queued, _ = _queue_audit(bool(data.get('full')), bool(data.get('integrity')))
+    if queued is None:
+        return jsonify({'job_id': None, 'status': 'finished', 'progress': 1.0}), 200
+    return queued, 202
 
 
-def _list_all_storage_files(root: Path) -> list[Path]:
-    files: list[Path] = []
-    for dirname in set(STATUS_TO_DIR.values()):
-        d = root / dirname
-        if not d.exists() or not d.is_dir():
-            continue
-        for p in d.iterdir():
-            if p.is_file():
-                files.append(p)
-    return files
-
-
-def _expected_dir_for_status(status: str) -> str:
-    return STATUS_TO_DIR.get(status, 'Uploaded')
-
-
-def perform_audit() -> dict:
-    root = _storage_root()
-    all_files = _list_all_storage_files(root)
-    all_files_set = {str(p.resolve()) for p in all_files}
-
-    # Collect known paths from DB
-    jobs: list[Job] = Job.query.all()
-    known_paths: set[str] = set()
-    for j in jobs:
-        if j.file_path:
-            known_paths.add(str(Path(j.file_path).resolve()))
-        if j.metadata_path:
-            known_paths.add(str(Path(j.metadata_path).resolve()))
-
-    # Orphans: files present on disk but not referenced in DB
-    orphaned_files: list[str] = sorted(p for p in all_files_set if p not in known_paths)
-
-    # Broken links: per job issues
-    broken_links: list[dict] = []
-    stale_files: set[str] = set()
-
-    # Index files by basename across all status dirs to detect duplicates
-    from collections import defaultdict
-    by_name: dict[str, list[Path]] = defaultdict(list)
-    for p in all_files:
-        by_name[p.name].append(p)
-
-    for j in jobs:
-        issues: list[str] = []
-        file_path = Path(j.file_path) if j.file_path else None
-        meta_path = Path(j.metadata_path) if j.metadata_path else None
-        # Existence
-        if file_path is None or not file_path.exists():
-            issues.append('file_missing')
-        if meta_path is None or not meta_path.exists():
-            issues.append('metadata_missing')
-
-        # Directory/status match
-        expected_dir = _expected_dir_for_status(j.status)
-        actual_dir = file_path.parent.name if file_path else None
-        if file_path and file_path.exists() and actual_dir != expected_dir:
-            issues.append('dir_status_mismatch')
-
-        # Metadata parity
-        if meta_path and meta_path.exists():
-            meta = _safe_read_json(meta_path)
-            if meta.get('status') != j.status or meta.get('file_path') != str(Path(j.file_path).resolve()):
-                issues.append('metadata_mismatch')
-
-        if issues:
-            broken_links.append({
-                'job_id': j.id,
-                'issues': issues,
-                'file_path': str(file_path) if file_path else None,
-                'metadata_path': str(meta_path) if meta_path else None,
-                'expected_dir': expected_dir,
-                'actual_dir': actual_dir,
-            })
-
-        # Stale duplicates of authoritative file/metadata in other status dirs
-        if file_path:
-            name = file_path.name
-            for p in by_name.get(name, []):
-                if str(p.resolve()) != str(file_path.resolve()):
-                    stale_files.add(str(p.resolve()))
-        if meta_path:
-            mname = meta_path.name
-            for p in by_name.get(mname, []):
-                if str(p.resolve()) != str(meta_path.resolve()):
-                    stale_files.add(str(p.resolve()))
-
-    report = {
-        'report_generated_at': datetime.utcnow().isoformat(),
-        'orphaned_files': orphaned_files,
-        'broken_links': broken_links,
-        'stale_files': sorted(stale_files),
+@bp.route('/audit/jobs/<job_id>', methods=['GET'])
+@token_required
+def audit_job_status(job_id):
+    job = fetch_job(job_id)
+    if job is None:
+        return jsonify({'message': 'Audit job not found'}), 404
+    status = job.get_status(refresh=True)
+    status = getattr(status, 'value', status)
+    payload = {
+        'job_id': job.id,
+        'status': status,
+        'progress': job.meta.get('progress', 1.0 if status == 'finished' else 0.0),
+        'stage': job.meta.get('stage'),
     }
-    return report
+    if status == 'finished':
+        payload['result'] = job.result
+    elif status == 'failed':
+        payload['error'] = 'Audit failed; see worker logs'
+    return jsonify(payload), 200
 
 
-@bp.route('/audit/report', methods=['GET'])
-@token_required
-def audit_report():
-    return jsonify(perform_audit()), 200
+def _within_root(target: Path, root: Path) -> bool:
+    return target != root and root in target.parents
+
+
+def _referenced_paths(keys: list[str]) -> set[str]:
+    """Which of these paths a live or archived job still points at (archived jobs keep their files)."""
+    refs = set()
+    for model in (Job, JobArchive):
+        rows = db.session.query(model.file_path, model.metadata_path).filter(
+            model.file_path.in_(keys) | model.metadata_path.in_(keys)
+        ).all()
+        refs.update(ref for row in rows for ref in row if ref in keys)
+    return refs
 
 
 @bp.route('/audit/orphaned-file', methods=['DELETE'])
@@ -139,18 +111,17 @@ def delete_orphaned_file():
     # Security: restrict deletions to STORAGE_PATH
     root = _storage_root().resolve()
     target = Path(file_path).resolve()
-    if not str(target).startswith(str(root)):
+    if not _within_root(target, root):
         return jsonify({'message': 'file_path must be within STORAGE_PATH'}), 400
     # Ensure not referenced by DB
-    ref = db.session.query(Job).filter((Job.file_path == str(target)) | (Job.metadata_path == str(target))).first()
-    if ref:
+    if _referenced_paths([str(target)]):
         return jsonify({'message': 'file is referenced by a job; not an orphan'}), 409
     try:
-        if target.exists() and target.is_file():
-            target.unlink()
+        get_storage_backend().delete(target)
     except Exception:
         abort(500, description='Failed to delete file')
     # Log event (system-level; no job)
+    patch_cached_report([str(target)])
     evt = Event(job_id='system', event_type='OrphanedFileDeleted', details={'file_path': str(target)}, triggered_by=staff_name, workstation_id=getattr(g, 'workstation_id', 'unknown'))
     db.session.add(evt)
     db.session.commit()
@@ -167,23 +138,99 @@ def delete_stale_file():
         return jsonify({'message': 'file_path and staff_name are required'}), 400
     root = _storage_root().resolve()
     target = Path(file_path).resolve()
-    if not str(target).startswith(str(root)):
+    if not _within_root(target, root):
         return jsonify({'message': 'file_path must be within STORAGE_PATH'}), 400
     # Ensure not authoritative reference by DB
-    ref = db.session.query(Job).filter((Job.file_path == str(target)) | (Job.metadata_path == str(target))).first()
-    if ref:
+    if _referenced_paths([str(target)]):
         return jsonify({'message': 'file is referenced by a job; cannot delete'}), 409
     try:
-        if target.exists() and target.is_file():
-            target.unlink()
+        get_storage_backend().delete(target)
     except Exception:
         abort(500, description='Failed to delete file')
+    patch_cached_report([str(target)])
     evt = Event(job_id='system', event_type='StaleFileDeleted', details={'file_path': str(target)}, triggered_by=staff_name, workstation_id=getattr(g, 'workstation_id', 'unknown'))
     db.session.add(evt)
     db.session.commit()
     return jsonify({'message': 'deleted'}), 200
 
 
+def _unlink_file(backend, target: Path) -> str:
+    try:
+        return 'deleted' if backend.delete(target) else 'missing'
+    except Exception:
+        return 'failed'
+
+
+@bp.route('/audit/cleanup', methods=['POST'])
+@token_required
+def batch_cleanup():
+    """Delete many orphaned/stale files in one call.
+    Body: { "file_paths": [...], "staff_name": "...", "kind": "orphaned" | "stale" }
+    """
+    data = request.get_json(silent=True) or {}
+    file_paths = data.get('file_paths')
+    staff_name = (data.get('staff_name') or '').strip()
+    kind = (data.get('kind') or 'orphaned').strip()
+    if not isinstance(file_paths, list) or not file_paths or not staff_name:
+        return jsonify({'message': 'file_paths (non-empty list) and staff_name are required'}), 400
+    if kind not in ('orphaned', 'stale'):
+        return jsonify({'message': 'kind must be orphaned or stale'}), 400
+    max_batch = int(os.environ.get('AUDIT_CLEANUP_MAX_BATCH', 10000))
+    if len(file_paths) > max_batch:
+        return jsonify({'message': f'at most {max_batch} file_paths per request'}), 400
+
+    # Security: restrict deletions to STORAGE_PATH
+    root = _storage_root().resolve()
+    rejected: list[dict] = []
+    targets: dict[str, Path] = {}
+    for raw in file_paths:
+        raw = str(raw or '').strip()
+        target = Path(raw).resolve() if raw else None
+        if target is None or not _within_root(target, root):
+            rejected.append({'file_path': raw, 'reason': 'outside_storage'})
+            continue
+        targets[str(target)] = target
+
+    # One query per table for every candidate: never delete files a job still references
+    if targets:
+        for ref in sorted(_referenced_paths(list(targets))):
+            del targets[ref]
+            rejected.append({'file_path': ref, 'reason': 'referenced'})
+
+    workers = max(1, int(os.environ.get('AUDIT_SCAN_WORKERS', 8)))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        backend = get_storage_backend()
+        outcomes = dict(zip(targets, pool.map(lambda t: _unlink_file(backend, t), targets.values())))
+    deleted = [p for p, outcome in outcomes.items() if outcome in ('deleted', 'missing')]
+    failed = [p for p, outcome in outcomes.items() if outcome == 'failed']
+
+    patch_cached_report(deleted)
+    evt = Event(
+        job_id='system',
+        event_type='OrphanedFilesDeleted' if kind == 'orphaned' else 'StaleFilesDeleted',
+        details={
+            'requested': len(file_paths),
+            'deleted': len(deleted),
+            'already_missing': sum(1 for o in outcomes.values() if o == 'missing'),
+            'rejected': len(rejected),
+            'failed': len(failed),
+            'file_paths': deleted,
+        },
+        triggered_by=staff_name,
+        workstation_id=getattr(g, 'workstation_id', 'unknown'),
+    )
+    db.session.add(evt)
+    db.session.commit()
+    return jsonify({'deleted': deleted, 'rejected': rejected, 'failed': failed}), 200
+
+
+@bp.route('/storage/usage', methods=['GET'])
+@token_required
+def get_storage_usage():
+    """File counts and bytes per status directory (from the live index when STORAGE_WATCH is on)."""
+    return jsonify(storage_usage()), 200
+
+
 @bp.route('/audit/mark-reviewed', methods=['POST'])
 @token_required
 def mark_reviewed():
@@ -1,5 +1,6 @@
 from flask import Blueprint
-from flask import jsonify
+from flask import jsonify, request
+from app.models.archive import EventArchive
 from app.models.event import Event
 from app.utils.decorators import token_required
 
@@ -10,5 +11,8 @@ bp = Blueprint('analytics', __name__, url_prefix='/api/v1/analytics')
 @bp.route('/events', methods=['GET'])
 @token_required
 def list_events():
+    """Live events; ?include_archived=true adds the events of archived jobs."""
     events = Event.query.all()
+    if request.args.get('include_archived', 'false').lower() == 'true':
+        events += EventArchive.query.all()
     return jsonify([e.to_dict() for e in events]), 200 
\ No newline at end of file
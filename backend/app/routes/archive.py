@@ -0,0 +1,64 @@
+from datetime import datetime
+from flask import Blueprint, jsonify, request
+from sqlalchemy import or_
+from app import db
+from app.models.archive import EventArchive, JobArchive, PaymentArchive
+from app.services.archive_service import restore_job
+from app.services.event_service import log_event
+from app.utils.decorators import token_required
+
+bp = Blueprint('archive', __name__, url_prefix='/api/v1/archive')
+
+MAX_PAGE_SIZE = 500
+
+
+@bp.route('/jobs', methods=['GET'])
+@token_required
+def list_archived_jobs():
+    """Archived jobs, newest first. Filters as GET /api/v1/jobs plus ?created_from=/created_to= (ISO dates);
+    paged with ?limit= (default 100) and ?offset=."""
+    query = JobArchive.query
+    for field in ('status', 'printer', 'discipline'):
+        value = request.args.get(field)
+        if value:
+            query = query.filter(getattr(JobArchive, field) == value)
+    search = (request.args.get('search') or '').strip()
+    if search:
+        pattern = f'%{search}%'
+        query = query.filter(or_(JobArchive.student_name.ilike(pattern), JobArchive.student_email.ilike(pattern)))
+    try:
+        if request.args.get('created_from'):
+            query = query.filter(JobArchive.created_at >= datetime.fromisoformat(request.args['created_from']))
+        if request.args.get('created_to'):
+            query = query.filter(JobArchive.created_at < datetime.fromisoformat(request.args['created_to']))
+        limit = min(max(int(request.args.get('limit', 100)), 1), MAX_PAGE_SIZE)
+        offset = max(int(request.args.get('offset', 0)), 0)
+    except ValueError:
+        return jsonify({'message': 'Invalid date or paging parameter'}), 400
+    total = query.count()
+    jobs = query.order_by(JobArchive.created_at.desc(), JobArchive.id).offset(offset).limit(limit).all()
+    return jsonify({'jobs': [job.to_dict() for job in jobs], 'total': total, 'limit': limit, 'offset': offset}), 200
+
+
+@bp.route('/jobs/<job_id>', methods=['GET'])
+@token_required
+def get_archived_job(job_id):
+    job = db.session.get(JobArchive, job_id)
+    if job is None:
+        return jsonify({'message': 'Archived job not found'}), 404
+    events = EventArchive.query.filter_by(job_id=job_id).order_by(EventArchive.timestamp).all()
+    payment = db.session.get(PaymentArchive, job_id)
+    data = job.to_dict()
+    data['events'] = [e.to_dict() for e in events]
+    data['payment'] = payment.to_dict() if payment else None
+    return jsonify(data), 200
+
+
+@bp.route('/jobs/<job_id>/restore', methods=['POST'])
+@token_required
+def restore_archived_job(job_id):
+    """Move an archived job back into the live tables (e.g. a disputed payment)."""
+    if not restore_job(job_id):
+        return jsonify({'message': 'Archived job not found'}), 404
+    log_event(job_id, 'JobRestoredFromArchive', {})
+    return jsonify({'message': 'restored', 'job_id': job_id}), 200
@@ -19,7 +19,7 @@ WORKSTATIONS = {
 }
 
 @bp.route('/login', methods=['POST'])
-@limiter.limit("10 per hour")
+@limiter.limit(lambda: current_app.config['LOGIN_RATE_LIMIT'])
 def login():
     data = request.get_json()
     if not data or not data.get('workstation_id') or not data.get('password'):
@@ -1,11 +1,13 @@
 from flask import Blueprint, jsonify, current_app, request
 from app.utils.decorators import token_required
-from app import db
+from app import db, sanitize_db_uri
 from sqlalchemy import text
 from sqlalchemy.exc import SQLAlchemyError
 from app.models.job import Job
+from app.models.archive import JobArchive
 from sqlalchemy import func
 from app.services.email_service import _is_email_configured, send_email
+from app.services.auth_service import token_cache_stats
 
 bp = Blueprint('diag', __name__, url_prefix='/api/v1/_diag')
 
@@ -18,22 +20,22 @@ def diagnostics():
         'db_url_sanitized': None,
         'migration_head': None,
         'job_counts_by_status': {},
+        'archived_job_count': None,
         'app_env': 'testing' if current_app.config.get('TESTING') else 'production-like',
         'email_configured': _is_email_configured(),
         'email_config': {
             'MAIL_SERVER': current_app.config.get('MAIL_SERVER'),
             'MAIL_USERNAME': '***SET***' if current_app.config.get('MAIL_USERNAME') else None,
             'MAIL_DEFAULT_SENDER': current_app.config.get('MAIL_DEFAULT_SENDER'),
-        }
+        },
+        'token_cache': token_cache_stats(),
+        'startup_timings': current_app.extensions.get('startup_timings', {}),
     }
 
     try:
         engine = db.engine
         info['db_engine'] = engine.name
-        uri = current_app.config.get('SQLALCHEMY_DATABASE_URI', '')
-        # sanitize credentials
-        import re
-        info['db_url_sanitized'] = re.sub(r'(://[^:/@]+):[^@]*@', r'\1:***@', uri)
+        info['db_url_sanitized'] = sanitize_db_uri(current_app.config.get('SQLALCHEMY_DATABASE_URI', ''))
     except Exception:
         pass
 
@@ -55,6 +57,10 @@ def diagnostics():
         info['job_counts_by_status'] = {status: int(count) for status, count in rows}
     except SQLAlchemyError:
         info['job_counts_by_status'] = {}
+    try:
+        info['archived_job_count'] = db.session.query(func.count(JobArchive.id)).scalar()
+    except SQLAlchemyError:
+        info['archived_job_count'] = None
 
     return jsonify(info), 200
 
@@ -1,21 +1,30 @@
 from flask import Blueprint
-from flask import request, jsonify, abort, g
+from flask import request, jsonify, abort, g, send_file, make_response, redirect
 from app import db
 from app.models.job import Job
 from app.utils.decorators import token_required
 from app.models.event import Event
 from app.models.payment import Payment
-from app.services.token_service import generate_confirmation_token
+from app.models.archive import JobArchive
+from app.services.confirmation_service import issue_confirmation
 from app.services.email_service import send_approval_email
 from app.services.event_service import log_event
-from app.models.staff import Staff
+from app.services.staff_service import is_active_staff
 from datetime import datetime
 import json
 import os
 from pathlib import Path
 import shutil
 from decimal import Decimal, ROUND_HALF_UP
-from app.services.file_service import move_authoritative
+from app.services.file_service import (
+    allowed_model_exts, ext_priority, find_candidate_files, logical_name, model_suffix, move_authoritative, storage_root,
+)
+from app.services.compression_service import codec_of, open_stored
+from app.services.storage_backend import get_storage_backend
+from app.services.mesh_service import MESH_EXTS, analyze_job
+from app.services.preview_service import delete_previews, preview_paths
+from app.services.metadata_service import export_sidecar, load_metadata, save_metadata, sidecar_mode
+from urllib.parse import quote
 
 bp = Blueprint('jobs', __name__, url_prefix='/api/v1/jobs')
 
@@ -44,18 +53,14 @@ def list_jobs():
 # --- Metadata helpers ---
 def _load_metadata(job: Job) -> dict:
     try:
-        with open(job.metadata_path, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        return load_metadata(job)
     except Exception:
         return {}
 
 
 def _save_metadata(job: Job, data: dict) -> None:
     try:
-        meta_path = Path(job.metadata_path)
-        meta_path.parent.mkdir(parents=True, exist_ok=True)
-        with open(meta_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2)
+        save_metadata(job, data)
     except Exception:
         # Non-fatal: metadata sync should not block workflow
         pass
@@ -92,15 +97,19 @@ def _sync_authoritative_metadata(job: Job, authoritative_filename: str, staff_na
         meta['updated_at'] = datetime.utcnow().isoformat()
         if changed:
             _save_metadata(job, meta)
+        # Transitions commit before syncing; persist the job_metadata row on its own
+        db.session.commit()
     except Exception:
         # Non-fatal
-        pass
+        db.session.rollback()
 
 @bp.route('/<job_id>', methods=['GET'])
 @token_required
 def get_job(job_id):
     job = Job.query.get(job_id)
     if not job:
+        if db.session.get(JobArchive, job_id) is not None:
+            return jsonify({'message': 'Job is archived', 'archive_url': f'/api/v1/archive/jobs/{job_id}'}), 404
         abort(404, description='Job not found')
     return jsonify(job.to_dict()), 200
 
@@ -114,6 +123,84 @@ def get_job_events(job_id):
     return jsonify([e.to_dict() for e in events]), 200
 
 
+@bp.route('/<job_id>/metadata', methods=['GET'])
+@token_required
+def get_job_metadata(job_id):
+    job = Job.query.get(job_id)
+    if not job:
+        abort(404, description='Job not found')
+    data = load_metadata(job)
+    db.session.commit()
+    record = job.meta_record
+    return jsonify({
+        'job_id': job.id,
+        'metadata': data,
+        'sidecar_mode': sidecar_mode(),
+        'updated_at': record.updated_at.isoformat() if record.updated_at else None,
+        'exported_at': record.exported_at.isoformat() if record.exported_at else None,
+    }), 200
+
+
+@bp.route('/<job_id>/metadata/export', methods=['POST'])
+@token_required
+def export_job_metadata(job_id):
+    """Write the job's metadata out to its JSON sidecar (for METADATA_SIDECAR_MODE=on_demand)."""
+    job = Job.query.get(job_id)
+    if not job:
+        abort(404, description='Job not found')
+    load_metadata(job)
+    path = export_sidecar(job)
+    db.session.commit()
+    if path is None:
+        return jsonify({'message': 'Failed to export metadata'}), 500
+    return jsonify({'metadata_path': path, 'exported_at': job.meta_record.exported_at.isoformat()}), 200
+
+
+@bp.route('/<job_id>/analyze', methods=['POST'])
+@token_required
+def analyze_job_file(job_id):
+    """Re-measure the job's current file (e.g. after staff picked a different authoritative file)."""
+    job = Job.query.get(job_id)
+    if not job:
+        abort(404, description='Job not found')
+    if model_suffix(job.file_path or '') not in MESH_EXTS:
+        return jsonify({'message': 'Only STL, OBJ and 3MF files can be analyzed'}), 400
+    result = analyze_job(job)
+    db.session.commit()
+    return jsonify(result), 200
+
+
+_PREVIEW_FILES = {'thumbnail.png': ('thumbnail', 'image/png'), 'mesh.bin': ('mesh', 'application/octet-stream')}
+
+
+@bp.route('/<job_id>/preview/<name>', methods=['GET'])
+@token_required
+def get_preview(job_id, name):
+    """Serve a job's thumbnail or preview mesh. Requests carrying the current ?v= version
+    are cacheable for a year: a new analysis changes the version and so the URL."""
+    if name not in _PREVIEW_FILES:
+        abort(404, description='Preview not found')
+    job = Job.query.get(job_id)
+    if not job:
+        abort(404, description='Job not found')
+    version = ((job.analysis or {}).get('preview') or {}).get('version')
+    kind, mimetype = _PREVIEW_FILES[name]
+    try:
+        data = get_storage_backend().read(preview_paths(job.id)[kind]) if version else None
+    except OSError:
+        data = None
+    if data is None:
+        return jsonify({'message': 'Preview not found'}), 404
+    resp = make_response(data)
+    resp.mimetype = mimetype
+    resp.set_etag(version)
+    if request.args.get('v') == version:
+        resp.headers['Cache-Control'] = 'private, max-age=31536000, immutable'
+    else:
+        resp.headers['Cache-Control'] = 'private, no-cache'
+    return resp.make_conditional(request)
+
+
 @bp.route('/<job_id>/candidate-files', methods=['GET'])
 @token_required
 def candidate_files(job_id):
@@ -122,19 +209,8 @@ def candidate_files(job_id):
         abort(404, description='Job not found')
 
     try:
-        file_path = Path(job.file_path)
-        directory = file_path.parent
-        # Allow configurable extensions via env (e.g., ".stl,.obj,.3mf,.form,.idea")
-        exts_env = os.environ.get('ALLOWED_MODEL_EXTS', '.stl,.obj,.3mf,.form,.idea')
-        allowed_exts = {
-            (ext if ext.strip().startswith('.') else f'.{ext.strip()}').lower()
-            for ext in exts_env.split(',') if ext.strip()
-        }
-        # Extension priority ranking (lower is better) via env, default prefers slicer project files
-        priority_env = os.environ.get('AUTHORITATIVE_EXT_PRIORITY', '.3mf,.form,.idea,.stl,.obj')
-        prio_list = [e if e.strip().startswith('.') else f'.{e.strip()}' for e in priority_env.split(',') if e.strip()]
-        ext_rank = {ext.lower(): idx for idx, ext in enumerate(prio_list)}
-        candidates = []
+        directory = Path(job.file_path).parent
+        ext_rank = ext_priority()
         # Build relevance tokens to restrict to this job only
         tokens = set()
         if getattr(job, 'short_id', None):
@@ -143,31 +219,15 @@ def candidate_files(job_id):
             tokens.add(str(job.id)[:8].lower())
         if getattr(job, 'display_name', None):
             tokens.add(Path(str(job.display_name)).stem.lower())
-
-        if directory.exists() and directory.is_dir():
-            for entry in directory.iterdir():
-                if not (entry.is_file() and entry.suffix.lower() in allowed_exts):
-                    continue
-                name_lower = entry.name.lower()
-                # Keep only files that look related to this job
-                related = any(tok and tok in name_lower for tok in tokens)
-                if not related:
-                    # Always allow exact original filename if present
-                    if job.original_filename and entry.name == job.original_filename:
-                        related = True
-                if not related:
-                    continue
-                try:
-                    stat = entry.stat()
-                    candidates.append({'name': entry.name, 'mtime': int(stat.st_mtime)})
-                except OSError:
-                    continue
+        # Always allow exact original filename if present
+        exact = [job.original_filename] if job.original_filename else []
+        candidates = find_candidate_files(directory, tokens, exact)
         # Ensure original filename is included (even if not present on disk)
         if job.original_filename and not any(c['name'] == job.original_filename for c in candidates):
             candidates.append({'name': job.original_filename, 'mtime': 0})
         # Sort by (rank asc if known, else large), then mtime desc
         def _rank(name: str) -> int:
-            return ext_rank.get(Path(name).suffix.lower(), len(ext_rank) + 1)
+            return ext_rank.get(model_suffix(name), len(ext_rank) + 1)
         candidates.sort(key=lambda x: (_rank(x['name']), -x['mtime'], x['name'].lower()))
         # Backward-compatible shape: 'files' is list of strings for legacy callers/tests
         files_strings = [c['name'] for c in candidates]
@@ -196,8 +256,7 @@ def log_file_open(job_id):
     staff_name = (data.get('staff_name') or '').strip() or None
     # Validate staff if provided; otherwise allow None to represent unknown
     if staff_name:
-        staff = Staff.query.get(staff_name)
-        if not staff or not staff.is_active:
+        if not is_active_staff(staff_name):
             # Ignore invalid names in stub; do not block logging
             staff_name = None
     evt = Event(
@@ -211,6 +270,76 @@ def log_file_open(job_id):
     db.session.commit()
     return jsonify({'message': 'logged'}), 200
 
+@bp.route('/<job_id>/file', methods=['GET'])
+@token_required
+def download_file(job_id):
+    """Serve the job's authoritative file with ETag/Last-Modified validation and Range support.
+
+    With FILE_ACCEL_REDIRECT_PREFIX set (e.g. "/protected-storage/"), the body is
+    left to the front proxy via X-Accel-Redirect; otherwise the file is streamed
+    through wsgi.file_wrapper, which gunicorn serves with sendfile().
+    """
+    job = Job.query.get(job_id)
+    if not job:
+        abort(404, description='Job not found')
+    root = storage_root().resolve()
+    path = Path(job.file_path).resolve() if job.file_path else None
+    backend = get_storage_backend()
+    sig = backend.stat(path) if path is not None and root in path.parents else None
+    if sig is None:
+        return jsonify({'message': 'File not found'}), 404
+    download_name = job.display_name or logical_name(path.name)
+
+    if codec_of(path) is not None:
+        # Cold-storage file: stream the original bytes as they are decompressed. Without seeking
+        # there are no Range responses, but revalidation still gets a 304
+        etag = f'{sig[0]:x}-{sig[1]:x}'
+        if request.if_none_match.contains(etag):
+            resp = make_response('', 304)
+            resp.set_etag(etag)
+            return resp
+        resp = send_file(
+            open_stored(path),
+            mimetype='application/octet-stream',
+            as_attachment=True,
+            download_name=download_name,
+            conditional=False,
+            etag=etag,
+            last_modified=sig[1] / 1e9,
+            max_age=0,
+        )
+        resp.headers['Accept-Ranges'] = 'none'
+        return resp
+
+    if not backend.is_local:
+        # Let the client fetch from the object store directly when it can sign URLs
+        url = backend.presigned_url(path, download_name)
+        if url:
+            return redirect(url, code=302)
+
+    accel_prefix = os.environ.get('FILE_ACCEL_REDIRECT_PREFIX')
+    if accel_prefix:
+        resp = make_response('', 200)
+        resp.headers['X-Accel-Redirect'] = accel_prefix.rstrip('/') + '/' + quote(path.relative_to(root).as_posix())
+        resp.headers['Content-Type'] = 'application/octet-stream'
+        resp.headers['Content-Disposition'] = f"attachment; filename*=UTF-8''{quote(download_name)}"
+        return resp
+
+    resp = send_file(
+        path if backend.is_local else backend.open(path),
+        mimetype='application/octet-stream',
+        as_attachment=True,
+        download_name=download_name,
+        conditional=True,
+        etag=True if backend.is_local else f'{sig[0]:x}-{sig[1]:x}',
+        last_modified=sig[1] / 1e9,
+        max_age=0,
+    )
+    # Werkzeug only advertises ranges on range responses; say so up front so clients can resume
+    resp.headers.setdefault('Accept-Ranges', 'bytes')
+    return resp
+
+
 @bp.route('/<job_id>', methods=['DELETE'])
 @token_required
 def delete_job(job_id):
@@ -221,6 +350,7 @@ def delete_job(job_id):
         return jsonify({'message': 'Job cannot be deleted in its current status'}), 403
     db.session.delete(job)
     db.session.commit()
+    delete_previews(job_id)
     return '', 204 
 
 
@@ -244,8 +374,7 @@ def approve_job(job_id):
     if not staff_name:
         return jsonify({'message': 'staff_name is required'}), 400
 
-    staff = Staff.query.get(staff_name)
-    if not staff or not staff.is_active:
+    if not is_active_staff(staff_name):
         return jsonify({'message': 'Invalid or inactive staff_name'}), 400
 
     # Validate numeric inputs
@@ -286,30 +415,23 @@ def approve_job(job_id):
         current_dir = Path(job.file_path).parent
         candidate_path = (current_dir / authoritative_filename)
         # Allowed extensions are driven by env
-        exts_env = os.environ.get('ALLOWED_MODEL_EXTS', '.stl,.obj,.3mf,.form,.idea')
-        allowed_exts = {
-            (ext if ext.strip().startswith('.') else f'.{ext.strip()}').lower()
-            for ext in exts_env.split(',') if ext.strip()
-        }
+        allowed_exts = allowed_model_exts()
         # Validate parent dir, extension, and existence
         if candidate_path.parent != current_dir:
             return jsonify({'message': 'authoritative_filename must be in the same directory as the current file'}), 400
-        if candidate_path.suffix.lower() not in allowed_exts:
+        if model_suffix(candidate_path) not in allowed_exts:
             return jsonify({'message': f'authoritative_filename has unsupported extension'}), 400
-        if not candidate_path.exists():
+        if not get_storage_backend().exists(candidate_path):
             return jsonify({'message': f'authoritative file not found: {authoritative_filename}'}), 400
         # Accept switch
         job.file_path = str(candidate_path.resolve())
-        job.display_name = authoritative_filename
+        job.display_name = logical_name(authoritative_filename)
     job.status = 'PENDING'
+    # Store the confirmation token and its expiry so the sweeper can expire/remind by index
+    confirmation_url = issue_confirmation(job)
     db.session.add(job)
     db.session.commit()
 
-    # Generate confirmation token and send email
-    token = generate_confirmation_token(job.id)
-    # Use frontend URL for confirmation link, fallback to host_url if not set
-    frontend_url = os.environ.get('FRONTEND_PUBLIC_URL', 'http://localhost:3000')
-    confirmation_url = f"{frontend_url}/confirm/{token}"
     send_approval_email(job, confirmation_url)
 
     # Log events with proper attribution (staff_name + workstation_id)
@@ -348,12 +470,37 @@ def _validate_staff_and_body(data):
     staff_name = data.get('staff_name')
     if not staff_name:
         return None, jsonify({'message': 'staff_name is required'}), 400
-    staff = Staff.query.get(staff_name)
-    if not staff or not staff.is_active:
+    if not is_active_staff(staff_name):
         return None, jsonify({'message': 'Invalid or inactive staff_name'}), 400
     return staff_name, None, None
 
 
+@bp.route('/<job_id>/resend-confirmation', methods=['POST'])
+@token_required
+def resend_confirmation(job_id):
+    """Issue a fresh confirmation link for a PENDING job (also revives an expired one) and email it."""
+    job = Job.query.get(job_id)
+    if not job:
+        abort(404, description='Job not found')
+    if job.status != 'PENDING':
+        return jsonify({'message': 'Job must be in PENDING to resend confirmation'}), 400
+    data = request.get_json(silent=True) or {}
+    staff_name, err_resp, err_code = _validate_staff_and_body(data)
+    if err_resp:
+        return err_resp, err_code
+    was_expired = bool(job.is_confirmation_expired)
+    confirmation_url = issue_confirmation(job)
+    job.last_updated_by = staff_name
+    db.session.add(job)
+    db.session.commit()
+    send_approval_email(job, confirmation_url)
+    evt = Event(job_id=job.id, event_type='ConfirmationResent', details={'was_expired': was_expired},
+                triggered_by=staff_name, workstation_id=g.workstation_id)
+    db.session.add(evt)
+    db.session.commit()
+    return jsonify(job.to_dict()), 200
+
+
 @bp.route('/<job_id>/mark-printing', methods=['POST'])
 @token_required
 def mark_printing(job_id):
@@ -502,8 +649,7 @@ def review_job(job_id):
     if staff_name is None:
         return jsonify({'message': 'staff_name is required'}), 400
 
-    staff = Staff.query.get(staff_name)
-    if not staff or not staff.is_active:
+    if not is_active_staff(staff_name):
         return jsonify({'message': 'Invalid or inactive staff_name'}), 400
 
     if not isinstance(reviewed, bool):
@@ -552,8 +698,7 @@ def reject_job(job_id):
 
     if not staff_name:
         return jsonify({'message': 'staff_name is required'}), 400
-    staff = Staff.query.get(staff_name)
-    if not staff or not staff.is_active:
+    if not is_active_staff(staff_name):
         return jsonify({'message': 'Invalid or inactive staff_name'}), 400
 
     # Normalize reasons
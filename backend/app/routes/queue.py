@@ -0,0 +1,12 @@
+from flask import Blueprint, jsonify, request
+from app.services.schedule_service import build_queue
+from app.utils.decorators import token_required
+
+bp = Blueprint('queue', __name__, url_prefix='/api/v1/queue')
+
+
+@bp.route('', methods=['GET'])
+@token_required
+def get_queue():
+    """Planned print order of READYTOPRINT jobs per printer model and unit; ?printer= limits to one model."""
+    return jsonify(build_queue(request.args.get('printer') or None)), 200
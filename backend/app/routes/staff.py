@@ -2,6 +2,7 @@ from flask import Blueprint, request, jsonify
 from app.utils.decorators import token_required
 from app.models.staff import Staff
 from app import db
+from app.services.staff_service import get_active_staff, invalidate_staff_cache
 from datetime import datetime
 
 bp = Blueprint('staff', __name__, url_prefix='/api/v1/staff')
@@ -11,10 +12,8 @@ bp = Blueprint('staff', __name__, url_prefix='/api/v1/staff')
 def list_staff():
     include_inactive = request.args.get('include_inactive', 'false').lower() == 'true'
     if include_inactive:
-        staff_list = Staff.query.all()
-    else:
-        staff_list = Staff.query.filter_by(is_active=True).all()
-    return jsonify({'staff': [s.to_dict() for s in staff_list]})
+        return jsonify({'staff': [s.to_dict() for s in Staff.query.all()]})
+    return jsonify({'staff': list(get_active_staff().values())})
 
 @bp.route('', methods=['POST'])
 @token_required
@@ -28,6 +27,7 @@ def add_staff():
     new_staff = Staff(name=name)
     db.session.add(new_staff)
     db.session.commit()
+    invalidate_staff_cache()
     return jsonify(new_staff.to_dict()), 201
 
 @bp.route('/<string:name>', methods=['PATCH'])
@@ -46,4 +46,5 @@ def update_staff(name):
     else:
         staff.deactivated_at = None
     db.session.commit()
+    invalidate_staff_cache()
     return jsonify(staff.to_dict())
\ No newline at end of file
@@ -1,14 +1,19 @@
-from flask import Blueprint, request, jsonify, abort
-from app import db
+from flask import Blueprint, request, jsonify, abort, current_app
+from app import db, limiter
 from app.models.job import Job
-import os, hashlib, json
+from app.models.submission import Submission
+import hashlib
 from datetime import datetime
-from uuid import uuid4
 from pathlib import Path
 from app.services.event_service import log_event
-from app.services.email_service import send_submission_confirmation_email, send_approval_email
 from app.services.token_service import generate_confirmation_token, verify_confirmation_token
 from app.services.file_service import move_authoritative
+from app.services.queue_service import get_queue
+from app.services.storage_backend import get_storage_backend
+from app.services.submission_service import (
+    accept_submission, create_job, find_duplicate, finish_job, process_submission, queue_submission,
+    submit_async_enabled,
+)
 from app.routes.jobs import _sync_authoritative_metadata
 
 bp = Blueprint('submit', __name__, url_prefix='/api/v1/submit')
@@ -21,22 +26,8 @@ def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
-def _normalize_name_for_filename(name: str) -> str:
-    # Remove non-alphanumerics, collapse spaces, PascalCase words
-    parts = [p for p in name.strip().replace('_', ' ').split() if p]
-    joined = ''.join(w.capitalize() for w in parts)
-    # Keep only alphanumerics
-    return ''.join(ch for ch in joined if ch.isalnum()) or 'Student'
-
-
-def _normalize_simple_label(value: str) -> str:
-    # Convert to TitleCase words and remove spaces
-    parts = [p for p in value.strip().replace('_', ' ').split() if p]
-    labeled = ''.join(w.capitalize() for w in parts)
-    return ''.join(ch for ch in labeled if ch.isalnum()) or 'Value'
-
-
 @bp.route('', methods=['POST'])
+@limiter.limit(lambda: current_app.config['SUBMIT_RATE_LIMIT'])
 def submit_job():
     try:
         # Validate file presence
@@ -50,114 +41,38 @@ def submit_job():
         if request.content_length and request.content_length > MAX_FILE_SIZE:
             return jsonify({'error': 'file too large'}), 413
 
+        if submit_async_enabled() and get_queue('submissions') is not None:
+            # Accept-then-process: only the upload is written here; the worker builds the job
+            submission = accept_submission(request.form, file.filename, file.stream)
+            if queue_submission(submission):
+                return jsonify({
+                    'id': submission.id,
+                    'status': submission.status,
+                    'status_url': f'/api/v1/submit/status/{submission.id}',
+                }), 202
+            # Enqueueing failed: finish it now (the upload is moved, not rewritten) and answer as
+            # the synchronous path would
+            submission = process_submission(submission.id)
+            if submission.status == 'DUPLICATE':
+                return jsonify({'message': 'duplicate active job exists', 'existing_job_id': submission.existing_job_id}), 409
+            if submission.status != 'DONE':
+                return jsonify({'error': submission.error or 'submission failed'}), 500
+            return jsonify(db.session.get(Job, submission.job_id).to_dict()), 201
+
         # Read file for hash and saving
         file_bytes = file.read()
         file_hash = hashlib.sha256(file_bytes).hexdigest()
 
         # Duplicate detection in active statuses
-        active_statuses = ['UPLOADED', 'PENDING', 'READYTOPRINT']
-        existing = Job.query.filter(
-            Job.file_hash == file_hash,
-            Job.student_email == request.form.get('student_email'),
-            Job.status.in_(active_statuses)
-        ).first()
+        existing = find_duplicate(file_hash, request.form.get('student_email'))
         if existing:
             return jsonify({'message': 'duplicate active job exists', 'existing_job_id': existing.id}), 409
 
-        # Prepare storage directory
-        # Use STORAGE_PATH root and ensure status subdir
-        storage_root = os.environ.get('STORAGE_PATH', 'storage')
-        storage_dir = os.path.join(storage_root, 'Uploaded')
-        os.makedirs(storage_dir, exist_ok=True)
-
-        # Generate job ID and standardized filenames
-        new_id = uuid4().hex
-        # Generate a human-friendly short id (ensure uniqueness by retrying with more chars if needed)
-        for length in (6, 7, 8, 9, 10, 11, 12):
-            candidate_short = new_id[:length]
-            if not Job.query.filter_by(short_id=candidate_short).first():
-                short_id = candidate_short
-                break
-        else:
-            short_id = new_id[:12]
-        ext = file.filename.rsplit('.', 1)[1].lower()
-        # Determine student name: prefer single field, else combine first/last
-        student_name = request.form.get('student_name')
-        if not student_name:
-            first_name = request.form.get('student_first_name')
-            last_name = request.form.get('student_last_name')
-            student_name = f"{first_name or ''} {last_name or ''}".strip()
-        normalized_student = _normalize_name_for_filename(student_name or 'Student')
-
-        # Derive print method/material and color
-        raw_method = request.form.get('material') or request.form.get('print_method') or ''
-        raw_color = request.form.get('color') or ''
-        normalized_method = _normalize_simple_label(raw_method or 'Method')
-        normalized_color = _normalize_simple_label(raw_color or 'Color')
-
-        # Short/simple Job ID
-        simple_id = short_id
-        standardized_base = f"{normalized_student}_{normalized_method}_{normalized_color}_{simple_id}"
-        standardized_name = f"{standardized_base}.{ext}"
-        file_path = os.path.join(storage_dir, standardized_name)
-
-        # Save file (ensure unique by appending counter if exists)
-        base_name = standardized_base
-        candidate_name = standardized_name
-        candidate_path = file_path
-        counter = 1
-        while os.path.exists(candidate_path):
-            candidate_name = f"{base_name}_{counter}.{ext}"
-            candidate_path = os.path.join(storage_dir, candidate_name)
-            counter += 1
-        with open(candidate_path, 'wb') as out_f:
-            out_f.write(file_bytes)
-
-        # Create metadata JSON
-        metadata = {
-            'student_name': student_name,
-            'student_email': request.form.get('student_email'),
-            'discipline': request.form.get('discipline'),
-            'class_number': request.form.get('class_number'),
-            'printer': request.form.get('printer'),
-            'color': raw_color,
-            'material': raw_method,
-            'status': 'UPLOADED',
-            'created_at': datetime.utcnow().isoformat()
-        }
-        metadata_base = base_name if counter == 1 else f"{base_name}_{counter-1}"
-        metadata_path = os.path.join(storage_dir, f"{metadata_base}_metadata.json")
-        with open(metadata_path, 'w') as meta_f:
-            json.dump(metadata, meta_f)
-
-        # Persist job record
-        job = Job(
-            id=new_id,
-            short_id=short_id,
-            student_name=student_name,
-            student_email=request.form.get('student_email'),
-            discipline=request.form.get('discipline'),
-            class_number=request.form.get('class_number'),
-            original_filename=file.filename,
-            display_name=candidate_name,
-            file_path=candidate_path,
-            metadata_path=metadata_path,
-            file_hash=file_hash,
-            printer=request.form.get('printer'),
-            color=raw_color,
-            material=raw_method
-        )
-        db.session.add(job)
+        # Large uploads go to object storage as multipart uploads
+        backend = get_storage_backend()
+        job = create_job(request.form, file.filename, file_hash, lambda dest: backend.write(dest, file_bytes))
         db.session.commit()
-
-        # Event logging
-        log_event(job.id, 'JobCreated', {'original_filename': job.original_filename})
-
-        # Fire-and-forget best-effort submission confirmation email
-        try:
-            send_submission_confirmation_email(job)
-        except Exception:
-            pass
+        finish_job(job)
 
         return jsonify(job.to_dict()), 201
     except Exception as e:
@@ -167,7 +82,22 @@ def submit_job():
         return jsonify({'error': str(e), 'traceback': tb}), 500 
 
 
+@bp.route('/status/<submission_id>', methods=['GET'])
+def submission_status(submission_id: str):
+    """Progress of an asynchronous submission; the id is the unguessable one returned with the 202."""
+    submission = db.session.get(Submission, submission_id)
+    if submission is None:
+        return jsonify({'message': 'Submission not found'}), 404
+    payload = submission.to_dict()
+    if submission.status == 'DONE':
+        job = db.session.get(Job, submission.job_id)
+        if job is not None:
+            payload['job'] = {'id': job.id, 'short_id': job.short_id, 'status': job.status}
+    return jsonify(payload), 200
+
+
 @bp.route('/confirm/<token>', methods=['POST'])
+@limiter.limit(lambda: current_app.config['CONFIRM_RATE_LIMIT'])
 def confirm_job(token: str):
     try:
         job_id = verify_confirmation_token(token)
@@ -181,8 +111,13 @@ def confirm_job(token: str):
     if not job:
         return jsonify({'message': 'Job not found'}), 404
 
+    if job.is_confirmation_expired:
+        # Marked by the expiry sweep; staff can resend a fresh link
+        return jsonify({'message': 'Confirmation link expired', 'reason': 'expired'}), 410
+
     # Transition to READYTOPRINT + move file/metadata
     job.student_confirmed = True
+    job.student_confirmed_at = datetime.utcnow()
     job.status = 'READYTOPRINT'
     move_authoritative(job, 'READYTOPRINT')
     db.session.commit()
@@ -6,6 +6,7 @@ from .models.event import Event
 from datetime import datetime
 import uuid
 from . import db
+from .services.staff_service import invalidate_staff_cache
 
 @click.command('seed-data')
 @with_appcontext
@@ -23,6 +24,7 @@ def seed_data_command():
 
     db.session.bulk_save_objects(staff_members)
     db.session.commit()
+    invalidate_staff_cache()
     click.echo('Seeded staff table.')
 
 @click.command('seed-demo-jobs')
@@ -0,0 +1,124 @@
+"""Moving finished jobs (with their events, payment and metadata) into archive tables.
+
+`job`, `event` and `payment` keep only live history; everything older than
+ARCHIVE_AFTER_DAYS in a final status lives in job_archive / event_archive /
+payment_archive. Rows move with set-based INSERT ... SELECT and DELETE, one
+transaction per batch, so a batch is either fully live or fully archived.
+Files stay where they are; the archived job row still points at them.
+"""
+from __future__ import annotations
+import os
+from datetime import datetime, timedelta
+from typing import Callable, Iterable, Optional
+import sqlalchemy as sa
+from app import db
+from app.models.archive import EventArchive, JobArchive, PaymentArchive
+from app.models.event import Event
+from app.models.job import Job
+from app.models.job_metadata import JobMetadata
+from app.models.payment import Payment
+
+ARCHIVE_STATUSES = ('PAIDPICKEDUP', 'REJECTED')
+
+
+def archive_after() -> timedelta:
+    """ARCHIVE_AFTER_DAYS: idle time before a finished job is archived (default 365)."""
+    try:
+        return timedelta(days=max(0.0, float(os.environ.get('ARCHIVE_AFTER_DAYS', 365))))
+    except ValueError:
+        return timedelta(days=365)
+
+
+def _columns(table: sa.Table) -> list[str]:
+    return [col.name for col in table.columns]
+
+
+def _move(live: sa.Table, archive: sa.Table, key: sa.Column, ids: list[str]) -> int:
+    """Copy the live rows whose key is in ids into the archive table, then delete them."""
+    names = _columns(live)
+    db.session.execute(sa.insert(archive).from_select(names, sa.select(*[live.c[n] for n in names]).where(key.in_(ids))))
+    return db.session.execute(sa.delete(live).where(key.in_(ids))).rowcount or 0
+
+
+def archive_jobs(ids: list[str]) -> dict:
+    """Archive these jobs with their events, payments and metadata in one transaction."""
+    if not ids:
+        return {'jobs': 0, 'events': 0, 'payments': 0}
+    job, meta = Job.__table__, JobMetadata.__table__
+    names = _columns(job)
+    select_jobs = (sa.select(*[job.c[n] for n in names], meta.c.data, sa.literal(datetime.utcnow(), sa.DateTime))
+                   .select_from(job.outerjoin(meta, meta.c.job_id == job.c.id))
+                   .where(job.c.id.in_(ids)))
+    try:
+        db.session.execute(sa.insert(JobArchive.__table__).from_select(names + ['meta', 'archived_at'], select_jobs))
+        events = _move(Event.__table__, EventArchive.__table__, Event.__table__.c.job_id, ids)
+        payments = _move(Payment.__table__, PaymentArchive.__table__, Payment.__table__.c.job_id, ids)
+        db.session.execute(sa.delete(meta).where(meta.c.job_id.in_(ids)))
+        jobs = db.session.execute(sa.delete(job).where(job.c.id.in_(ids))).rowcount or 0
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    # Rows changed underneath any loaded ORM objects
+    db.session.expire_all()
+    return {'jobs': jobs, 'events': events, 'payments': payments}
+
+
+def archivable_job_ids(age: timedelta, limit: int, after_id: str = '') -> list[str]:
+    cutoff = datetime.utcnow() - age
+    rows = (db.session.query(Job.id)
+            .filter(Job.status.in_(ARCHIVE_STATUSES), Job.updated_at < cutoff, Job.id > after_id)
+            .order_by(Job.id).limit(limit).all())
+    return [row[0] for row in rows]
+
+
+def archive_finished_jobs(age: Optional[timedelta] = None, batch_size: int = 500, dry_run: bool = False,
+                          progress: Optional[Callable[[dict], None]] = None) -> dict:
+    """Archive every finished job idle for longer than age (default ARCHIVE_AFTER_DAYS), batch by batch."""
+    age = archive_after() if age is None else age
+    totals = {'jobs': 0, 'events': 0, 'payments': 0}
+    last_id = ''
+    while True:
+        ids = archivable_job_ids(age, batch_size, last_id)
+        if not ids:
+            break
+        last_id = ids[-1]
+        if dry_run:
+            totals['jobs'] += len(ids)
+            continue
+        for key, n in archive_jobs(ids).items():
+            totals[key] += n
+        if progress is not None:
+            progress(totals)
+    return totals
+
+
+def restore_job(job_id: str) -> bool:
+    """Move an archived job (and its events, payment and metadata) back into the live tables."""
+    archived = db.session.get(JobArchive, job_id)
+    if archived is None:
+        return False
+    job, events, payments = Job.__table__, Event.__table__, Payment.__table__
+    names = _columns(job)
+    try:
+        db.session.execute(sa.insert(job).from_select(
+            names, sa.select(*[JobArchive.__table__.c[n] for n in names]).where(JobArchive.__table__.c.id == job_id)))
+        if archived.meta is not None:
+            db.session.add(JobMetadata(job_id=job_id, data=archived.meta))
+        for live, archive in ((events, EventArchive.__table__), (payments, PaymentArchive.__table__)):
+            cols = _columns(live)
+            db.session.execute(sa.insert(live).from_select(
+                cols, sa.select(*[archive.c[n] for n in cols]).where(archive.c.job_id == job_id)))
+            db.session.execute(sa.delete(archive).where(archive.c.job_id == job_id))
+        db.session.execute(sa.delete(JobArchive.__table__).where(JobArchive.__table__.c.id == job_id))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    db.session.expire_all()
+    return True
+
+
+def archived_paths() -> Iterable[tuple[Optional[str], Optional[str]]]:
+    """(file_path, metadata_path) of archived jobs, so their files are not reported as orphans."""
+    return db.session.query(JobArchive.file_path, JobArchive.metadata_path).all()
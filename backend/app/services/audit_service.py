@@ -0,0 +1,476 @@
+from __future__ import annotations
+import hashlib
+import json
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+import threading
+from typing import Callable, Optional
+from app import db
+from app.models.job import Job
+from app.services.archive_service import archived_paths
+from app.services.compression_service import decompressing_reader
+from app.services.file_service import STATUS_TO_DIR, model_suffix, status_dirname_of, storage_root
+from app.services.metadata_service import flush_pending_writes, sidecar_mode
+from app.services.storage_backend import StorageBackend, get_storage_backend
+from app.services.storage_index import get_storage_index, scan_dir as _scan_dir
+
+
+SNAPSHOT_VERSION = 2
+
+
+def _scan_workers() -> int:
+    """Concurrent directory/metadata readers; scans are latency-bound on network storage."""
+    return max(1, int(os.environ.get('AUDIT_SCAN_WORKERS', 8)))
+
+
+def snapshot_path(root: Path) -> Path:
+    """Location of the persisted audit snapshot (outside the status directories)."""
+    return Path(os.environ.get('AUDIT_SNAPSHOT_PATH', str(root / '.audit' / 'snapshot.json')))
+
+
+def load_snapshot(root: Path) -> dict:
+    try:
+        data = json.loads(snapshot_path(root).read_text(encoding='utf-8'))
+    except Exception:
+        return {}
+    if data.get('version') != SNAPSHOT_VERSION or data.get('root') != str(root):
+        return {}
+    return data
+
+
+def write_json_atomic(path: Path, data: dict) -> None:
+    """Write JSON to a temp file in the same directory, then swap it into place."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f'.{path.name}.{os.getpid()}.tmp')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def save_snapshot(root: Path, snapshot: dict) -> None:
+    try:
+        write_json_atomic(snapshot_path(root), snapshot)
+    except OSError:
+        # Non-fatal: the next audit simply rescans everything
+        pass
+
+
+def report_cache_path(root: Path) -> Path:
+    return snapshot_path(root).with_name('last_report.json')
+
+
+_report_lock = threading.Lock()
+
+
+def save_cached_report(report: dict) -> None:
+    """Persist the latest report so GET /audit/report can serve it without rescanning."""
+    try:
+        write_json_atomic(report_cache_path(storage_root().resolve()), report)
+    except OSError:
+        pass
+
+
+def load_cached_report() -> Optional[dict]:
+    """Return the cached report with its age in seconds, or None if there is none."""
+    try:
+        report = json.loads(report_cache_path(storage_root().resolve()).read_text(encoding='utf-8'))
+        generated = datetime.fromisoformat(report['report_generated_at'])
+    except Exception:
+        return None
+    report['report_age_seconds'] = round((datetime.utcnow() - generated).total_seconds(), 1)
+    return report
+
+
+def patch_cached_report(removed_paths: list[str]) -> None:
+    """Drop deleted files from the cached report instead of forcing a full re-scan."""
+    if not removed_paths:
+        return
+    removed = set(removed_paths)
+    with _report_lock:
+        report = load_cached_report()
+        if report is None:
+            return
+        report.pop('report_age_seconds', None)
+        report['orphaned_files'] = [p for p in report.get('orphaned_files', []) if p not in removed]
+        report['stale_files'] = [p for p in report.get('stale_files', []) if p not in removed]
+        report['report_patched_at'] = datetime.utcnow().isoformat()
+        save_cached_report(report)
+
+
+class _PathResolver:
+    """Resolve paths once per parent directory instead of once per file."""
+
+    def __init__(self):
+        self._parents: dict[str, str] = {}
+
+    def __call__(self, path: str) -> str:
+        parent, name = os.path.split(path)
+        resolved = self._parents.get(parent)
+        if resolved is None:
+            resolved = str(Path(parent or '.').resolve())
+            self._parents[parent] = resolved
+        return os.path.join(resolved, name)
+
+
+def _probe_metadata(path: str, sig: Optional[list[int]], previous: Optional[dict],
+                    backend: StorageBackend) -> tuple[Optional[list[int]], Optional[dict], bool]:
+    """Stat (when sig is None) and parse a metadata file, reusing the previous parse if unchanged.
+
+    Returns (sig, fields, parsed) where fields holds the audit-relevant keys.
+    """
+    if sig is None:
+        sig = backend.stat(path)
+        if sig is None:
+            return None, None, False
+    if previous and [previous.get('size'), previous.get('mtime_ns')] == sig:
+        return sig, previous, False
+    try:
+        meta = json.loads(backend.read(path))
+    except Exception:
+        meta = {}
+    return sig, {'size': sig[0], 'mtime_ns': sig[1], 'status': meta.get('status'), 'file_path': meta.get('file_path')}, True
+
+
+def _hash_workers() -> int:
+    return max(1, int(os.environ.get('AUDIT_HASH_WORKERS', os.cpu_count() or 1)))
+
+
+def _sha256(stream) -> str:
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: stream.read(1024 * 1024), b''):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def hash_file(path: str) -> tuple[str, Optional[str]]:
+    """Return (path, sha256 hex) or (path, None) if unreadable. Top-level so process pools can pickle it."""
+    try:
+        # Cold-storage files are hashed as their original bytes
+        with decompressing_reader(open(path, 'rb'), path) as f:
+            return path, _sha256(f)
+    except (OSError, EOFError):
+        return path, None
+
+
+def _hash_object(backend: StorageBackend, path: str) -> tuple[str, Optional[str]]:
+    try:
+        body = decompressing_reader(backend.open(path), path)
+    except Exception:
+        return path, None
+    try:
+        return path, _sha256(body)
+    except Exception:
+        return path, None
+    finally:
+        body.close()
+
+
+def _verify_integrity(candidates: list[tuple], signature, previous: dict, stats: dict,
+                      backend: StorageBackend) -> tuple[list[dict], dict]:
+    """Compare files on disk with Job.file_hash, re-hashing only files whose size/mtime changed.
+
+    candidates are (job_id, file_path, file_hash) for jobs whose current file is
+    still the submitted model. Returns (issues, hash cache for the snapshot).
+    """
+    hashes: dict[str, list] = {}
+    to_hash: list[str] = []
+    for _, file_path, _ in candidates:
+        sig = signature(file_path)
+        if sig is None or file_path in hashes:
+            continue
+        cached = previous.get(file_path)
+        if cached and cached[:2] == sig:
+            hashes[file_path] = cached
+            stats['hashes_reused'] += 1
+        else:
+            hashes[file_path] = sig + [None]
+            to_hash.append(file_path)
+
+    if to_hash:
+        workers = min(_hash_workers(), len(to_hash))
+        if not backend.is_local:
+            # Object reads are network-bound: threads overlap them without pickling the client
+            pool = ThreadPoolExecutor(max_workers=workers)
+            results = pool.map(lambda p: _hash_object(backend, p), to_hash)
+        elif workers == 1:
+            pool = None
+            results = map(hash_file, to_hash)
+        else:
+            pool = ProcessPoolExecutor(max_workers=workers)
+            results = pool.map(hash_file, to_hash, chunksize=max(1, len(to_hash) // (workers * 4)))
+        for path, digest in results:
+            hashes[path][2] = digest
+        if pool is not None:
+            pool.shutdown()
+        stats['hashes_computed'] += len(to_hash)
+
+    issues: list[dict] = []
+    for job_id, file_path, expected in candidates:
+        entry = hashes.get(file_path)
+        if entry is None:
+            continue  # missing files are already reported as file_missing
+        size, _, actual = entry
+        if actual is None:
+            issue = 'unreadable'
+        elif size == 0:
+            issue = 'empty_file'
+        elif actual != expected:
+            issue = 'hash_mismatch'
+        else:
+            continue
+        issues.append({'job_id': job_id, 'file_path': file_path, 'issue': issue,
+                       'expected_sha256': expected, 'actual_sha256': actual})
+    return issues, {p: e for p, e in hashes.items() if e[2] is not None}
+
+
+def perform_audit(full: bool = False, progress: Optional[Callable[[float, str], None]] = None,
+                  integrity: bool = False) -> dict:
+    """Compare storage against the job table and report orphaned, broken and stale files.
+
+    Directory listings, parsed metadata and per-job results are persisted in a
+    snapshot so later runs only re-examine what changed. Pass full=True to
+    ignore the snapshot. progress, if given, is called with (fraction, stage).
+    With integrity=True, model files are also checked against Job.file_hash.
+    """
+    def report_progress(fraction: float, stage: str) -> None:
+        if progress is not None:
+            progress(fraction, stage)
+
+    started = time.perf_counter()
+    # Sidecar updates still held by the write-behind buffer would read as mismatches
+    flush_pending_writes()
+    root = storage_root().resolve()
+    backend = get_storage_backend()
+    previous = {} if full else load_snapshot(root)
+    prev_dirs = previous.get('dirs', {})
+    stats = defaultdict(int)
+    workers = _scan_workers()
+    stats['scan_workers'] = workers
+    report_progress(0.0, 'scan')
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        # Index every file in the status directories and their shard subdirectories
+        # (STORAGE_SHARDING): resolved path -> [size, mtime_ns]
+        dirs: dict[str, dict] = {}
+        index: dict[str, list[int]] = {}
+        reused_dirs: set[str] = set()
+        live = get_storage_index()
+        if not backend.is_local:
+            # Object storage: one recursive listing per status prefix, grouped back into directories
+            prefixes = sorted(set(STATUS_TO_DIR.values()))
+            for dirname, files in zip(prefixes, pool.map(lambda d: backend.walk(root / d), prefixes)):
+                for rel, sig in files.items():
+                    sub, _, name = rel.rpartition('/')
+                    key = f'{dirname}/{sub}' if sub else dirname
+                    dirs.setdefault(key, {'mtime_ns': None, 'racy': True, 'files': {}, 'subdirs': []})['files'][name] = sig
+                    index[os.path.join(str(root / key), name)] = sig
+            stats['dirs_scanned'] += len(dirs)
+        elif live is not None:
+            # The watcher already holds current listings; only metadata/hashes need re-stat'ing
+            for dirname, listing in live.listings().items():
+                dirs[dirname] = listing
+                base = str(root / dirname)
+                stats['dirs_from_index'] += 1
+                reused_dirs.add(base)
+                for name, sig in listing['files'].items():
+                    index[os.path.join(base, name)] = sig
+        dirnames = sorted(set(STATUS_TO_DIR.values())) if backend.is_local and live is None else []
+        while dirnames:
+            subdirnames: list[str] = []
+            for dirname, (listing, reused) in zip(
+                dirnames, pool.map(lambda d: _scan_dir(root / d, prev_dirs.get(d)), dirnames)
+            ):
+                if listing is None:
+                    continue
+                dirs[dirname] = listing
+                base = str(root / dirname)
+                stats['dirs_reused' if reused else 'dirs_scanned'] += 1
+                if reused:
+                    reused_dirs.add(base)
+                for name, sig in listing['files'].items():
+                    index[os.path.join(base, name)] = sig
+                if '/' not in dirname:
+                    subdirnames.extend(f'{dirname}/{sub}' for sub in listing.get('subdirs', []))
+            dirnames = subdirnames
+        stats['files'] = len(index)
+        stats['scan_ms'] = round((time.perf_counter() - started) * 1000, 1)
+        report_progress(0.3, 'metadata')
+
+        resolve = _PathResolver()
+        indexed_dirs = {str(root / d) for d in dirs}
+
+        def signature(path: Optional[str]) -> Optional[list[int]]:
+            """[size, mtime_ns] from the index, or a direct stat for paths outside it; None if missing."""
+            if not path:
+                return None
+            if os.path.dirname(path) in indexed_dirs:
+                return index.get(path)
+            return backend.stat(path)
+
+        # Only the columns the audit needs; avoids hydrating full Job objects
+        phase = time.perf_counter()
+        rows = db.session.query(
+            Job.id, Job.status, Job.file_path, Job.metadata_path, Job.updated_at,
+            Job.file_hash, Job.original_filename,
+        ).all()
+        stats['db_ms'] = round((time.perf_counter() - phase) * 1000, 1)
+
+        phase = time.perf_counter()
+        resolved_rows = []
+        integrity_candidates: list[tuple] = []
+        for job_id, status, raw_file, raw_meta, updated_at, file_hash, original_filename in rows:
+            file_path = resolve(raw_file) if raw_file else None
+            meta_path = resolve(raw_meta) if raw_meta else None
+            resolved_rows.append((job_id, status, raw_file, raw_meta, updated_at, file_path, meta_path))
+            # file_hash is taken at submission; a staff-selected slicer project (.3mf/.form/...) legitimately differs
+            if (integrity and file_hash and file_path and original_filename
+                    and model_suffix(file_path) == Path(original_filename).suffix.lower()):
+                integrity_candidates.append((job_id, file_path, file_hash))
+
+        # Metadata is rewritten in place, which does not bump the directory mtime:
+        # re-stat it when its listing was reused, and reparse only what changed.
+        prev_meta = previous.get('metadata', {})
+
+        def probe(meta_path: str):
+            parent = os.path.dirname(meta_path)
+            if parent in indexed_dirs and parent not in reused_dirs:
+                sig = index.get(meta_path)
+                if sig is None:
+                    return None, None, False
+            else:
+                sig = None
+            return _probe_metadata(meta_path, sig, prev_meta.get(meta_path), backend)
+
+        # With METADATA_SIDECAR_MODE=on_demand the sidecars are exports, not the source of truth
+        mirror = sidecar_mode() == 'mirror'
+        meta_paths = sorted({r[6] for r in resolved_rows if r[6]}) if mirror else []
+        metadata_cache: dict[str, dict] = {}
+        meta_sigs: dict[str, Optional[list[int]]] = {}
+        for meta_path, (sig, fields, parsed) in zip(meta_paths, pool.map(probe, meta_paths)):
+            meta_sigs[meta_path] = sig
+            if fields is not None:
+                metadata_cache[meta_path] = fields
+                stats['metadata_parsed' if parsed else 'metadata_reused'] += 1
+        stats['metadata_ms'] = round((time.perf_counter() - phase) * 1000, 1)
+        report_progress(0.7, 'jobs')
+
+    phase = time.perf_counter()
+    prev_jobs = previous.get('jobs', {})
+    jobs_cache: dict[str, dict] = {}
+    known_paths: set[str] = set()
+    broken_links: list[dict] = []
+    job_paths: list[tuple[Optional[str], Optional[str]]] = []
+
+    for job_id, status, raw_file, raw_meta, updated_at, file_path, meta_path in resolved_rows:
+        if file_path:
+            known_paths.add(file_path)
+        if meta_path:
+            known_paths.add(meta_path)
+        job_paths.append((file_path, meta_path))
+
+        file_sig = signature(file_path)
+        meta_sig = meta_sigs.get(meta_path) if meta_path else None
+        meta = metadata_cache.get(meta_path) if meta_path else None
+
+        fingerprint = [
+            updated_at.isoformat() if updated_at else None, status, raw_file, raw_meta, file_sig, meta_sig, mirror,
+        ]
+        cached = prev_jobs.get(job_id)
+        if cached and cached.get('fingerprint') == fingerprint:
+            stats['jobs_reused'] += 1
+            entry = cached
+        else:
+            stats['jobs_checked'] += 1
+            issues: list[str] = []
+            if file_sig is None:
+                issues.append('file_missing')
+            if mirror and meta_sig is None:
+                issues.append('metadata_missing')
+            expected_dir = STATUS_TO_DIR.get(status, 'Uploaded')
+            actual_dir = (status_dirname_of(Path(raw_file)) or Path(raw_file).parent.name) if raw_file else None
+            if file_sig is not None and actual_dir != expected_dir:
+                issues.append('dir_status_mismatch')
+            if meta is not None and (meta.get('status') != status or meta.get('file_path') != file_path):
+                issues.append('metadata_mismatch')
+            entry = {
+                'fingerprint': fingerprint,
+                'issues': issues,
+                'expected_dir': expected_dir,
+                'actual_dir': actual_dir,
+            }
+        jobs_cache[job_id] = entry
+        if entry['issues']:
+            broken_links.append({
+                'job_id': job_id,
+                'issues': entry['issues'],
+                'file_path': raw_file,
+                'metadata_path': raw_meta,
+                'expected_dir': entry['expected_dir'],
+                'actual_dir': entry['actual_dir'],
+            })
+
+    # Archived jobs keep their files in place
+    for raw_file, raw_meta in archived_paths():
+        known_paths.update(resolve(p) for p in (raw_file, raw_meta) if p)
+
+    # Orphans: files present on disk but not referenced in DB
+    orphaned_files = sorted(p for p in index if p not in known_paths)
+
+    # Stale duplicates of authoritative file/metadata in other status dirs
+    by_name: dict[str, list[str]] = defaultdict(list)
+    for p in index:
+        by_name[os.path.basename(p)].append(p)
+    stale_files: set[str] = set()
+    for file_path, meta_path in job_paths:
+        for own in (file_path, meta_path):
+            if not own:
+                continue
+            for p in by_name.get(os.path.basename(own), []):
+                if p != own:
+                    stale_files.add(p)
+
+    stats['jobs_ms'] = round((time.perf_counter() - phase) * 1000, 1)
+
+    integrity_issues: list[dict] = []
+    hashes = previous.get('hashes', {})
+    if integrity:
+        report_progress(0.75, 'integrity')
+        phase = time.perf_counter()
+        # Like metadata, files rewritten in place keep their directory mtime: stat them directly
+        def current_signature(path: str) -> Optional[list[int]]:
+            return backend.stat(path) if os.path.dirname(path) in reused_dirs else signature(path)
+
+        integrity_issues, hashes = _verify_integrity(integrity_candidates, current_signature, hashes, stats, backend)
+        stats['integrity_ms'] = round((time.perf_counter() - phase) * 1000, 1)
+    else:
+        # Carry forward cached hashes for files that are still present and unchanged
+        hashes = {p: e for p, e in hashes.items() if index.get(p) == e[:2]}
+
+    report_progress(0.9, 'snapshot')
+    generated_at = datetime.utcnow().isoformat()
+    phase = time.perf_counter()
+    save_snapshot(root, {
+        'version': SNAPSHOT_VERSION,
+        'root': str(root),
+        'generated_at': generated_at,
+        'dirs': dirs,
+        'metadata': metadata_cache,
+        'jobs': jobs_cache,
+        'hashes': hashes,
+    })
+    stats['snapshot_ms'] = round((time.perf_counter() - phase) * 1000, 1)
+    stats['duration_ms'] = round((time.perf_counter() - started) * 1000, 1)
+    report_progress(1.0, 'done')
+    return {
+        'report_generated_at': generated_at,
+        'orphaned_files': orphaned_files,
+        'broken_links': broken_links,
+        'stale_files': sorted(stale_files),
+        'integrity_checked': integrity,
+        'integrity_issues': integrity_issues,
+        'stats': dict(stats),
+    }
@@ -1,4 +1,8 @@
 import datetime
+import hashlib
+import threading
+import time
+from collections import OrderedDict
 import jwt
 from flask import current_app
 
@@ -11,14 +15,94 @@ def generate_token(workstation_id, expires_in=43200):
     token = jwt.encode(payload, current_app.config['SECRET_KEY'], algorithm='HS256')
     return token
 
+
+class VerifiedTokenCache:
+    """Bounded LRU of already-verified token payloads keyed by token digest.
+
+    Entries carry the token's `exp` claim and are dropped once it passes, so a
+    cache hit never outlives the token itself.
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key_for(token: str) -> bytes:
+        return hashlib.sha256(token.encode('utf-8')).digest()
+
+    def get(self, key: bytes):
+        """Return the cached payload, raise ExpiredSignatureError if it lapsed, or None on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            payload, exp = entry
+            if exp is not None and exp <= time.time():
+                del self._entries[key]
+                self.expired += 1
+                raise jwt.ExpiredSignatureError('Signature has expired')
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return payload
+
+    def put(self, key: bytes, payload: dict) -> None:
+        if self.maxsize <= 0:
+            return
+        exp = payload.get('exp')
+        with self._lock:
+            self._entries[key] = (payload, float(exp) if exp is not None else None)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses + self.expired
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'expired': self.expired,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+def _token_cache() -> VerifiedTokenCache:
+    cache = current_app.extensions.get('token_cache')
+    if cache is None:
+        maxsize = int(current_app.config.get('TOKEN_CACHE_SIZE', 1024))
+        cache = current_app.extensions.setdefault('token_cache', VerifiedTokenCache(maxsize))
+    return cache
+
+
+def token_cache_stats() -> dict:
+    return _token_cache().stats()
+
+
 def decode_token(token):
     """Decode a JWT token and return its payload or raise an exception if invalid."""
+    cache = _token_cache()
+    key = cache.key_for(token)
+    payload = cache.get(key)
+    if payload is not None:
+        return payload
     try:
         payload = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=['HS256'])
-        return payload
     except jwt.ExpiredSignatureError:
         # Token has expired
         raise
     except jwt.InvalidTokenError:
         # Token is invalid
-        raise
\ No newline at end of file
+        raise
+    cache.put(key, payload)
+    return payload
@@ -0,0 +1,218 @@
+"""Cold-storage compression of model files for finished jobs.
+
+Jobs in Completed/PaidPickedUp that have not changed for COLD_COMPRESSION_AGE_DAYS
+have their model file rewritten as "<name>.gz" (or ".zst" with the optional
+`zstandard` package) and job.file_path updated. The original is deleted only
+after the new path is committed. Readers use open_stored()/read_stored(), which
+decompress on the fly, so downloads, analysis and audit hashes see the original
+bytes.
+"""
+from __future__ import annotations
+import gzip
+import os
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import BinaryIO, Callable, Optional
+from flask import current_app
+import sqlalchemy as sa
+from sqlalchemy.orm.attributes import set_committed_value
+from app import db
+from app.models.job import Job
+from app.services.file_service import COMPRESSED_SUFFIXES, model_suffix
+from app.services.metadata_service import load_metadata, save_metadata
+from app.services.storage_backend import get_storage_backend
+
+COLD_STATUSES = ('COMPLETED', 'PAIDPICKEDUP')
+CODEC_SUFFIX = {'gzip': '.gz', 'zstd': '.zst'}
+# .3mf is already a zip archive and slicer projects are binary; text meshes shrink 5-10x
+DEFAULT_COMPRESSION_EXTS = '.stl,.obj'
+_SPOOL_BYTES = 8 * 1024 * 1024
+_CHUNK = 1024 * 1024
+
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError:
+        return None
+    return zstandard
+
+
+def zstd_available() -> bool:
+    return _zstd() is not None
+
+
+def compression_codec() -> Optional[str]:
+    """COLD_COMPRESSION: 'gzip', 'zstd' (gzip when zstandard is not installed) or off (default)."""
+    codec = os.environ.get('COLD_COMPRESSION', 'off').strip().lower()
+    if codec == 'zstd' and _zstd() is None:
+        current_app.logger.info('zstandard package not installed; compressing cold files with gzip')
+        return 'gzip'
+    return codec if codec in CODEC_SUFFIX else None
+
+
+def compression_age() -> timedelta:
+    """COLD_COMPRESSION_AGE_DAYS: how long a finished job stays untouched before compression (default 30)."""
+    try:
+        return timedelta(days=max(0.0, float(os.environ.get('COLD_COMPRESSION_AGE_DAYS', 30))))
+    except ValueError:
+        return timedelta(days=30)
+
+
+def compression_exts() -> frozenset[str]:
+    raw = os.environ.get('COLD_COMPRESSION_EXTS', DEFAULT_COMPRESSION_EXTS)
+    return frozenset((e if e.startswith('.') else f'.{e}').lower() for e in (x.strip() for x in raw.split(',')) if e)
+
+
+def codec_of(path) -> Optional[str]:
+    """Codec a stored file was compressed with, from its suffix; None for plain files."""
+    name = str(path).lower()
+    for codec, suffix in CODEC_SUFFIX.items():
+        if name.endswith(suffix):
+            return codec
+    return None
+
+
+def decompressing_reader(raw: BinaryIO, path) -> BinaryIO:
+    """Wrap a raw stream of a stored file so it reads as the original bytes."""
+    codec = codec_of(path)
+    if codec == 'gzip':
+        reader = gzip.GzipFile(fileobj=raw, mode='rb')
+        # GzipFile closes myfileobj with itself, as it does for files it opened by name
+        reader.myfileobj = raw
+        return reader
+    if codec == 'zstd':
+        zstandard = _zstd()
+        if zstandard is None:
+            raw.close()
+            raise OSError(f'zstandard package is required to read {Path(str(path)).name}')
+        return zstandard.ZstdDecompressor().stream_reader(raw, closefd=True)
+    return raw
+
+
+def open_stored(path) -> BinaryIO:
+    """Open a stored model file for reading, decompressing it if needed."""
+    return decompressing_reader(get_storage_backend().open(path), path)
+
+
+def read_stored(path) -> bytes:
+    with open_stored(path) as f:
+        return f.read()
+
+
+def _compress(src: BinaryIO, codec: str) -> BinaryIO:
+    """Compressed copy of src in a spooled temp file, rewound."""
+    out = tempfile.SpooledTemporaryFile(max_size=_SPOOL_BYTES)
+    if codec == 'zstd':
+        writer = _zstd().ZstdCompressor(level=10).stream_writer(out, closefd=False)
+    else:
+        # mtime=0 keeps the output identical for identical input
+        writer = gzip.GzipFile(fileobj=out, mode='wb', compresslevel=9, mtime=0)
+    with writer:
+        for chunk in iter(lambda: src.read(_CHUNK), b''):
+            writer.write(chunk)
+    out.seek(0)
+    return out
+
+
+def compress_job(job: Job, codec: str) -> Optional[Path]:
+    """Store the job's model file compressed and point the job (and its metadata) at it (not committed).
+
+    Returns the old path to delete once the update is committed, or None if the
+    file was left alone (already compressed, missing, or would not shrink).
+    """
+    backend = get_storage_backend()
+    current = Path(job.file_path)
+    if codec_of(current) is not None:
+        return None
+    sig = backend.stat(current)
+    if sig is None:
+        return None
+    src = backend.open(current)
+    try:
+        packed = _compress(src, codec)
+    finally:
+        src.close()
+    with packed:
+        packed.seek(0, os.SEEK_END)
+        if packed.tell() >= sig[0]:
+            return None
+        packed.seek(0)
+        dest = current.with_name(current.name + CODEC_SUFFIX[codec])
+        backend.write(dest, packed)
+    # Core UPDATE that keeps updated_at: compression must not restart the idle clock that
+    # archiving and purging measure from (an ORM assignment would fire its onupdate)
+    db.session.execute(
+        sa.update(Job).where(Job.id == job.id)
+        .values(file_path=str(dest), updated_at=Job.updated_at)
+        .execution_options(synchronize_session=False)
+    )
+    set_committed_value(job, 'file_path', str(dest))
+    meta = load_metadata(job)
+    if meta.get('file_path') is not None and meta.get('file_path') != job.file_path:
+        meta['file_path'] = job.file_path
+        save_metadata(job, meta)
+    return current
+
+
+def cold_jobs_query(age: timedelta):
+    """Finished jobs untouched for age whose model file is not compressed yet."""
+    cutoff = datetime.utcnow() - age
+    query = Job.query.filter(Job.status.in_(COLD_STATUSES), Job.updated_at < cutoff)
+    for suffix in COMPRESSED_SUFFIXES:
+        query = query.filter(~Job.file_path.ilike(f'%{suffix}'))
+    return query
+
+
+def compress_cold_files(codec: Optional[str] = None, age: Optional[timedelta] = None, batch_size: int = 100,
+                        dry_run: bool = False, progress: Optional[Callable[[int], None]] = None) -> dict:
+    """Compress every cold model file in batches: compress, commit the new paths, then delete the originals."""
+    codec = codec or compression_codec()
+    if codec is None:
+        return {'codec': None, 'compressed': 0, 'skipped': 0, 'failed': 0, 'bytes_before': 0, 'bytes_after': 0}
+    age = compression_age() if age is None else age
+    exts = compression_exts()
+    backend = get_storage_backend()
+    summary = {'codec': codec, 'compressed': 0, 'skipped': 0, 'failed': 0, 'bytes_before': 0, 'bytes_after': 0}
+    last_id = ''
+    while True:
+        # Keyset pagination: compressed jobs drop out of the query, skipped ones are passed by id
+        jobs = cold_jobs_query(age).filter(Job.id > last_id).order_by(Job.id).limit(batch_size).all()
+        if not jobs:
+            break
+        last_id = jobs[-1].id
+        originals: list[Path] = []
+        for job in jobs:
+            if model_suffix(job.file_path or '') not in exts:
+                summary['skipped'] += 1
+                continue
+            if dry_run:
+                sig = backend.stat(job.file_path)
+                summary['compressed' if sig else 'skipped'] += 1
+                summary['bytes_before'] += sig[0] if sig else 0
+                continue
+            try:
+                old = compress_job(job, codec)
+            except Exception:
+                current_app.logger.warning('Could not compress %s', job.file_path, exc_info=True)
+                summary['failed'] += 1
+                continue
+            if old is None:
+                summary['skipped'] += 1
+                continue
+            originals.append(old)
+            summary['compressed'] += 1
+            summary['bytes_before'] += (backend.stat(old) or [0])[0]
+            summary['bytes_after'] += (backend.stat(job.file_path) or [0])[0]
+        if dry_run:
+            continue
+        db.session.commit()
+        for old in originals:
+            try:
+                backend.delete(old)
+            except OSError:
+                pass
+        if progress is not None:
+            progress(summary['compressed'])
+    return summary
@@ -0,0 +1,126 @@
+"""Student confirmation links: issuing, expiring and reminding.
+
+Approval stores the link's token and expiry on the job. A periodic sweep
+(`flask sweep-confirmations` / app.tasks.sweep_confirmations_job) marks lapsed
+PENDING jobs expired with one UPDATE and sends reminders before expiry.
+Both scans go through the (status, confirm_token_expires) index, so they never
+read the whole job table.
+"""
+from __future__ import annotations
+import os
+from datetime import datetime, timedelta
+from typing import Optional
+import sqlalchemy as sa
+from app import db
+from app.models.event import Event
+from app.models.job import Job
+from app.services.email_service import send_confirmation_reminder_email
+from app.services.token_service import generate_confirmation_token
+
+# Matches verify_confirmation_token's max_age and the wording of the approval email
+CONFIRMATION_TTL = timedelta(hours=72)
+
+
+def reminder_lead() -> Optional[timedelta]:
+    """CONFIRM_REMINDER_HOURS: remind this long before the link expires (default 24; 0 disables)."""
+    try:
+        hours = float(os.environ.get('CONFIRM_REMINDER_HOURS', 24))
+    except ValueError:
+        hours = 24.0
+    return timedelta(hours=hours) if hours > 0 else None
+
+
+def confirmation_url(token: str) -> str:
+    frontend_url = os.environ.get('FRONTEND_PUBLIC_URL', 'http://localhost:3000')
+    return f"{frontend_url}/confirm/{token}"
+
+
+def issue_confirmation(job: Job) -> str:
+    """New confirmation token for the job, stored with its expiry (not committed); returns the link."""
+    now = datetime.utcnow()
+    token = generate_confirmation_token(job.id)
+    job.confirm_token = token
+    job.confirm_token_expires = now + CONFIRMATION_TTL
+    job.is_confirmation_expired = False
+    job.confirmation_last_sent_at = now
+    return confirmation_url(token)
+
+
+def _lapsed(now: datetime):
+    return sa.and_(
+        Job.status == 'PENDING',
+        Job.confirm_token_expires < now,
+        Job.is_confirmation_expired.is_(False),
+    )
+
+
+def expire_confirmations(now: Optional[datetime] = None) -> int:
+    """Mark every PENDING job whose link has lapsed as expired and log ConfirmationExpired, set-based."""
+    now = now or datetime.utcnow()
+    events = Event.__table__
+    try:
+        db.session.execute(sa.insert(events).from_select(
+            ['job_id', 'timestamp', 'event_type', 'triggered_by', 'workstation_id'],
+            sa.select(Job.id, sa.literal(now, sa.DateTime), sa.literal('ConfirmationExpired'),
+                      sa.literal('system'), sa.literal('system')).where(_lapsed(now)),
+        ))
+        expired = db.session.execute(
+            sa.update(Job.__table__).where(_lapsed(now))
+            .values(is_confirmation_expired=True, updated_at=now)
+            .execution_options(synchronize_session=False)
+        ).rowcount or 0
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return expired
+
+
+def claim_reminders(now: datetime, lead: timedelta, batch_size: int) -> list[list[str]]:
+    """Batches of job ids whose link expires within lead and that have not been reminded yet.
+
+    Claimed jobs get confirmation_last_sent_at = now, so an overlapping sweep
+    does not pick them up again.
+    """
+    rows = (db.session.query(Job.id, Job.confirm_token_expires, Job.confirmation_last_sent_at)
+            .filter(Job.status == 'PENDING', Job.confirm_token_expires >= now,
+                    Job.confirm_token_expires < now + lead, Job.is_confirmation_expired.is_(False))
+            .order_by(Job.confirm_token_expires, Job.id).all())
+    # Last mail went out before the reminder window opened: only the approval (or a resend) so far
+    due = [job_id for job_id, expires, sent in rows if sent is None or sent < expires - lead]
+    batches = [due[i:i + batch_size] for i in range(0, len(due), batch_size)]
+    for ids in batches:
+        Job.query.filter(Job.id.in_(ids)).update({'confirmation_last_sent_at': now}, synchronize_session=False)
+    db.session.commit()
+    return batches
+
+
+def send_reminders(job_ids: list[str]) -> int:
+    """Email a reminder with the still-valid link to each job that is still waiting; one commit per batch."""
+    sent = 0
+    for job in Job.query.filter(Job.id.in_(job_ids)).all():
+        if job.status != 'PENDING' or job.is_confirmation_expired or not job.confirm_token:
+            continue
+        if send_confirmation_reminder_email(job, confirmation_url(job.confirm_token)):
+            sent += 1
+        db.session.add(Event(job_id=job.id, event_type='ConfirmationReminderSent', details={},
+                             triggered_by='system', workstation_id='system'))
+    db.session.commit()
+    return sent
+
+
+def sweep_confirmations(batch_size: int = 100, now: Optional[datetime] = None) -> dict:
+    """Expire lapsed links, then hand reminder batches to the worker (or send them inline without one)."""
+    from app.services.queue_service import enqueue
+
+    now = now or datetime.utcnow()
+    summary = {'expired': expire_confirmations(now), 'reminders_queued': 0, 'reminders_sent': 0}
+    lead = reminder_lead()
+    if lead is None:
+        return summary
+    for ids in claim_reminders(now, lead, batch_size):
+        if enqueue('app.tasks.send_confirmation_reminders', ids, queue='default', job_timeout=600) is not None:
+            summary['reminders_queued'] += len(ids)
+        else:
+            summary['reminders_sent'] += send_reminders(ids)
+    return summary
@@ -167,3 +167,24 @@ def send_status_update_email(job, new_status: str) -> bool:
     return send_email(subject, [job.student_email], html_body, text_body)
 
 
+def send_confirmation_reminder_email(job, confirmation_url: str) -> bool:
+    """
+    Remind the student that their approved job is waiting for confirmation.
+    """
+    subject = "Reminder: Confirm Your 3D Print Job"
+    expires = job.confirm_token_expires.strftime('%Y-%m-%d %H:%M UTC') if job.confirm_token_expires else 'soon'
+    text_body = (
+        f"Hello {job.student_name},\n\n"
+        f"Your approved 3D print job ({job.display_name}) is still waiting for your confirmation.\n\n"
+        "Please confirm it to add it to the print queue:\n"
+        f"{confirmation_url}\n\n"
+        f"This link expires {expires}.\n\n"
+        "Thank you for using the CoAD FabLab!"
+    )
+    html_body = (
+        f"<p>Hello {job.student_name},</p>"
+        f"<p>Your approved 3D print job (<strong>{job.display_name}</strong>) is still waiting for your confirmation.</p>"
+        f"<p><a href=\"{confirmation_url}\">Confirm your job</a> to add it to the print queue.</p>"
+        f"<p><small>This link expires {expires}.</small></p>"
+    )
+    return send_email(subject, [job.student_email], html_body, text_body)
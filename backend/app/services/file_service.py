@@ -1,8 +1,11 @@
 from __future__ import annotations
 import os
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from functools import lru_cache
 from pathlib import Path
-import shutil
-from typing import Optional
+from typing import Iterable, Optional
 
 
 STATUS_TO_DIR = {
@@ -15,51 +18,308 @@ STATUS_TO_DIR = {
 }
 
 
+DEFAULT_MODEL_EXTS = '.stl,.obj,.3mf,.form,.idea'
+DEFAULT_EXT_PRIORITY = '.3mf,.form,.idea,.stl,.obj'
+# Appended to model files compressed in cold storage (compression_service)
+COMPRESSED_SUFFIXES = ('.gz', '.zst')
+
+
+@lru_cache(maxsize=8)
+def _parse_exts(raw: str) -> tuple[str, ...]:
+    return tuple((e.strip() if e.strip().startswith('.') else f'.{e.strip()}').lower() for e in raw.split(',') if e.strip())
+
+
+def allowed_model_exts() -> frozenset[str]:
+    """Extensions staff may pick as the authoritative file (ALLOWED_MODEL_EXTS)."""
+    return frozenset(_parse_exts(os.environ.get('ALLOWED_MODEL_EXTS', DEFAULT_MODEL_EXTS)))
+
+
+def ext_priority() -> dict[str, int]:
+    """Extension -> rank (lower is preferred) from AUTHORITATIVE_EXT_PRIORITY."""
+    exts = _parse_exts(os.environ.get('AUTHORITATIVE_EXT_PRIORITY', DEFAULT_EXT_PRIORITY))
+    return {ext: idx for idx, ext in enumerate(exts)}
+
+
+def logical_name(name: str) -> str:
+    """File name without a cold-storage compression suffix ("part.stl.gz" -> "part.stl")."""
+    for suffix in COMPRESSED_SUFFIXES:
+        if name.lower().endswith(suffix):
+            return name[:-len(suffix)]
+    return name
+
+
+def model_suffix(path) -> str:
+    """Lowercased model extension of a stored file, looking through any compression suffix."""
+    return Path(logical_name(Path(str(path)).name)).suffix.lower()
+
+
+def storage_root() -> Path:
+    """Configured storage root (STORAGE_PATH), relative to the working directory if not absolute."""
+    return Path(os.environ.get('STORAGE_PATH', 'storage'))
+
+
+def shard_width() -> int:
+    """Leading short_id characters used as a shard subdirectory (STORAGE_SHARDING); 0 keeps the flat layout."""
+    try:
+        return max(0, int(os.environ.get('STORAGE_SHARDING', 0)))
+    except ValueError:
+        return 0
+
+
+def shard_for(key: Optional[str], width: Optional[int] = None) -> Optional[str]:
+    """Shard name for a job key (short_id, else id); short_ids are uuid4 hex, so prefixes spread evenly."""
+    width = shard_width() if width is None else width
+    if width <= 0 or not key:
+        return None
+    prefix = ''.join(c for c in str(key).lower() if c.isalnum())[:width]
+    return prefix or None
+
+
+def job_shard_key(job) -> Optional[str]:
+    return getattr(job, 'short_id', None) or getattr(job, 'id', None)
+
+
+def status_dir(root: Path, status: str, key: Optional[str] = None, width: Optional[int] = None) -> Path:
+    """Directory holding a job's files for a status: root/<StatusDir>[/<shard>]."""
+    directory = root / STATUS_TO_DIR.get(status, 'Uploaded')
+    shard = shard_for(key, width)
+    return directory / shard if shard else directory
+
+
+def status_dirname_of(file_path: Path) -> Optional[str]:
+    """Status directory name containing file_path, in either the flat or sharded layout."""
+    parent = file_path.parent
+    if parent.name in STATUS_TO_DIR.values():
+        return parent.name
+    if parent.parent.name in STATUS_TO_DIR.values():
+        return parent.parent.name
+    return None
+
+
 def _storage_root_from_path(file_path: Path) -> Path:
     """Infer storage root from an existing file path. Fallback to STORAGE_PATH env."""
     parent = file_path.parent
     if parent.name in STATUS_TO_DIR.values():
         return parent.parent
+    if parent.parent.name in STATUS_TO_DIR.values():
+        # Sharded layout: <root>/<StatusDir>/<shard>/<file>
+        return parent.parent.parent
     # Fallback to env or current parent
     return Path(os.environ.get('STORAGE_PATH', parent.as_posix()))
 
 
+def _backend():
+    # Imported here: storage_backend builds on this module
+    from app.services.storage_backend import get_storage_backend
+    return get_storage_backend()
+
+
 def move_authoritative(job, to_status: str) -> None:
     """Copy authoritative file + metadata.json to the destination status directory and update job paths.
     Non-fatal if any filesystem step fails; best-effort copy-then-delete.
     """
     try:
+        backend = _backend()
         current_file = Path(job.file_path)
         current_meta = Path(job.metadata_path) if getattr(job, 'metadata_path', None) else None
+        if current_meta is not None:
+            # A delayed sidecar write must land before the file moves, not after
+            from app.services.metadata_service import flush_pending_writes
+            flush_pending_writes(job.id)
         root = _storage_root_from_path(current_file)
-        dest_dirname = STATUS_TO_DIR.get(to_status, STATUS_TO_DIR.get(job.status, 'Uploaded'))
-        dest_dir = (root / dest_dirname)
-        dest_dir.mkdir(parents=True, exist_ok=True)
-
-        # Compute destination file paths
-        dest_file = dest_dir / current_file.name
-        # Copy file if it exists
-        if current_file.exists():
-            shutil.copy2(current_file, dest_file)
-            try:
-                current_file.unlink(missing_ok=True)
-            except Exception:
-                pass
-        # Update job.file_path regardless; audit can fix if missing
-        job.file_path = str(dest_file.resolve())
-
-        # Metadata
+        dest_status = to_status if to_status in STATUS_TO_DIR else job.status
+        dest_dir = status_dir(root, dest_status, job_shard_key(job))
+
+        # Copy then delete each file that exists (server-side copy on object storage)
+        moves = [(current_file, dest_dir / current_file.name)]
         if current_meta is not None:
-            dest_meta = dest_dir / current_meta.name
-            if current_meta.exists():
-                shutil.copy2(current_meta, dest_meta)
+            moves.append((current_meta, dest_dir / current_meta.name))
+        for src, dest in moves:
+            if backend.exists(src):
+                backend.copy(src, dest)
                 try:
-                    current_meta.unlink(missing_ok=True)
+                    backend.delete(src)
                 except Exception:
                     pass
-            job.metadata_path = str(dest_meta.resolve())
+        # Update paths regardless; audit can fix if missing
+        job.file_path = str(moves[0][1].resolve())
+        if current_meta is not None:
+            job.metadata_path = str(moves[1][1].resolve())
     except Exception:
         # Non-fatal
         pass
 
 
+def _place(src: Path, dest: Path) -> bool:
+    """Hard-link (or copy) src to dest so both paths are readable until the old one is deleted."""
+    backend = _backend()
+    if backend.exists(dest):
+        return True
+    if backend.is_local:
+        try:
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            os.link(src, dest)
+            return True
+        except OSError:
+            pass
+    try:
+        backend.copy(src, dest)
+    except OSError:
+        return False
+    return True
+
+
+def reshard_destination(job, root: Path, width: int) -> Optional[Path]:
+    """Directory a job's files belong in for the given shard width, or None if already there."""
+    if not job.file_path:
+        return None
+    dest_dir = status_dir(root, job.status, job_shard_key(job), width)
+    if Path(job.file_path).parent.resolve() == dest_dir.resolve():
+        return None
+    return dest_dir
+
+
+def reshard_job(job, root: Path, width: int, companions: list[str]) -> list[Path]:
+    """Place a job's file, metadata and same-directory companions (e.g. slicer files) in the
+    layout for width and point the job at the new paths.
+
+    Files are linked/copied, not moved; returns the old paths to delete once the
+    job update is committed (copy-update-delete), or [] when nothing changed.
+    """
+    dest_dir = reshard_destination(job, root, width)
+    if dest_dir is None:
+        return []
+    current_file = Path(job.file_path)
+    source_dir = current_file.parent
+    names = {current_file.name, *companions}
+    if job.metadata_path:
+        names.add(Path(job.metadata_path).name)
+    backend = _backend()
+    placed: list[Path] = []
+    for name in sorted(names):
+        src = source_dir / name
+        if backend.exists(src) and _place(src, dest_dir / name):
+            placed.append(src)
+    job.file_path = str((dest_dir / current_file.name).resolve())
+    if job.metadata_path:
+        job.metadata_path = str((dest_dir / Path(job.metadata_path).name).resolve())
+    return placed
+
+
+# Candidate discovery: per-directory name index, rebuilt only when the directory mtime changes
+_GRAM = 6  # short_ids are at least 6 characters
+_DIR_INDEX_MAX = 512
+# mtimes come from a coarse clock: a listing taken within this window of the
+# directory's last change may have missed an entry created in the same tick
+RACY_NS = 1_000_000_000
+
+
+class _DirIndex:
+    __slots__ = ('stamp', 'trusted', 'names', 'grams')
+
+    def __init__(self, stamp: int, names: Iterable[str], trusted: bool):
+        # stamp is the directory mtime_ns, or the live storage index version
+        self.stamp = stamp
+        self.trusted = trusted
+        self.names = set(names)
+        # Every _GRAM-character substring of a lowercased name -> names containing it
+        self.grams: dict[str, set[str]] = defaultdict(set)
+        for name in self.names:
+            lower = name.lower()
+            for i in range(len(lower) - _GRAM + 1):
+                self.grams[lower[i:i + _GRAM]].add(name)
+
+    def matching(self, token: str) -> set[str]:
+        """Names containing token (case-insensitive), touching only names that share its first gram."""
+        token = token.lower()
+        pool = self.grams.get(token[:_GRAM], ()) if len(token) >= _GRAM else self.names
+        return {name for name in pool if token in name.lower()}
+
+
+_dir_indexes: OrderedDict = OrderedDict()
+_dir_indexes_lock = threading.Lock()
+
+
+def _cached_dir_index(key: str, stamp: int) -> Optional[_DirIndex]:
+    with _dir_indexes_lock:
+        index = _dir_indexes.get(key)
+        if index is not None and index.trusted and index.stamp == stamp:
+            _dir_indexes.move_to_end(key)
+            return index
+    return None
+
+
+def _store_dir_index(key: str, index: _DirIndex) -> _DirIndex:
+    with _dir_indexes_lock:
+        _dir_indexes[key] = index
+        _dir_indexes.move_to_end(key)
+        while len(_dir_indexes) > _DIR_INDEX_MAX:
+            _dir_indexes.popitem(last=False)
+    return index
+
+
+def _dir_index(directory: Path) -> Optional[_DirIndex]:
+    # Imported here: storage_index builds on this module
+    from app.services.storage_index import get_storage_index
+
+    live = get_storage_index()
+    if live is not None and live.mode == 'inotify':
+        # Event-driven listings are current, so use them instead of touching the directory
+        known = live.names(directory)
+        if known is not None:
+            key = f'live:{directory.resolve()}'
+            version, names = known
+            return _cached_dir_index(key, version) or _store_dir_index(key, _DirIndex(version, names, True))
+
+    key = str(directory)
+    try:
+        mtime_ns = os.stat(directory).st_mtime_ns
+    except OSError:
+        return None
+    cached = _cached_dir_index(key, mtime_ns)
+    if cached is not None:
+        return cached
+    names: set[str] = set()
+    try:
+        with os.scandir(directory) as it:
+            for entry in it:
+                try:
+                    if entry.is_file():
+                        names.add(entry.name)
+                except OSError:
+                    continue
+    except OSError:
+        return None
+    return _store_dir_index(key, _DirIndex(mtime_ns, names, time.time_ns() - mtime_ns > RACY_NS))
+
+
+def find_candidate_files(directory: Path, tokens: Iterable[str], exact_names: Iterable[str] = ()) -> list[dict]:
+    """Model files in directory whose name contains any token or equals one of exact_names.
+
+    Returns [{'name', 'mtime'}]; only the matches are stat'ed, so the cost is
+    O(matches) once the directory has been indexed. On object storage there is
+    no directory mtime to key a cache on, so the prefix is listed each time.
+    """
+    backend = _backend()
+    listing = None
+    if backend.is_local:
+        index = _dir_index(directory)
+    else:
+        listing = backend.listdir(directory)
+        index = _DirIndex(0, listing, False)
+    if index is None:
+        return []
+    matched: set[str] = set()
+    for token in tokens:
+        if token:
+            matched |= index.matching(token)
+    matched.update(name for name in exact_names if name in index.names)
+    allowed = allowed_model_exts()
+    candidates = []
+    for name in matched:
+        if model_suffix(name) not in allowed:
+            continue
+        sig = listing[name] if listing is not None else backend.stat(directory / name)
+        if sig is not None:
+            candidates.append({'name': name, 'mtime': sig[1] // 1_000_000_000})
+    return candidates
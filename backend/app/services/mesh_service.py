@@ -0,0 +1,277 @@
+"""Mesh analysis for uploaded models: volume, surface area, bounding box and watertightness.
+
+STL (binary and ASCII), OBJ and 3MF files are parsed into a triangle array
+(M x 3 corners x 3 axes, millimetres). Every measurement is a whole-array
+NumPy operation over that array; a binary STL with a million triangles is
+analysed in about half a second, and parsing dominates for the text formats.
+"""
+from __future__ import annotations
+import io
+import os
+import re
+import time
+import zipfile
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+from xml.etree import ElementTree
+import numpy as np
+from app.services.preview_service import previews_enabled, write_previews
+
+
+class MeshError(ValueError):
+    """The file could not be parsed as a mesh."""
+
+
+MESH_EXTS = ('.stl', '.obj', '.3mf')
+
+# Approximate density in g/cm^3 and the share of the solid volume a typical
+# print actually fills (perimeters plus sparse infill for filament)
+MATERIAL_DENSITY = {'filament': 1.24, 'resin': 1.12}
+MATERIAL_FILL = {'filament': 0.45, 'resin': 1.0}
+
+_STL_RECORD = np.dtype([('normal', '<f4', (3,)), ('vertices', '<f4', (3, 3)), ('attr', '<u2')])
+_3MF_UNITS_MM = {'micron': 0.001, 'millimeter': 1.0, 'centimeter': 10.0, 'inch': 25.4, 'foot': 304.8, 'meter': 1000.0}
+_STL_VERTEX = re.compile(rb'vertex\s+(\S+)\s+(\S+)\s+(\S+)')
+# Odd 64-bit multipliers for hashing coordinates and edges
+_MIX = (np.uint64(0x9E3779B185EBCA87), np.uint64(0xC2B2AE3D27D4EB4F), np.uint64(0x165667B19E3779F9))
+
+
+# -- parsing ---------------------------------------------------------------
+
+def parse_stl(data: bytes) -> np.ndarray:
+    if len(data) >= 84:
+        count = int(np.frombuffer(data, '<u4', 1, 80)[0])
+        # Binary STL: the size is exact; ASCII files that start with "solid" rarely match it
+        if 84 + count * _STL_RECORD.itemsize == len(data):
+            return np.frombuffer(data, _STL_RECORD, count, 84)['vertices']
+    if data.lstrip()[:5].lower() != b'solid':
+        raise MeshError('not an STL file')
+    coords = _STL_VERTEX.findall(data)
+    if not coords or len(coords) % 3:
+        raise MeshError('malformed ASCII STL')
+    try:
+        return np.array(coords, dtype=np.float64).reshape(-1, 3, 3)
+    except ValueError as exc:
+        raise MeshError('malformed ASCII STL') from exc
+
+
+def _index(vertices: list, faces: list) -> np.ndarray:
+    verts = np.array(vertices, dtype=np.float64).reshape(-1, 3)
+    idx = np.array(faces, dtype=np.int64).reshape(-1, 3)
+    if len(idx) and (idx.min() < 0 or idx.max() >= len(verts)):
+        raise MeshError('triangle references a missing vertex')
+    return verts[idx]
+
+
+def parse_obj(data: bytes) -> np.ndarray:
+    vertices: list[list[float]] = []
+    faces: list[tuple[int, int, int]] = []
+    try:
+        for line in data.splitlines():
+            if line.startswith(b'v '):
+                vertices.append([float(x) for x in line.split()[1:4]])
+            elif line.startswith(b'f '):
+                # "f 1 2 3", "f 1/1/1 ...", negative indices count from the end; polygons are fanned
+                idx = []
+                for ref in line.split()[1:]:
+                    i = int(ref.split(b'/', 1)[0])
+                    idx.append(i - 1 if i > 0 else len(vertices) + i)
+                faces.extend((idx[0], idx[k], idx[k + 1]) for k in range(1, len(idx) - 1))
+    except (ValueError, IndexError) as exc:
+        raise MeshError('malformed OBJ') from exc
+    return _index(vertices, faces)
+
+
+def max_3mf_part_bytes() -> int:
+    """MESH_3MF_MAX_PART_MB: largest decompressed 3MF model part the parser will read (default 512)."""
+    try:
+        return int(float(os.environ.get('MESH_3MF_MAX_PART_MB', 512)) * 1024 ** 2)
+    except ValueError:
+        return 512 * 1024 ** 2
+
+
+def parse_3mf(data: bytes) -> np.ndarray:
+    """Every <mesh> in the package's model parts, scaled to millimetres (build transforms are ignored)."""
+    try:
+        archive = zipfile.ZipFile(io.BytesIO(data))
+    except zipfile.BadZipFile as exc:
+        raise MeshError('not a 3MF package') from exc
+    blocks: list[np.ndarray] = []
+    limit = max_3mf_part_bytes()
+    with archive:
+        for info in archive.infolist():
+            name = info.filename
+            if not name.lower().endswith('.model'):
+                continue
+            # Checked before inflating anything; the zip reader never returns more than file_size bytes
+            if info.file_size > limit:
+                raise MeshError(f'3MF model part {name} is too large to analyse ({info.file_size} bytes)')
+            first = len(blocks)
+            scale = 1.0
+            xs: list[str] = []
+            tris: list[str] = []
+            try:
+                for _, elem in ElementTree.iterparse(archive.open(name)):
+                    tag = elem.tag.rsplit('}', 1)[-1]
+                    if tag == 'vertex':
+                        xs.extend((elem.get('x'), elem.get('y'), elem.get('z')))
+                    elif tag == 'triangle':
+                        tris.extend((elem.get('v1'), elem.get('v2'), elem.get('v3')))
+                    elif tag == 'mesh':
+                        # Triangle indices are local to each mesh
+                        blocks.append(_index(xs, tris))
+                        xs, tris = [], []
+                    elif tag == 'model':
+                        scale = _3MF_UNITS_MM.get(elem.get('unit', 'millimeter'), 1.0)
+                    if tag in ('vertex', 'triangle'):
+                        elem.clear()
+            except (ElementTree.ParseError, TypeError, ValueError, zipfile.BadZipFile) as exc:
+                if isinstance(exc, MeshError):
+                    raise
+                raise MeshError('malformed 3MF model') from exc
+            # The unit is an attribute of the root element, which closes last
+            for block in blocks[first:]:
+                block *= scale
+    if not blocks:
+        raise MeshError('3MF package has no mesh')
+    return np.concatenate(blocks)
+
+
+_PARSERS = {'.stl': parse_stl, '.obj': parse_obj, '.3mf': parse_3mf}
+
+
+def parse_mesh(data: bytes, ext: str) -> np.ndarray:
+    """Triangles (M x 3 x 3, mm) from a model file's bytes; raises MeshError."""
+    parser = _PARSERS.get(ext.lower())
+    if parser is None:
+        raise MeshError(f'unsupported mesh format {ext}')
+    triangles = parser(data)
+    if not len(triangles):
+        raise MeshError('mesh has no triangles')
+    return triangles
+
+
+# -- measurements ----------------------------------------------------------
+
+def _sorted_runs(keys: np.ndarray) -> np.ndarray:
+    """Multiplicity of each distinct value in keys."""
+    keys = np.sort(keys, axis=None)
+    breaks = np.flatnonzero(keys[1:] != keys[:-1])
+    return np.diff(breaks, prepend=-1, append=len(keys) - 1)
+
+
+def analyze_mesh(triangles: np.ndarray) -> dict:
+    """Volume (mm^3), surface area (mm^2), bounding box and edge topology of a triangle array."""
+    # Corners are identified by a 64-bit hash of their float32 coordinates
+    # (+0.0 folds -0.0 into 0.0), so STL's unshared corners weld without a sort on rows
+    bits = (np.asarray(triangles, dtype=np.float32) + np.float32(0)).view(np.uint32).astype(np.uint64)
+    corner = (bits[..., 0] * _MIX[0]) ^ (bits[..., 1] * _MIX[1]) ^ (bits[..., 2] * _MIX[2])
+    # Each undirected edge of a closed, manifold surface is shared by exactly two triangles
+    nxt = corner[:, [1, 2, 0]]
+    edge_counts = _sorted_runs((np.minimum(corner, nxt) * _MIX[0]) ^ (np.maximum(corner, nxt) * _MIX[1]))
+    boundary_edges = int(np.count_nonzero(edge_counts == 1))
+    non_manifold_edges = int(np.count_nonzero(edge_counts > 2))
+
+    # Corner, axis, triangle: every term below is a contiguous 1-D array
+    a, b, c = np.ascontiguousarray(triangles.transpose(1, 2, 0), dtype=np.float64)
+    u, w = b - a, c - a
+    cross = np.array([u[1] * w[2] - u[2] * w[1], u[2] * w[0] - u[0] * w[2], u[0] * w[1] - u[1] * w[0]])
+    doubled_areas = np.sqrt((cross * cross).sum(axis=0))
+    # Divergence theorem: sum of the signed tetrahedra (origin, a, b, c)
+    signed_volume = (a[0] * (b[1] * c[2] - b[2] * c[1]) + a[1] * (b[2] * c[0] - b[0] * c[2])
+                     + a[2] * (b[0] * c[1] - b[1] * c[0])).sum() / 6.0
+
+    lo = np.minimum(np.minimum(a.min(axis=1), b.min(axis=1)), c.min(axis=1))
+    hi = np.maximum(np.maximum(a.max(axis=1), b.max(axis=1)), c.max(axis=1))
+    return {
+        'triangles': int(len(triangles)),
+        'vertices': int(len(_sorted_runs(corner))),
+        'volume_mm3': round(abs(float(signed_volume)), 3),
+        'surface_area_mm2': round(float(doubled_areas.sum()) / 2.0, 3),
+        'bbox_min_mm': [round(float(x), 3) for x in lo],
+        'bbox_max_mm': [round(float(x), 3) for x in hi],
+        'size_mm': [round(float(x), 3) for x in hi - lo],
+        'watertight': boundary_edges == 0 and non_manifold_edges == 0,
+        'boundary_edges': boundary_edges,
+        'non_manifold_edges': non_manifold_edges,
+        'degenerate_triangles': int(np.count_nonzero(doubled_areas == 0)),
+    }
+
+
+def _material_key(material: Optional[str]) -> str:
+    return 'resin' if (material or '').strip().lower() == 'resin' else 'filament'
+
+
+def estimate_weight_g(volume_mm3: float, material: Optional[str]) -> float:
+    """Printed weight from solid volume: density x fill share (MESH_FILL_FILAMENT / MESH_FILL_RESIN)."""
+    key = _material_key(material)
+    fill = float(os.environ.get(f'MESH_FILL_{key.upper()}', MATERIAL_FILL[key]))
+    return round(volume_mm3 / 1000.0 * MATERIAL_DENSITY[key] * fill, 1)
+
+
+def _measure(triangles: np.ndarray, ext: str, material: Optional[str]) -> dict:
+    result = analyze_mesh(triangles)
+    result['format'] = ext.lower().lstrip('.')
+    result['estimated_weight_g'] = (
+        estimate_weight_g(result['volume_mm3'], material) if result['watertight'] else None
+    )
+    return result
+
+
+def analyze_file(data: bytes, ext: str, material: Optional[str] = None) -> dict:
+    """Parse and measure a model file; the estimated weight is only given for watertight meshes."""
+    return _measure(parse_mesh(data, ext), ext, material)
+
+
+def analyze_job(job) -> dict:
+    """Analyse the job's current file, render its previews and store the result on
+    job.analysis (not committed)."""
+    started = time.perf_counter()
+    # Imported here: this module is also used standalone on raw bytes
+    from app.services.compression_service import read_stored
+    from app.services.file_service import logical_name, model_suffix
+
+    ext = model_suffix(job.file_path or '')
+    triangles = None
+    try:
+        triangles = parse_mesh(read_stored(job.file_path), ext)
+        result = _measure(triangles, ext, job.material)
+    except (MeshError, OSError) as exc:
+        result = {'format': ext.lstrip('.'), 'error': str(exc)}
+    if triangles is not None and previews_enabled():
+        try:
+            result['preview'] = write_previews(job, triangles)
+        except Exception as exc:
+            # Measurements are still useful without a picture
+            result['preview'] = {'error': str(exc)}
+    result['file'] = logical_name(Path(job.file_path or '').name)
+    result['analyzed_at'] = datetime.utcnow().isoformat()
+    result['duration_ms'] = round((time.perf_counter() - started) * 1000, 1)
+    job.analysis = result
+    return result
+
+
+def analysis_mode() -> str:
+    """MESH_ANALYSIS: 'auto' (default) queues on the worker or analyses inline without Redis,
+    'queue' only ever queues, 'off' disables analysis."""
+    mode = os.environ.get('MESH_ANALYSIS', 'auto').strip().lower()
+    return mode if mode in ('auto', 'queue', 'off') else 'auto'
+
+
+def schedule_analysis(job) -> str:
+    """Queue (or run) analysis for a job's model file; returns 'queued', 'inline' or 'skipped'."""
+    from app import db
+    from app.services.file_service import model_suffix
+    from app.services.queue_service import enqueue
+
+    mode = analysis_mode()
+    if mode == 'off' or model_suffix(job.file_path or '') not in MESH_EXTS:
+        return 'skipped'
+    if enqueue('app.tasks.analyze_mesh_job', job.id, queue='analysis', job_timeout=300) is not None:
+        return 'queued'
+    if mode == 'queue':
+        return 'skipped'
+    analyze_job(job)
+    db.session.commit()
+    return 'inline'
@@ -0,0 +1,164 @@
+from __future__ import annotations
+import atexit
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+from typing import Optional
+from app import db
+from app.models.job_metadata import JobMetadata
+from app.services.storage_backend import StorageBackend, get_storage_backend
+
+logger = logging.getLogger(__name__)
+
+
+SIDECAR_MODES = ('mirror', 'on_demand')
+
+
+def sidecar_mode() -> str:
+    """METADATA_SIDECAR_MODE: 'on_demand' (default) keeps metadata only in the job_metadata table until
+    it is exported; 'mirror' also rewrites the JSON sidecar on every change."""
+    mode = os.environ.get('METADATA_SIDECAR_MODE', 'on_demand').strip().lower()
+    return mode if mode in SIDECAR_MODES else 'on_demand'
+
+
+def write_delay() -> float:
+    """METADATA_WRITE_DELAY: seconds to hold sidecar writes so rapid updates to a job coalesce (default 0)."""
+    try:
+        return max(0.0, float(os.environ.get('METADATA_WRITE_DELAY', 0)))
+    except ValueError:
+        return 0.0
+
+
+class SidecarWriter:
+    """Write-behind buffer for sidecar writes, one per process.
+
+    Pending writes are keyed by job, so a later update (even to a new path
+    after a status move) replaces an earlier one that has not been flushed
+    yet. A timer flushes everything `delay` seconds after the first write
+    of a batch; flush() is also called at interpreter exit and from
+    gunicorn's worker_exit hook.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Held while writing, so flush_job() cannot return while a batch is still landing
+        self._io_lock = threading.Lock()
+        self._pending: dict[str, tuple[StorageBackend, str, bytes]] = {}
+        self._timer: Optional[threading.Timer] = None
+
+    def submit(self, job_id: str, backend: StorageBackend, path: str, payload: bytes, delay: float) -> None:
+        with self._lock:
+            self._pending[job_id] = (backend, path, payload)
+            if self._timer is None:
+                self._timer = threading.Timer(delay, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def discard(self, job_id: str) -> None:
+        with self._lock:
+            self._pending.pop(job_id, None)
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def flush(self) -> int:
+        """Write out every pending sidecar; returns how many were written."""
+        with self._io_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+            return sum(self._write(*entry) for entry in pending.values())
+
+    def flush_job(self, job_id: str) -> None:
+        """Write out one job's pending sidecar now (before its files are moved)."""
+        with self._io_lock:
+            with self._lock:
+                entry = self._pending.pop(job_id, None)
+            if entry is not None:
+                self._write(*entry)
+
+    @staticmethod
+    def _write(backend: StorageBackend, path: str, payload: bytes) -> bool:
+        try:
+            backend.write(path, payload)
+            return True
+        except Exception:
+            # Non-fatal: the job_metadata row stays authoritative
+            logger.warning('Failed to write metadata sidecar %s', path, exc_info=True)
+            return False
+
+
+_writer = SidecarWriter()
+atexit.register(_writer.flush)
+
+
+def flush_pending_writes(job_id: Optional[str] = None) -> int:
+    """Write out the delayed sidecar updates held by this process (or just one job's)."""
+    if job_id is not None:
+        _writer.flush_job(job_id)
+        return 0
+    return _writer.flush()
+
+
+def _read_sidecar(job) -> Optional[dict]:
+    if not job.metadata_path:
+        return None
+    try:
+        data = json.loads(get_storage_backend().read(job.metadata_path))
+    except Exception:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def load_metadata(job) -> dict:
+    """Return a copy of the job's metadata, importing it from the sidecar the first time.
+
+    The imported row is added to the session; it is persisted with the caller's commit.
+    """
+    record = job.meta_record
+    if record is None:
+        record = JobMetadata(job_id=job.id, data=_read_sidecar(job) or {})
+        job.meta_record = record
+        db.session.add(record)
+    return dict(record.data or {})
+
+
+def save_metadata(job, data: dict) -> None:
+    """Store metadata on the job's row; in mirror mode also rewrite the sidecar."""
+    record = job.meta_record
+    if record is None:
+        record = JobMetadata(job_id=job.id)
+        job.meta_record = record
+        db.session.add(record)
+    # Assign a fresh dict so the JSON column is flagged as changed
+    record.data = dict(data)
+    if sidecar_mode() == 'mirror':
+        export_sidecar(job, delay=write_delay())
+
+
+def export_sidecar(job, delay: float = 0.0) -> Optional[str]:
+    """Write the job's metadata to its *_metadata.json sidecar; returns the path, or None on failure.
+
+    With a delay the write is queued on the write-behind buffer instead.
+    """
+    record = job.meta_record
+    if record is None or not job.metadata_path:
+        return None
+    payload = json.dumps(record.data, indent=2).encode('utf-8')
+    if delay > 0:
+        _writer.submit(job.id, get_storage_backend(), job.metadata_path, payload, delay)
+    else:
+        # Supersedes anything still queued for this job
+        _writer.discard(job.id)
+        try:
+            get_storage_backend().write(job.metadata_path, payload)
+        except Exception:
+            # Non-fatal: metadata sync should not block workflow
+            return None
+    record.exported_at = datetime.utcnow()
+    return job.metadata_path
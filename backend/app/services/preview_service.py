@@ -0,0 +1,242 @@
+"""Small previews of a job's model, generated alongside the mesh analysis.
+
+Two files per job under STORAGE_PATH/Previews/ (outside the status
+directories, so they never move with the job):
+
+- <job_id>.thumb.png: isometric, flat-shaded RGBA thumbnail rasterised on the
+  CPU with NumPy (2x supersampled, z-buffered) and encoded without Pillow.
+- <job_id>.preview.bin: the mesh decimated by vertex clustering and
+  quantised to 16 bits per coordinate. Layout (little-endian): b'FLPM',
+  uint16 version, uint16 flags (bit 0: 32-bit indices), uint32 vertex count,
+  uint32 triangle count, float32[3] bbox min, float32[3] bbox max (mm),
+  uint16[3 * vertices] positions (0..65535 across the bbox), zero padding
+  to a multiple of 4 bytes, then uint16 or uint32[3 * triangles] indices.
+"""
+from __future__ import annotations
+import hashlib
+import os
+import struct
+import zlib
+from pathlib import Path
+import numpy as np
+from app.services.file_service import storage_root
+
+PREVIEW_DIRNAME = 'Previews'
+MESH_MAGIC = b'FLPM'
+MESH_VERSION = 1
+
+# Camera: turn the model 45 degrees about z, then tilt it towards the viewer (z up, as printed)
+_AZIMUTH = np.radians(-45.0)
+_ELEVATION = np.radians(35.264)
+_LIGHT = np.array([-0.4, 0.5, 0.77])
+_BASE_RGB = np.array([96, 140, 200], dtype=np.float64)
+# Pixel tests per rasterisation chunk, to bound memory for large triangles
+_CHUNK_PIXELS = 1 << 22
+# Above this many triangles the thumbnail is drawn from a decimated copy
+_RENDER_TRIANGLES = 150_000
+
+
+def previews_enabled() -> bool:
+    return os.environ.get('MESH_PREVIEWS', 'true').lower() in ('1', 'true', 'yes')
+
+
+def thumbnail_size() -> int:
+    return max(32, min(1024, int(os.environ.get('PREVIEW_THUMBNAIL_SIZE', 256))))
+
+
+def max_preview_triangles() -> int:
+    return max(100, int(os.environ.get('PREVIEW_MAX_TRIANGLES', 20000)))
+
+
+def preview_paths(job_id: str) -> dict[str, Path]:
+    directory = storage_root() / PREVIEW_DIRNAME
+    return {'thumbnail': directory / f'{job_id}.thumb.png', 'mesh': directory / f'{job_id}.preview.bin'}
+
+
+# -- thumbnail -------------------------------------------------------------
+
+def _view(triangles: np.ndarray) -> np.ndarray:
+    """Rotate into view space: x right, y up, z towards the viewer."""
+    ca, sa = np.cos(_AZIMUTH), np.sin(_AZIMUTH)
+    ce, se = np.cos(_ELEVATION), np.sin(_ELEVATION)
+    turn = np.array([[ca, -sa, 0.0], [sa, ca, 0.0], [0.0, 0.0, 1.0]])
+    # Looking down the (rotated) y axis from above: y -> depth, z -> up
+    tilt = np.array([[1.0, 0.0, 0.0], [0.0, se, ce], [0.0, -ce, se]])
+    return np.asarray(triangles, dtype=np.float64) @ (tilt @ turn).T
+
+
+def encode_png(rgba: np.ndarray) -> bytes:
+    """Encode an (h, w, 4) uint8 array as a PNG (filter type 0 on every row)."""
+    height, width = rgba.shape[:2]
+    raw = np.zeros((height, width * 4 + 1), dtype=np.uint8)
+    raw[:, 1:] = rgba.reshape(height, -1)
+
+    def chunk(kind: bytes, body: bytes) -> bytes:
+        return struct.pack('>I', len(body)) + kind + body + struct.pack('>I', zlib.crc32(kind + body))
+
+    header = struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0)
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header)
+            + chunk(b'IDAT', zlib.compress(raw.tobytes(), 6)) + chunk(b'IEND', b''))
+
+
+def render_thumbnail(triangles: np.ndarray, size: int) -> bytes:
+    """Flat-shaded isometric PNG of the mesh, size x size pixels, transparent background."""
+    scale_up = 2
+    res = size * scale_up
+    if len(triangles) > _RENDER_TRIANGLES:
+        # Far more triangles than pixels: a clustered copy renders the same at this size
+        vertices, faces = decimate(triangles, _RENDER_TRIANGLES)
+        triangles = vertices[faces]
+    view = _view(triangles)
+    lo = view.reshape(-1, 3).min(axis=0)
+    hi = view.reshape(-1, 3).max(axis=0)
+    span = max(float(hi[0] - lo[0]), float(hi[1] - lo[1]), 1e-9)
+    scale = res * 0.9 / span
+    offset = (res - np.array([hi[0] - lo[0], hi[1] - lo[1]]) * scale) / 2
+    # Screen space: x right, y down
+    sx = (view[..., 0] - lo[0]) * scale + offset[0]
+    sy = res - ((view[..., 1] - lo[1]) * scale + offset[1])
+    depth = view[..., 2]
+
+    normals = np.cross(view[:, 1] - view[:, 0], view[:, 2] - view[:, 0])
+    lengths = np.linalg.norm(normals, axis=1)
+    keep = lengths > 0
+    # Two-sided lighting: winding in uploaded files is not reliable
+    light = np.abs(normals[keep] @ (_LIGHT / np.linalg.norm(_LIGHT))) / lengths[keep]
+    shade = 0.3 + 0.7 * light
+    sx, sy, depth = sx[keep], sy[keep], depth[keep]
+
+    x0 = np.clip(np.floor(sx.min(axis=1)), 0, res - 1).astype(np.int64)
+    x1 = np.clip(np.ceil(sx.max(axis=1)), 0, res - 1).astype(np.int64)
+    y0 = np.clip(np.floor(sy.min(axis=1)), 0, res - 1).astype(np.int64)
+    y1 = np.clip(np.ceil(sy.max(axis=1)), 0, res - 1).astype(np.int64)
+    widths = x1 - x0 + 1
+    counts = widths * (y1 - y0 + 1)
+    area = (sx[:, 1] - sx[:, 0]) * (sy[:, 2] - sy[:, 0]) - (sx[:, 2] - sx[:, 0]) * (sy[:, 1] - sy[:, 0])
+
+    zbuf = np.full(res * res, -np.inf)
+    color = np.zeros(res * res)
+    ends = np.cumsum(counts)
+    start = 0
+    while start < len(counts):
+        base = ends[start - 1] if start else 0
+        stop = max(start + 1, int(np.searchsorted(ends, base + _CHUNK_PIXELS, side='right')))
+        sel = slice(start, stop)
+        start = stop
+        n = counts[sel]
+        tri = np.repeat(np.arange(sel.start, sel.stop), n)
+        # Position of each test inside its triangle's bounding box
+        local = np.arange(n.sum()) - np.repeat(np.cumsum(n) - n, n)
+        px = x0[tri] + local % widths[tri] + 0.5
+        py = y0[tri] + local // widths[tri] + 0.5
+        ax, ay = sx[tri, 0], sy[tri, 0]
+        bx, by = sx[tri, 1], sy[tri, 1]
+        cx, cy = sx[tri, 2], sy[tri, 2]
+        # Barycentric weights from edge functions, normalised by the signed area
+        with np.errstate(divide='ignore', invalid='ignore'):
+            w1 = ((px - ax) * (cy - ay) - (cx - ax) * (py - ay)) / area[tri]
+            w2 = ((bx - ax) * (py - ay) - (px - ax) * (by - ay)) / area[tri]
+        w0 = 1.0 - w1 - w2
+        inside = (w0 >= 0) & (w1 >= 0) & (w2 >= 0)
+        tri, w0, w1, w2 = tri[inside], w0[inside], w1[inside], w2[inside]
+        pixel = (py[inside].astype(np.int64)) * res + px[inside].astype(np.int64)
+        z = w0 * depth[tri, 0] + w1 * depth[tri, 1] + w2 * depth[tri, 2]
+        np.maximum.at(zbuf, pixel, z)
+        front = z >= zbuf[pixel]
+        color[pixel[front]] = shade[tri[front]]
+
+    covered = np.isfinite(zbuf)
+    rgba = np.zeros((res * res, 4))
+    rgba[covered, :3] = color[covered, None] * _BASE_RGB
+    rgba[covered, 3] = 255
+    # Box-filter the supersampled image; colour is weighted by coverage
+    rgba = rgba.reshape(size, scale_up, size, scale_up, 4).mean(axis=(1, 3))
+    alpha = rgba[..., 3:4]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rgb = np.where(alpha > 0, rgba[..., :3] * 255 / alpha, 0)
+    out = np.concatenate([rgb, alpha], axis=2)
+    return encode_png(np.clip(np.rint(out), 0, 255).astype(np.uint8))
+
+
+# -- preview mesh ----------------------------------------------------------
+
+def decimate(triangles: np.ndarray, max_triangles: int) -> tuple[np.ndarray, np.ndarray]:
+    """Vertex clustering: snap corners to a grid, merge each cell's corners, drop collapsed triangles.
+
+    The grid starts at 128 cells per side and is halved until at most
+    max_triangles remain; meshes already under the budget are only welded.
+    Returns (vertices, faces).
+    """
+    corners = np.asarray(triangles, dtype=np.float64).reshape(-1, 3)
+    if len(triangles) <= max_triangles:
+        vertices, faces = np.unique(corners, axis=0, return_inverse=True)
+        return vertices, faces.reshape(-1, 3)
+    lo = corners.min(axis=0)
+    extent = max(float((corners.max(axis=0) - lo).max()), 1e-9)
+    # 7 bits per axis, so a cell id fits in 21 bits and a cell triple in one int64
+    fine = np.minimum((corners - lo) / extent * 128, 127).astype(np.int64)
+    for shift in range(6):
+        cells = fine >> shift
+        ids = ((cells[:, 0] << 14) | (cells[:, 1] << 7) | cells[:, 2]).reshape(-1, 3)
+        keep = (ids[:, 0] != ids[:, 1]) & (ids[:, 1] != ids[:, 2]) & (ids[:, 2] != ids[:, 0])
+        tri_ids = ids[keep]
+        # The same cell triple can come from many source triangles; keep one
+        key = np.sort(tri_ids, axis=1)
+        _, first = np.unique((key[:, 0] << 42) | (key[:, 1] << 21) | key[:, 2], return_index=True)
+        tri_ids = tri_ids[np.sort(first)]
+        if len(tri_ids) <= max_triangles:
+            break
+    used, faces = np.unique(tri_ids, return_inverse=True)
+    # Each vertex is the mean of the source corners in its cell
+    flat = ids.ravel()
+    cluster = np.minimum(np.searchsorted(used, flat), len(used) - 1)
+    member = used[cluster] == flat
+    weights = np.bincount(cluster[member], minlength=len(used))
+    vertices = np.stack([
+        np.bincount(cluster[member], weights=corners[member, axis], minlength=len(used)) for axis in range(3)
+    ], axis=1) / np.maximum(weights, 1)[:, None]
+    return vertices, faces.reshape(-1, 3)
+
+
+def encode_preview_mesh(vertices: np.ndarray, faces: np.ndarray) -> bytes:
+    lo = vertices.min(axis=0)
+    hi = vertices.max(axis=0)
+    span = np.where(hi > lo, hi - lo, 1.0)
+    positions = np.rint((vertices - lo) / span * 65535).astype('<u2')
+    wide = len(vertices) > 0xFFFF
+    header = MESH_MAGIC + struct.pack('<HHII6f', MESH_VERSION, int(wide), len(vertices), len(faces), *lo, *hi)
+    body = positions.tobytes()
+    body += b'\0' * (-len(body) % 4)
+    return header + body + faces.astype('<u4' if wide else '<u2').tobytes()
+
+
+def write_previews(job, triangles: np.ndarray) -> dict:
+    """Render and store both previews for a job; returns what the job's analysis records about them."""
+    # Imported here: storage_backend builds on file_service, like this module
+    from app.services.storage_backend import get_storage_backend
+
+    backend = get_storage_backend()
+    paths = preview_paths(job.id)
+    thumbnail = render_thumbnail(triangles, thumbnail_size())
+    vertices, faces = decimate(triangles, max_preview_triangles())
+    mesh = encode_preview_mesh(vertices, faces)
+    backend.write(paths['thumbnail'], thumbnail)
+    backend.write(paths['mesh'], mesh)
+    return {
+        # Changes whenever the previews do, so clients can cache by URL indefinitely
+        'version': hashlib.sha1(thumbnail + mesh).hexdigest()[:12],
+        'thumbnail_bytes': len(thumbnail),
+        'mesh_bytes': len(mesh),
+        'mesh_triangles': int(len(faces)),
+    }
+
+
+def delete_previews(job_id: str) -> None:
+    from app.services.storage_backend import get_storage_backend
+
+    backend = get_storage_backend()
+    for path in preview_paths(job_id).values():
+        try:
+            backend.delete(path)
+        except Exception:
+            pass
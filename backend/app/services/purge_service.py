@@ -0,0 +1,130 @@
+"""Retention: permanently deleting finished jobs, their history and their files.
+
+Jobs in PURGE_STATUSES last updated more than PURGE_AFTER_DAYS ago are removed
+from the live and archive tables in keyset batches. Each batch is one short
+transaction of set-based DELETEs, not an ORM cascade per job. A batch's files
+(model, metadata sidecar, previews) are deleted concurrently before its rows,
+so a run interrupted at any point leaves only rows that the next run picks up
+again, never files nothing points to.
+"""
+from __future__ import annotations
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, Iterable, Optional
+import sqlalchemy as sa
+from app import db
+from app.models.archive import EventArchive, JobArchive, PaymentArchive
+from app.models.event import Event
+from app.models.job import Job
+from app.models.job_metadata import JobMetadata
+from app.models.payment import Payment
+from app.models.submission import Submission
+from app.services.preview_service import preview_paths
+from app.services.storage_backend import get_storage_backend
+
+PURGE_STATUSES = ('PAIDPICKEDUP', 'REJECTED')
+
+
+def purge_after() -> Optional[timedelta]:
+    """PURGE_AFTER_DAYS; None (the default) means jobs are kept forever."""
+    raw = os.environ.get('PURGE_AFTER_DAYS', '').strip()
+    try:
+        return timedelta(days=float(raw)) if raw else None
+    except ValueError:
+        return None
+
+
+def _purge_workers() -> int:
+    return max(1, int(os.environ.get('PURGE_WORKERS', 8)))
+
+
+# Live jobs and archived jobs, each with the tables that hang off them (deleted first)
+_SOURCES = (
+    (Job, (Event.__table__.c.job_id, Payment.__table__.c.job_id, JobMetadata.__table__.c.job_id,
+           Submission.__table__.c.job_id)),
+    (JobArchive, (EventArchive.__table__.c.job_id, PaymentArchive.__table__.c.job_id)),
+)
+
+
+def _expired_batch(model, cutoff: datetime, statuses: Iterable[str], after_id: str, limit: int) -> list[tuple]:
+    """(id, file_path, metadata_path) of the next expired jobs after after_id."""
+    table = model.__table__
+    query = (sa.select(table.c.id, table.c.file_path, table.c.metadata_path)
+             .where(table.c.status.in_(list(statuses)), table.c.updated_at < cutoff, table.c.id > after_id)
+             .order_by(table.c.id).limit(limit))
+    return db.session.execute(query).all()
+
+
+def _count_expired(model, cutoff: datetime, statuses: Iterable[str]) -> int:
+    table = model.__table__
+    return db.session.execute(
+        sa.select(sa.func.count()).select_from(table)
+        .where(table.c.status.in_(list(statuses)), table.c.updated_at < cutoff)
+    ).scalar() or 0
+
+
+def _delete_files(paths: list, pool: ThreadPoolExecutor) -> int:
+    backend = get_storage_backend()
+
+    def remove(path) -> bool:
+        try:
+            return backend.delete(path)
+        except Exception:
+            return False
+
+    return sum(pool.map(remove, paths))
+
+
+def _delete_rows(model, children: Iterable[sa.Column], ids: list[str]) -> int:
+    try:
+        for key in children:
+            db.session.execute(sa.delete(key.table).where(key.in_(ids)))
+        deleted = db.session.execute(sa.delete(model.__table__).where(model.__table__.c.id.in_(ids))).rowcount or 0
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return deleted
+
+
+def purge_expired_jobs(age: timedelta, statuses: Iterable[str] = PURGE_STATUSES, batch_size: int = 500,
+                       dry_run: bool = False, progress: Optional[Callable[[dict], None]] = None) -> dict:
+    """Delete expired jobs (live and archived), their events, payments, metadata and files.
+
+    progress(totals) is called after every batch; totals carries running counts,
+    the number expected at the start, and throughput. Safe to interrupt and re-run.
+    """
+    cutoff = datetime.utcnow() - age
+    statuses = tuple(statuses)
+    totals = {
+        'expected': sum(_count_expired(model, cutoff, statuses) for model, _ in _SOURCES),
+        'jobs': 0, 'files': 0, 'batches': 0, 'elapsed_s': 0.0, 'jobs_per_s': 0.0,
+    }
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=_purge_workers()) as pool:
+        for model, children in _SOURCES:
+            last_id = ''
+            while True:
+                rows = _expired_batch(model, cutoff, statuses, last_id, batch_size)
+                if not rows:
+                    break
+                last_id = rows[-1][0]
+                ids = [row[0] for row in rows]
+                if dry_run:
+                    totals['jobs'] += len(ids)
+                    continue
+                paths = [p for _, file_path, meta_path in rows for p in (file_path, meta_path) if p]
+                for job_id in ids:
+                    paths.extend(preview_paths(job_id).values())
+                totals['files'] += _delete_files(paths, pool)
+                totals['jobs'] += _delete_rows(model, children, ids)
+                totals['batches'] += 1
+                totals['elapsed_s'] = round(time.perf_counter() - started, 2)
+                totals['jobs_per_s'] = round(totals['jobs'] / max(totals['elapsed_s'], 1e-3), 1)
+                if progress is not None:
+                    progress(dict(totals))
+    db.session.expire_all()
+    totals['elapsed_s'] = round(time.perf_counter() - started, 2)
+    return totals
@@ -0,0 +1,66 @@
+from __future__ import annotations
+from typing import Optional
+from flask import current_app
+from app.services.redis_service import get_redis
+
+
+def get_queue(name: str = 'default'):
+    """Return an RQ queue bound to REDIS_URL, or None when Redis/RQ is unavailable."""
+    client = get_redis()
+    if client is None:
+        return None
+    try:
+        from rq import Queue
+    except ImportError:
+        current_app.logger.info('rq package not installed; background jobs disabled')
+        return None
+    return Queue(name, connection=client)
+
+
+def enqueue(func_path: str, *args, queue: str = 'default', job_timeout: int = 600, **kwargs):
+    """Enqueue func_path (dotted path importable by the worker).
+
+    Returns the RQ job, or None if the queue is unavailable so callers can run
+    the work inline instead.
+    """
+    q = get_queue(queue)
+    if q is None:
+        return None
+    try:
+        return q.enqueue(func_path, *args, job_timeout=job_timeout, **kwargs)
+    except Exception as exc:
+        current_app.logger.warning('Could not enqueue %s: %s', func_path, exc)
+        return None
+
+
+def fetch_job(job_id: str):
+    """Return the RQ job with this id, or None if unknown or the queue is unavailable."""
+    client = get_redis()
+    if client is None:
+        return None
+    try:
+        from rq.job import Job as RQJob
+        from rq.exceptions import NoSuchJobError
+    except ImportError:
+        return None
+    try:
+        return RQJob.fetch(job_id, connection=client)
+    except NoSuchJobError:
+        return None
+    except Exception:
+        return None
+
+
+def report_progress(progress: float, stage: Optional[str] = None) -> None:
+    """Record progress on the current RQ job (no-op outside a worker)."""
+    try:
+        from rq import get_current_job
+    except ImportError:
+        return
+    job = get_current_job()
+    if job is None:
+        return
+    job.meta['progress'] = round(progress, 3)
+    if stage:
+        job.meta['stage'] = stage
+    job.save_meta()
@@ -0,0 +1,25 @@
+from __future__ import annotations
+from typing import Optional
+from flask import current_app
+
+
+def get_redis() -> Optional["redis.Redis"]:  # noqa: F821
+    """Return a Redis client for REDIS_URL shared by the current app.
+
+    Returns None when REDIS_URL is not configured or the redis package is not
+    installed. Creating the client does not connect; callers must still treat
+    every command as best-effort and catch connection errors.
+    """
+    url = current_app.config.get('REDIS_URL')
+    if not url:
+        return None
+    client = current_app.extensions.get('redis_client')
+    if client is None:
+        try:
+            import redis
+        except ImportError:
+            current_app.logger.info('redis package not installed; shared state disabled')
+            return None
+        client = redis.Redis.from_url(url, socket_connect_timeout=0.5, socket_timeout=0.5)
+        current_app.extensions['redis_client'] = client
+    return client
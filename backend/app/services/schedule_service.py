@@ -0,0 +1,210 @@
+"""Planning the print queue: which unit prints each READYTOPRINT job, and when.
+
+Each printer model (Job.printer) has PRINTER_UNITS identical machines. Jobs
+already PRINTING occupy their unit until their estimated end. Queued jobs are
+grouped by filament (material, color). Inside a group the shortest print goes
+first (SPT). Groups are ordered by mean print time, which minimises total
+waiting when a group runs as a block. Jobs are then list-scheduled: a min-heap
+of units keyed by free time gives the earliest unit. A heap per loaded filament
+gives the earliest unit that needs no swap. A job takes the swap-free unit
+unless another unit could start it sooner even after FILAMENT_SWAP_MINUTES.
+Planning is O(n log n) in queued jobs.
+
+Plans are cached per printer model and rebuilt only when that model's jobs
+change (or the plan is older than PLAN_MAX_AGE), so a status change on one
+printer does not re-plan the others.
+"""
+from __future__ import annotations
+import hashlib
+import heapq
+import os
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from flask import current_app
+import sqlalchemy as sa
+from app import db
+from app.models.event import Event
+from app.models.job import Job
+
+QUEUED_STATUS = 'READYTOPRINT'
+RUNNING_STATUS = 'PRINTING'
+DEFAULT_JOB_HOURS = 1.0
+# Queued start times drift with the clock; past this a cached plan is rebuilt anyway
+PLAN_MAX_AGE = timedelta(minutes=5)
+
+
+def printer_units() -> dict[str, int]:
+    """PRINTER_UNITS: machines per printer model, e.g. "Prusa MK4S=3, Prusa XL=1" (unlisted models: 1)."""
+    units = {}
+    for entry in os.environ.get('PRINTER_UNITS', '').split(','):
+        name, _, count = entry.rpartition('=')
+        try:
+            if name.strip():
+                units[name.strip()] = max(1, int(count))
+        except ValueError:
+            continue
+    return units
+
+
+def swap_hours() -> float:
+    """FILAMENT_SWAP_MINUTES: time lost changing material/color on a unit (default 15)."""
+    try:
+        return max(0.0, float(os.environ.get('FILAMENT_SWAP_MINUTES', 15))) / 60.0
+    except ValueError:
+        return 0.25
+
+
+def _batched(queued: list[dict]) -> list[dict]:
+    """Queued jobs grouped by filament, SPT inside a group, groups by mean print time."""
+    groups = defaultdict(list)
+    for job in queued:
+        groups[(job['material'], job['color'])].append(job)
+    for jobs in groups.values():
+        jobs.sort(key=lambda j: (j['hours'], j['created_at'], j['id']))
+    ordered = sorted(groups.values(), key=lambda jobs: (sum(j['hours'] for j in jobs) / len(jobs),
+                                                        min(j['created_at'] for j in jobs)))
+    return [job for jobs in ordered for job in jobs]
+
+
+def plan_printer(units: int, running: list[dict], queued: list[dict], swap: float) -> dict:
+    """Assign queued jobs to units. Times are hours from now.
+
+    running: {'id', 'material', 'color', 'remaining'}; queued: {'id', 'material', 'color',
+    'hours', 'created_at', ...}. Returns per-unit queues plus makespan, mean wait and swap count.
+    """
+    # Per unit: [free_at, loaded filament, version]; heap entries with a stale version are skipped
+    state = [[0.0, None, 0] for _ in range(units)]
+    earliest: list[tuple] = []
+    by_filament: dict[tuple, list[tuple]] = defaultdict(list)
+    queues: list[list[dict]] = [[] for _ in range(units)]
+
+    def occupy(unit: int, until: float, filament: tuple) -> None:
+        version = state[unit][2] + 1
+        state[unit] = [until, filament, version]
+        heapq.heappush(earliest, (until, unit, version))
+        heapq.heappush(by_filament[filament], (until, unit, version))
+
+    def top(heap: list[tuple]) -> Optional[tuple]:
+        while heap and heap[0][2] != state[heap[0][1]][2]:
+            heapq.heappop(heap)
+        return heap[0] if heap else None
+
+    for unit in range(units):
+        heapq.heappush(earliest, (0.0, unit, 0))
+
+    for job in sorted(running, key=lambda j: j['remaining']):
+        free_at, unit, _ = top(earliest)
+        occupy(unit, free_at + job['remaining'], (job['material'], job['color']))
+        queues[unit].append({'id': job['id'], 'material': job['material'], 'color': job['color'], 'running': True,
+                             'start_h': None, 'end_h': round(free_at + job['remaining'], 3)})
+
+    waits, swaps = [], 0
+    for job in _batched(queued):
+        filament = (job['material'], job['color'])
+        free_at, unit, _ = top(earliest)
+        loaded = state[unit][1]
+        start, swap_needed = free_at, loaded is not None and loaded != filament
+        if swap_needed:
+            start += swap
+            same = top(by_filament[filament])
+            if same is not None and same[0] <= start:
+                start, unit, swap_needed = same[0], same[1], False
+        end = start + job['hours']
+        occupy(unit, end, filament)
+        swaps += swap_needed
+        waits.append(start)
+        entry = {key: value for key, value in job.items() if key not in ('hours', 'created_at')}
+        entry.update({'running': False, 'swap': swap_needed, 'start_h': round(start, 3), 'end_h': round(end, 3)})
+        queues[unit].append(entry)
+
+    return {
+        'units': [{'unit': n + 1, 'jobs': jobs} for n, jobs in enumerate(queues)],
+        'makespan_hours': round(max((s[0] for s in state), default=0.0), 3),
+        'mean_wait_hours': round(sum(waits) / len(waits), 3) if waits else 0.0,
+        'swaps': swaps,
+        'queued': len(waits),
+    }
+
+
+def _rows(printer: Optional[str]) -> list:
+    query = (db.session.query(Job.id, Job.short_id, Job.display_name, Job.student_name, Job.printer, Job.material,
+                              Job.color, Job.time_hours, Job.status, Job.created_at, Job.updated_at)
+             .filter(Job.status.in_((QUEUED_STATUS, RUNNING_STATUS))))
+    if printer:
+        query = query.filter(Job.printer == printer)
+    return query.all()
+
+
+def _printing_started(job_ids: list[str]) -> dict[str, datetime]:
+    """When each PRINTING job was last marked printing, in one grouped query."""
+    if not job_ids:
+        return {}
+    rows = db.session.execute(
+        sa.select(Event.job_id, sa.func.max(Event.timestamp))
+        .where(Event.event_type == 'JobMarkedPrinting', Event.job_id.in_(job_ids))
+        .group_by(Event.job_id)
+    ).all()
+    return dict(rows)
+
+
+def _fingerprint(rows: list, units: int, swap: float) -> str:
+    digest = hashlib.sha1(f'{units}|{swap}'.encode())
+    for row in sorted(rows, key=lambda r: r.id):
+        digest.update(f'|{row.id}:{row.status}:{row.material}:{row.color}:{row.time_hours}:{row.updated_at}'.encode())
+    return digest.hexdigest()
+
+
+def _iso(when: datetime) -> str:
+    return when.replace(tzinfo=timezone.utc).isoformat()
+
+
+def _plan_model(printer: str, rows: list, units: int, swap: float, now: datetime) -> dict:
+    known = [r.time_hours for r in rows if r.time_hours]
+    fallback = sum(known) / len(known) if known else DEFAULT_JOB_HOURS
+    started = _printing_started([r.id for r in rows if r.status == RUNNING_STATUS])
+    running, queued = [], []
+    for r in rows:
+        hours = r.time_hours or fallback
+        if r.status == RUNNING_STATUS:
+            elapsed = (now - started.get(r.id, r.updated_at or now)).total_seconds() / 3600.0
+            running.append({'id': r.id, 'material': r.material, 'color': r.color, 'remaining': max(0.0, hours - elapsed)})
+        else:
+            queued.append({'id': r.id, 'short_id': r.short_id, 'display_name': r.display_name,
+                           'student_name': r.student_name, 'material': r.material, 'color': r.color,
+                           'time_hours': r.time_hours, 'estimated': not r.time_hours, 'hours': hours,
+                           'created_at': r.created_at or now})
+    plan = plan_printer(units, running, queued, swap)
+    for unit in plan['units']:
+        for job in unit['jobs']:
+            if job['start_h'] is not None:
+                job['start'] = _iso(now + timedelta(hours=job['start_h']))
+            job['end'] = _iso(now + timedelta(hours=job['end_h']))
+    plan.update({'printer': printer, 'unit_count': units, 'planned_at': _iso(now)})
+    return plan
+
+
+def build_queue(printer: Optional[str] = None, now: Optional[datetime] = None) -> dict:
+    """Per-printer plans for every READYTOPRINT job; only models whose jobs changed are re-planned."""
+    now = now or datetime.utcnow()
+    units, swap = printer_units(), swap_hours()
+    cache = current_app.extensions.setdefault('print_queue_plans', {})
+    by_printer = defaultdict(list)
+    for row in _rows(printer):
+        by_printer[row.printer].append(row)
+    if printer:
+        by_printer.setdefault(printer, [])
+    plans, replanned = [], []
+    for name in sorted(by_printer):
+        rows, count = by_printer[name], units.get(name, 1)
+        fingerprint = _fingerprint(rows, count, swap)
+        cached = cache.get(name)
+        if cached is None or cached[0] != fingerprint or now - cached[1] > PLAN_MAX_AGE:
+            cached = cache[name] = (fingerprint, now, _plan_model(name, rows, count, swap, now))
+            replanned.append(name)
+        plans.append(cached[2])
+    # Models with nothing queued or printing any more
+    if not printer:
+        for name in set(cache) - set(by_printer):
+            del cache[name]
+    return {'printers': plans, 'replanned': replanned, 'swap_minutes': round(swap * 60, 1)}
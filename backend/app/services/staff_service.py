@@ -0,0 +1,83 @@
+from __future__ import annotations
+import threading
+import time
+from typing import Optional
+from flask import current_app
+from app.models.staff import Staff
+from app.services.redis_service import get_redis
+
+
+# Redis key holding the cross-process staff directory version
+STAFF_VERSION_KEY = 'staff:version'
+
+
+def _cache_state() -> dict:
+    """Return the per-app cache state, creating it on first use."""
+    state = current_app.extensions.get('staff_cache')
+    if state is None:
+        state = current_app.extensions.setdefault('staff_cache', {
+            'lock': threading.Lock(),
+            'active': None,
+            'version': None,
+            'checked_at': 0.0,
+        })
+    return state
+
+
+def _shared_version() -> Optional[str]:
+    """Read the shared version stamp; None when Redis is unavailable."""
+    client = get_redis()
+    if client is None:
+        return None
+    try:
+        value = client.get(STAFF_VERSION_KEY)
+    except Exception:
+        return None
+    return value.decode() if isinstance(value, bytes) else (value or '0')
+
+
+def _is_fresh(state: dict, now: float) -> bool:
+    if state['active'] is None:
+        return False
+    # With Redis, every lookup compares the shared version so other workers see changes at once
+    version = _shared_version()
+    if version is not None:
+        return version == state['version']
+    # Without Redis, changes made by other processes show up once the TTL elapses
+    ttl = float(current_app.config.get('STAFF_CACHE_TTL', 5))
+    return now - state['checked_at'] < ttl
+
+
+def get_active_staff() -> dict[str, dict]:
+    """Return active staff keyed by name, served from the in-process cache when fresh."""
+    state = _cache_state()
+    now = time.monotonic()
+    if _is_fresh(state, now):
+        return state['active']
+    with state['lock']:
+        if _is_fresh(state, now):
+            return state['active']
+        version = _shared_version()
+        rows = Staff.query.filter_by(is_active=True).all()
+        state['active'] = {s.name: s.to_dict() for s in rows}
+        state['version'] = version
+        state['checked_at'] = time.monotonic()
+        return state['active']
+
+
+def is_active_staff(name: Optional[str]) -> bool:
+    return bool(name) and name in get_active_staff()
+
+
+def invalidate_staff_cache() -> None:
+    """Drop the local cache and bump the shared version so other processes reload."""
+    state = _cache_state()
+    with state['lock']:
+        state['active'] = None
+        state['version'] = None
+    client = get_redis()
+    if client is not None:
+        try:
+            client.incr(STAFF_VERSION_KEY)
+        except Exception:
+            current_app.logger.warning('Could not bump shared staff cache version')
@@ -0,0 +1,500 @@
+"""Storage backends for job files.
+
+Callers keep addressing files by the same STORAGE_PATH-style paths stored in
+the job table. LocalStorage treats them as filesystem paths. ObjectStorage
+maps them to object keys relative to the storage root, so several nodes can
+share a bucket instead of an NFS mount.
+
+Select with STORAGE_BACKEND=local (default) or STORAGE_BACKEND=s3 (S3_BUCKET,
+S3_ENDPOINT_URL, boto3 required). OBJECT_STORE_DIR swaps the S3 client for
+DirectoryObjectClient, a MinIO-style stand-in backed by a local directory.
+"""
+from __future__ import annotations
+from abc import ABC, abstractmethod
+import hashlib
+import io
+import os
+import shutil
+import threading
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import BinaryIO, Optional, Union
+from flask import current_app
+from app.services.file_service import storage_root
+
+PathLike = Union[str, Path]
+
+# S3 limits: single-request copies stop at 5 GiB; parts other than the last must be >= 5 MiB
+MAX_SINGLE_COPY = 5 * 1024 ** 3
+MIN_PART_SIZE = 5 * 1024 ** 2
+
+
+def is_partial_write(name: str) -> bool:
+    """True for the temp files writes are staged in before being renamed into place."""
+    return name.startswith('.') and name.endswith('.tmp')
+
+
+class StorageBackend(ABC):
+    """Interface shared by the backends; paths are the values stored in Job.file_path."""
+
+    is_local = True
+
+    @abstractmethod
+    def write(self, path: PathLike, data: Union[bytes, BinaryIO]) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def read(self, path: PathLike) -> bytes:
+        raise NotImplementedError
+
+    @abstractmethod
+    def open(self, path: PathLike) -> BinaryIO:
+        raise NotImplementedError
+
+    def exists(self, path: PathLike) -> bool:
+        return self.stat(path) is not None
+
+    @abstractmethod
+    def stat(self, path: PathLike) -> Optional[list[int]]:
+        """[size, mtime_ns], or None if the file does not exist."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete(self, path: PathLike) -> bool:
+        """Delete a file; returns False if it was already gone."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def copy(self, src: PathLike, dest: PathLike) -> None:
+        raise NotImplementedError
+
+    def move(self, src: PathLike, dest: PathLike) -> None:
+        """Copy then delete the source (the copy-update-delete order used for status moves)."""
+        self.copy(src, dest)
+        self.delete(src)
+
+    @abstractmethod
+    def listdir(self, directory: PathLike) -> dict[str, list[int]]:
+        """Files directly inside directory: name -> [size, mtime_ns]."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def walk(self, directory: PathLike) -> dict[str, list[int]]:
+        """Every file under directory, keyed by path relative to it: rel -> [size, mtime_ns]."""
+        raise NotImplementedError
+
+
+class LocalStorage(StorageBackend):
+    """Files on a local or mounted POSIX filesystem."""
+
+    def write(self, path, data) -> None:
+        """Write to a temp file beside the target, then swap it in: readers never see a partial file."""
+        target = Path(path)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp = target.with_name(f'.{target.name}.{uuid.uuid4().hex}.tmp')
+        try:
+            with open(tmp, 'wb') as f:
+                if isinstance(data, (bytes, bytearray)):
+                    f.write(data)
+                else:
+                    shutil.copyfileobj(data, f, 1024 * 1024)
+            os.replace(tmp, target)
+        except BaseException:
+            tmp.unlink(missing_ok=True)
+            raise
+
+    def read(self, path) -> bytes:
+        return Path(path).read_bytes()
+
+    def open(self, path) -> BinaryIO:
+        return open(path, 'rb')
+
+    def stat(self, path) -> Optional[list[int]]:
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return [st.st_size, st.st_mtime_ns]
+
+    def delete(self, path) -> bool:
+        try:
+            Path(path).unlink()
+            return True
+        except FileNotFoundError:
+            return False
+
+    def copy(self, src, dest) -> None:
+        Path(dest).parent.mkdir(parents=True, exist_ok=True)
+        shutil.copy2(src, dest)
+
+    def move(self, src, dest) -> None:
+        """Rename when both paths are on one filesystem; copy then delete otherwise."""
+        Path(dest).parent.mkdir(parents=True, exist_ok=True)
+        shutil.move(src, dest)
+
+    def listdir(self, directory) -> dict[str, list[int]]:
+        files: dict[str, list[int]] = {}
+        try:
+            with os.scandir(directory) as it:
+                for entry in it:
+                    try:
+                        if entry.is_file() and not is_partial_write(entry.name):
+                            st = entry.stat()
+                            files[entry.name] = [st.st_size, st.st_mtime_ns]
+                    except OSError:
+                        continue
+        except OSError:
+            pass
+        return files
+
+    def walk(self, directory) -> dict[str, list[int]]:
+        base = Path(directory)
+        files: dict[str, list[int]] = {}
+        for dirpath, _, names in os.walk(base):
+            for name in names:
+                if is_partial_write(name):
+                    continue
+                full = os.path.join(dirpath, name)
+                sig = self.stat(full)
+                if sig is not None:
+                    files[Path(full).relative_to(base).as_posix()] = sig
+        return files
+
+
+def _is_not_found(exc: Exception) -> bool:
+    code = str(getattr(exc, 'response', {}).get('Error', {}).get('Code', ''))
+    return code in ('404', 'NoSuchKey', 'NotFound')
+
+
+def _mtime_ns(value) -> int:
+    if isinstance(value, datetime):
+        return int(value.timestamp() * 1_000_000_000)
+    return int(value or 0)
+
+
+class ObjectStorage(StorageBackend):
+    """Files as objects in an S3-compatible bucket, addressed through a boto3-style client.
+
+    Uploads above multipart_threshold go up in part_size chunks; copies are
+    server-side (copy_object, or upload_part_copy above 5 GiB), so status moves
+    never stream file contents through the app.
+    """
+
+    is_local = False
+
+    def __init__(self, client, bucket: str, root: Path, part_size: int = 8 * 1024 ** 2,
+                 multipart_threshold: int = 16 * 1024 ** 2):
+        self.client = client
+        self.bucket = bucket
+        self.root = Path(os.path.abspath(root))
+        self.part_size = max(MIN_PART_SIZE, part_size)
+        self.multipart_threshold = multipart_threshold
+
+    def key_for(self, path: PathLike) -> str:
+        full = Path(os.path.abspath(path))
+        try:
+            return full.relative_to(self.root).as_posix()
+        except ValueError:
+            return full.resolve().relative_to(self.root.resolve()).as_posix()
+
+    def write(self, path, data) -> None:
+        key = self.key_for(path)
+        body = io.BytesIO(data) if isinstance(data, (bytes, bytearray)) else data
+        size = _remaining(body)
+        if size is not None and size <= self.multipart_threshold:
+            self.client.put_object(Bucket=self.bucket, Key=key, Body=body.read())
+            return
+        upload_id = self.client.create_multipart_upload(Bucket=self.bucket, Key=key)['UploadId']
+        try:
+            parts = []
+            number = 1
+            while True:
+                chunk = body.read(self.part_size)
+                if not chunk and parts:
+                    break
+                resp = self.client.upload_part(Bucket=self.bucket, Key=key, UploadId=upload_id,
+                                               PartNumber=number, Body=chunk)
+                parts.append({'PartNumber': number, 'ETag': resp['ETag']})
+                number += 1
+                if len(chunk) < self.part_size:
+                    break
+            self.client.complete_multipart_upload(Bucket=self.bucket, Key=key, UploadId=upload_id,
+                                                  MultipartUpload={'Parts': parts})
+        except Exception:
+            self.client.abort_multipart_upload(Bucket=self.bucket, Key=key, UploadId=upload_id)
+            raise
+
+    def read(self, path) -> bytes:
+        body = self.open(path)
+        try:
+            return body.read()
+        finally:
+            body.close()
+
+    def open(self, path) -> BinaryIO:
+        try:
+            return self.client.get_object(Bucket=self.bucket, Key=self.key_for(path))['Body']
+        except Exception as exc:
+            if _is_not_found(exc):
+                raise FileNotFoundError(str(path)) from exc
+            raise
+
+    def stat(self, path) -> Optional[list[int]]:
+        try:
+            head = self.client.head_object(Bucket=self.bucket, Key=self.key_for(path))
+        except Exception as exc:
+            if _is_not_found(exc):
+                return None
+            raise
+        return [int(head['ContentLength']), _mtime_ns(head.get('LastModified'))]
+
+    def delete(self, path) -> bool:
+        existed = self.exists(path)
+        self.client.delete_object(Bucket=self.bucket, Key=self.key_for(path))
+        return existed
+
+    def copy(self, src, dest) -> None:
+        src_key, dest_key = self.key_for(src), self.key_for(dest)
+        source = {'Bucket': self.bucket, 'Key': src_key}
+        sig = self.stat(src)
+        if sig is None:
+            raise FileNotFoundError(str(src))
+        if sig[0] <= MAX_SINGLE_COPY:
+            self.client.copy_object(Bucket=self.bucket, Key=dest_key, CopySource=source)
+            return
+        upload_id = self.client.create_multipart_upload(Bucket=self.bucket, Key=dest_key)['UploadId']
+        try:
+            parts = []
+            part_size = max(self.part_size, -(-sig[0] // 10_000))
+            for number, start in enumerate(range(0, sig[0], part_size), start=1):
+                end = min(start + part_size, sig[0]) - 1
+                resp = self.client.upload_part_copy(Bucket=self.bucket, Key=dest_key, UploadId=upload_id,
+                                                    PartNumber=number, CopySource=source,
+                                                    CopySourceRange=f'bytes={start}-{end}')
+                parts.append({'PartNumber': number, 'ETag': resp['CopyPartResult']['ETag']})
+            self.client.complete_multipart_upload(Bucket=self.bucket, Key=dest_key, UploadId=upload_id,
+                                                  MultipartUpload={'Parts': parts})
+        except Exception:
+            self.client.abort_multipart_upload(Bucket=self.bucket, Key=dest_key, UploadId=upload_id)
+            raise
+
+    def _list(self, prefix: str, delimiter: bool) -> dict[str, list[int]]:
+        files: dict[str, list[int]] = {}
+        kwargs = {'Bucket': self.bucket, 'Prefix': prefix}
+        if delimiter:
+            kwargs['Delimiter'] = '/'
+        while True:
+            page = self.client.list_objects_v2(**kwargs)
+            for obj in page.get('Contents', []):
+                files[obj['Key'][len(prefix):]] = [int(obj['Size']), _mtime_ns(obj.get('LastModified'))]
+            if not page.get('IsTruncated'):
+                return files
+            kwargs['ContinuationToken'] = page['NextContinuationToken']
+
+    def listdir(self, directory) -> dict[str, list[int]]:
+        return self._list(self.key_for(directory).rstrip('/') + '/', delimiter=True)
+
+    def walk(self, directory) -> dict[str, list[int]]:
+        return self._list(self.key_for(directory).rstrip('/') + '/', delimiter=False)
+
+    def presigned_url(self, path, filename: str, expires_in: int = 300) -> Optional[str]:
+        """Time-limited download URL, when the client can sign one."""
+        if not hasattr(self.client, 'generate_presigned_url'):
+            return None
+        return self.client.generate_presigned_url('get_object', ExpiresIn=expires_in, Params={
+            'Bucket': self.bucket, 'Key': self.key_for(path),
+            'ResponseContentDisposition': f'attachment; filename="{filename}"',
+        })
+
+
+def _remaining(body: BinaryIO) -> Optional[int]:
+    try:
+        pos = body.tell()
+        end = body.seek(0, io.SEEK_END)
+        body.seek(pos)
+        return end - pos
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+class ObjectStoreError(Exception):
+    """Mirrors botocore's ClientError shape (exc.response['Error']['Code'])."""
+
+    def __init__(self, code: str, message: str = ''):
+        super().__init__(f'{code}: {message}' if message else code)
+        self.response = {'Error': {'Code': code, 'Message': message}}
+
+
+class DirectoryObjectClient:
+    """MinIO-style stand-in implementing the subset of the boto3 S3 client used by ObjectStorage.
+
+    Objects live at <base>/<bucket>/<key>, in-flight multipart parts under
+    <base>/.multipart/<upload id>/. There is no real file hierarchy: listing
+    works by key prefix, as in S3.
+    """
+
+    def __init__(self, base: PathLike):
+        self.base = Path(base)
+        self._lock = threading.Lock()
+        self.calls: dict[str, int] = {}
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+
+    def _path(self, bucket: str, key: str) -> Path:
+        if not key or key.startswith('/') or '..' in key.split('/'):
+            raise ObjectStoreError('InvalidKey', key)
+        return self.base / bucket / key
+
+    def _meta(self, path: Path, key: str) -> dict:
+        try:
+            st = path.stat()
+        except OSError:
+            raise ObjectStoreError('NoSuchKey', key)
+        return {
+            'ContentLength': st.st_size,
+            'LastModified': datetime.fromtimestamp(st.st_mtime, tz=timezone.utc),
+            'ETag': f'"{st.st_size:x}-{st.st_mtime_ns:x}"',
+        }
+
+    def _store(self, target: Path, fill) -> None:
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp = target.with_name(f'.{target.name}.{uuid.uuid4().hex}.tmp')
+        with open(tmp, 'wb') as f:
+            fill(f)
+        os.replace(tmp, target)
+
+    def put_object(self, Bucket, Key, Body=b'', **_):
+        self._count('put_object')
+        data = Body if isinstance(Body, (bytes, bytearray)) else Body.read()
+        self._store(self._path(Bucket, Key), lambda f: f.write(data))
+        return {'ETag': f'"{hashlib.md5(data).hexdigest()}"'}
+
+    def get_object(self, Bucket, Key, **_):
+        self._count('get_object')
+        path = self._path(Bucket, Key)
+        meta = self._meta(path, Key)
+        return {**meta, 'Body': open(path, 'rb')}
+
+    def head_object(self, Bucket, Key, **_):
+        self._count('head_object')
+        return self._meta(self._path(Bucket, Key), Key)
+
+    def delete_object(self, Bucket, Key, **_):
+        self._count('delete_object')
+        try:
+            self._path(Bucket, Key).unlink()
+        except FileNotFoundError:
+            pass
+        return {}
+
+    def copy_object(self, Bucket, Key, CopySource, **_):
+        self._count('copy_object')
+        src = self._path(CopySource['Bucket'], CopySource['Key'])
+        if not src.is_file():
+            raise ObjectStoreError('NoSuchKey', CopySource['Key'])
+        self._store(self._path(Bucket, Key), lambda f: f.write(src.read_bytes()))
+        return {'CopyObjectResult': self._meta(self._path(Bucket, Key), Key)}
+
+    def list_objects_v2(self, Bucket, Prefix='', Delimiter=None, ContinuationToken=None, MaxKeys=1000, **_):
+        self._count('list_objects_v2')
+        bucket_dir = self.base / Bucket
+        keys = []
+        for dirpath, _, names in os.walk(bucket_dir):
+            for name in names:
+                if is_partial_write(name):
+                    continue
+                key = Path(dirpath, name).relative_to(bucket_dir).as_posix()
+                if key.startswith(Prefix) and not (Delimiter and Delimiter in key[len(Prefix):]):
+                    keys.append(key)
+        keys.sort()
+        start = int(ContinuationToken or 0)
+        page = keys[start:start + MaxKeys]
+        truncated = start + MaxKeys < len(keys)
+        contents = []
+        for key in page:
+            meta = self._meta(bucket_dir / key, key)
+            contents.append({'Key': key, 'Size': meta['ContentLength'], 'LastModified': meta['LastModified']})
+        result = {'Contents': contents, 'IsTruncated': truncated}
+        if truncated:
+            result['NextContinuationToken'] = str(start + MaxKeys)
+        return result
+
+    def create_multipart_upload(self, Bucket, Key, **_):
+        self._count('create_multipart_upload')
+        upload_id = uuid.uuid4().hex
+        (self.base / '.multipart' / upload_id).mkdir(parents=True)
+        return {'UploadId': upload_id, 'Bucket': Bucket, 'Key': Key}
+
+    def _part_path(self, upload_id: str, number: int) -> Path:
+        directory = self.base / '.multipart' / upload_id
+        if not directory.is_dir():
+            raise ObjectStoreError('NoSuchUpload', upload_id)
+        return directory / f'{number:05d}'
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body, **_):
+        self._count('upload_part')
+        data = Body if isinstance(Body, (bytes, bytearray)) else Body.read()
+        self._part_path(UploadId, PartNumber).write_bytes(data)
+        return {'ETag': f'"{hashlib.md5(data).hexdigest()}"'}
+
+    def upload_part_copy(self, Bucket, Key, UploadId, PartNumber, CopySource, CopySourceRange, **_):
+        self._count('upload_part_copy')
+        start, end = (int(v) for v in CopySourceRange.split('=', 1)[1].split('-'))
+        with open(self._path(CopySource['Bucket'], CopySource['Key']), 'rb') as f:
+            f.seek(start)
+            data = f.read(end - start + 1)
+        self._part_path(UploadId, PartNumber).write_bytes(data)
+        return {'CopyPartResult': {'ETag': f'"{hashlib.md5(data).hexdigest()}"'}}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload, **_):
+        self._count('complete_multipart_upload')
+        numbers = [p['PartNumber'] for p in MultipartUpload['Parts']]
+        if numbers != sorted(numbers) or not numbers:
+            raise ObjectStoreError('InvalidPartOrder', UploadId)
+        part_paths = [self._part_path(UploadId, n) for n in numbers]
+
+        def fill(f):
+            for part in part_paths:
+                with open(part, 'rb') as src:
+                    shutil.copyfileobj(src, f, 1024 * 1024)
+
+        self._store(self._path(Bucket, Key), fill)
+        shutil.rmtree(self.base / '.multipart' / UploadId, ignore_errors=True)
+        return {'Bucket': Bucket, 'Key': Key}
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId, **_):
+        self._count('abort_multipart_upload')
+        shutil.rmtree(self.base / '.multipart' / UploadId, ignore_errors=True)
+        return {}
+
+
+_local = LocalStorage()
+
+
+def get_storage_backend() -> StorageBackend:
+    """Backend for STORAGE_BACKEND, cached on the app per configuration."""
+    kind = os.environ.get('STORAGE_BACKEND', 'local').strip().lower()
+    if kind in ('', 'local'):
+        return _local
+    root = Path(os.path.abspath(storage_root()))
+    config = (kind, str(root), os.environ.get('S3_BUCKET', 'fablab'), os.environ.get('OBJECT_STORE_DIR'),
+              os.environ.get('S3_ENDPOINT_URL'))
+    cached = current_app.extensions.get('storage_backend')
+    if cached is not None and cached[0] == config:
+        return cached[1]
+    _, _, bucket, store_dir, endpoint = config
+    if store_dir:
+        client = DirectoryObjectClient(store_dir)
+    else:
+        import boto3  # optional: only needed for a real object store
+        client = boto3.client('s3', endpoint_url=endpoint or None)
+    backend = ObjectStorage(
+        client, bucket, root,
+        part_size=int(os.environ.get('S3_MULTIPART_PART_SIZE', 8 * 1024 ** 2)),
+        multipart_threshold=int(os.environ.get('S3_MULTIPART_THRESHOLD', 16 * 1024 ** 2)),
+    )
+    current_app.extensions['storage_backend'] = (config, backend)
+    return backend
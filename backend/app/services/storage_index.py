@@ -0,0 +1,266 @@
+from __future__ import annotations
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+from flask import current_app
+from app.services.file_service import RACY_NS, STATUS_TO_DIR, storage_root
+from app.services.storage_backend import get_storage_backend, is_partial_write
+
+
+def scan_dir(directory: Path, previous: Optional[dict]) -> tuple[Optional[dict], bool]:
+    """Return ({'mtime_ns', 'racy', 'files': {name: [size, mtime_ns]}, 'subdirs': [...]}, reused) for a directory.
+
+    The previous listing is reused when the directory mtime is unchanged, since
+    adding, removing or renaming entries always bumps it. Otherwise the
+    directory is listed with os.scandir and each DirEntry's stat is used as-is.
+    """
+    try:
+        dir_stat = os.stat(directory)
+    except OSError:
+        return None, False
+    if previous and previous.get('mtime_ns') == dir_stat.st_mtime_ns and not previous.get('racy'):
+        return previous, True
+    # If the directory changed within the last second, rescan next time
+    racy = time.time_ns() - dir_stat.st_mtime_ns < RACY_NS
+    files: dict[str, list[int]] = {}
+    subdirs: list[str] = []
+    with os.scandir(directory) as it:
+        for entry in it:
+            try:
+                if entry.is_dir():
+                    subdirs.append(entry.name)
+                    continue
+                if not entry.is_file() or is_partial_write(entry.name):
+                    continue
+                st = entry.stat()
+            except OSError:
+                continue
+            files[entry.name] = [st.st_size, st.st_mtime_ns]
+    return {'mtime_ns': dir_stat.st_mtime_ns, 'racy': racy, 'files': files, 'subdirs': sorted(subdirs)}, False
+
+
+class StorageIndex:
+    """Live listing of the status directories (and their shards) under a storage root.
+
+    Listings are keyed by path relative to the root ('Uploaded', 'Uploaded/ab').
+    With watchdog installed, filesystem events refresh the affected directory
+    immediately; otherwise a daemon thread polls directory mtimes every
+    `interval` seconds. Either way, refresh() brings the index up to date
+    synchronously.
+    """
+
+    def __init__(self, root: Path, interval: float = 2.0):
+        self.root = root
+        self.interval = interval
+        self.mode = 'manual'
+        self._lock = threading.Lock()
+        self._listings: dict[str, dict] = {}
+        self._versions: dict[str, int] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._observer = None
+        self.refresh()
+
+    # -- maintenance -------------------------------------------------------
+
+    def _rescan(self, rel: str) -> Optional[dict]:
+        with self._lock:
+            previous = self._listings.get(rel)
+        listing, reused = scan_dir(self.root / rel, previous)
+        if reused:
+            return listing
+        with self._lock:
+            if listing is None:
+                self._drop(rel)
+            else:
+                self._listings[rel] = listing
+                self._versions[rel] = self._versions.get(rel, 0) + 1
+            if '/' not in rel:
+                # Forget shard subdirectories that disappeared
+                keep = {f'{rel}/{sub}' for sub in (listing or {}).get('subdirs', [])}
+                for gone in [k for k in self._listings if k.startswith(f'{rel}/') and k not in keep]:
+                    self._drop(gone)
+        return listing
+
+    def _drop(self, rel: str) -> None:
+        self._listings.pop(rel, None)
+        self._versions[rel] = self._versions.get(rel, 0) + 1
+
+    def _refresh_status_dir(self, dirname: str) -> None:
+        listing = self._rescan(dirname)
+        for sub in (listing or {}).get('subdirs', []):
+            self._rescan(f'{dirname}/{sub}')
+
+    def refresh(self) -> None:
+        """Re-check every status directory and shard, rescanning those whose mtime changed."""
+        for dirname in sorted(set(STATUS_TO_DIR.values())):
+            self._refresh_status_dir(dirname)
+
+    def refresh_path(self, path: str) -> None:
+        """Bring the index up to date for a path reported by a filesystem event."""
+        try:
+            parts = Path(os.path.abspath(path)).relative_to(self.root).parts
+        except ValueError:
+            return
+        if not parts or parts[0] not in STATUS_TO_DIR.values() or len(parts) > 3:
+            return
+        # Creating, removing or renaming an entry bumps its parent's mtime, so
+        # rescanning the parent picks it up; unknown shards come via their status dir
+        parent = '/'.join(parts[:-1])
+        with self._lock:
+            known = parent in self._listings
+        if len(parts) == 3 and known:
+            self._rescan(parent)
+        else:
+            self._refresh_status_dir(parts[0])
+        with self._lock:
+            # In-place writes do not bump the directory mtime: update the file's entry directly
+            listing = self._listings.get(parent)
+            if listing is not None and parts[-1] in listing['files']:
+                try:
+                    st = os.stat(path)
+                    listing['files'][parts[-1]] = [st.st_size, st.st_mtime_ns]
+                except OSError:
+                    listing['files'].pop(parts[-1], None)
+
+    # -- background watching ----------------------------------------------
+
+    def start(self, mode: str = 'auto') -> None:
+        if mode != 'poll':
+            try:
+                self._start_watchdog()
+                self.mode = 'inotify'
+                return
+            except ImportError:
+                if mode == 'inotify':
+                    current_app.logger.warning('watchdog is not installed; polling storage instead')
+        self._thread = threading.Thread(target=self._poll, name='storage-index-poll', daemon=True)
+        self._thread.start()
+        self.mode = 'poll'
+
+    def _start_watchdog(self) -> None:
+        from watchdog.events import FileSystemEventHandler
+        from watchdog.observers import Observer
+
+        index = self
+
+        class _Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                for path in (getattr(event, 'src_path', None), getattr(event, 'dest_path', None)):
+                    if path:
+                        index.refresh_path(os.fsdecode(path))
+
+        self.root.mkdir(parents=True, exist_ok=True)
+        observer = Observer()
+        observer.schedule(_Handler(), str(self.root), recursive=True)
+        observer.daemon = True
+        observer.start()
+        self._observer = observer
+
+    def _poll(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.refresh()
+            except Exception:
+                pass
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._observer is not None:
+            self._observer.stop()
+
+    # -- queries -----------------------------------------------------------
+
+    def listings(self) -> dict[str, dict]:
+        """Copy of every directory listing, keyed by path relative to the root."""
+        with self._lock:
+            return {rel: {**listing, 'files': dict(listing['files'])} for rel, listing in self._listings.items()}
+
+    def names(self, directory: Path) -> Optional[tuple[int, frozenset[str]]]:
+        """(version, file names) for an indexed directory, or None if it is not indexed."""
+        try:
+            rel = directory.resolve().relative_to(self.root).as_posix()
+        except ValueError:
+            return None
+        with self._lock:
+            listing = self._listings.get(rel)
+            if listing is None:
+                return None
+            return self._versions[rel], frozenset(listing['files'])
+
+    def usage(self) -> dict[str, dict]:
+        """Files and bytes per status directory, shards included."""
+        totals: dict[str, dict] = {}
+        with self._lock:
+            for rel, listing in self._listings.items():
+                bucket = totals.setdefault(rel.split('/', 1)[0], {'files': 0, 'bytes': 0})
+                bucket['files'] += len(listing['files'])
+                bucket['bytes'] += sum(sig[0] for sig in listing['files'].values())
+        return totals
+
+
+_index_lock = threading.Lock()
+
+
+def get_storage_index() -> Optional[StorageIndex]:
+    """Return this process's live storage index, starting it on first use.
+
+    Returns None unless STORAGE_WATCH is set: 'auto' (or 'inotify') uses
+    watchdog when it is installed and polls otherwise; 'poll' always polls.
+    Started lazily so the gunicorn master never owns the watcher threads.
+    """
+    mode = os.environ.get('STORAGE_WATCH', 'off').strip().lower()
+    if mode in ('', '0', 'off', 'false', 'no') or not get_storage_backend().is_local:
+        # Object storage has no filesystem to watch
+        return None
+    root = storage_root().resolve()
+    index = current_app.extensions.get('storage_index')
+    if index is not None and index.root == root:
+        return index
+    with _index_lock:
+        index = current_app.extensions.get('storage_index')
+        if index is not None and index.root == root:
+            return index
+        if index is not None:
+            index.stop()
+        index = StorageIndex(root, interval=float(os.environ.get('STORAGE_WATCH_INTERVAL', 2)))
+        index.start(mode)
+        current_app.extensions['storage_index'] = index
+        return index
+
+
+def storage_usage() -> dict:
+    """Per-status file counts and bytes, from the live index when enabled, else a direct scan."""
+    index = get_storage_index()
+    if index is not None:
+        by_dir, source = index.usage(), f'index:{index.mode}'
+    elif not get_storage_backend().is_local:
+        by_dir, source = {}, 'object_store'
+        backend = get_storage_backend()
+        for dirname in sorted(set(STATUS_TO_DIR.values())):
+            files = backend.walk(storage_root() / dirname)
+            if files:
+                by_dir[dirname] = {'files': len(files), 'bytes': sum(sig[0] for sig in files.values())}
+    else:
+        by_dir, source = {}, 'scan'
+        root = storage_root()
+        for dirname in sorted(set(STATUS_TO_DIR.values())):
+            pending = [dirname]
+            while pending:
+                rel = pending.pop()
+                listing, _ = scan_dir(root / rel, None)
+                if listing is None:
+                    continue
+                bucket = by_dir.setdefault(dirname, {'files': 0, 'bytes': 0})
+                bucket['files'] += len(listing['files'])
+                bucket['bytes'] += sum(sig[0] for sig in listing['files'].values())
+                if rel == dirname:
+                    pending.extend(f'{dirname}/{sub}' for sub in listing['subdirs'])
+    return {
+        'source': source,
+        'by_status_dir': by_dir,
+        'total_files': sum(b['files'] for b in by_dir.values()),
+        'total_bytes': sum(b['bytes'] for b in by_dir.values()),
+    }
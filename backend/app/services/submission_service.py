@@ -0,0 +1,298 @@
+"""Turning an upload into a job, either inside the request or later on the worker.
+
+With SUBMIT_ASYNC enabled the request only streams the upload to
+STORAGE_PATH/Incoming and records a Submission row. The worker then does the
+expensive steps: hashing, duplicate lookup, short_id probing, placing the file
+and metadata, analysis and the confirmation email.
+"""
+from __future__ import annotations
+import hashlib
+import os
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import BinaryIO, Callable, Mapping, Optional, Union
+from uuid import uuid4
+import sqlalchemy as sa
+from flask import current_app
+from app import db
+from app.models.job import Job
+from app.models.submission import Submission
+from app.services.email_service import send_submission_confirmation_email
+from app.services.event_service import log_event
+from app.services.file_service import status_dir, storage_root
+from app.services.mesh_service import schedule_analysis
+from app.services.metadata_service import save_metadata
+from app.services.storage_backend import get_storage_backend
+
+INCOMING_DIRNAME = 'Incoming'
+ACTIVE_STATUSES = ['UPLOADED', 'PENDING', 'READYTOPRINT']
+FORM_FIELDS = (
+    'student_name', 'student_first_name', 'student_last_name', 'student_email', 'discipline',
+    'class_number', 'printer', 'color', 'material', 'print_method',
+)
+# Submission states the worker will not touch again
+FINAL_STATES = ('DONE', 'DUPLICATE')
+
+
+def submit_async_enabled() -> bool:
+    """SUBMIT_ASYNC: accept uploads with 202 and build the job on the worker."""
+    return os.environ.get('SUBMIT_ASYNC', 'false').strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def incoming_dir() -> Path:
+    return storage_root() / INCOMING_DIRNAME
+
+
+def normalize_name_for_filename(name: str) -> str:
+    # Remove non-alphanumerics, collapse spaces, PascalCase words
+    parts = [p for p in name.strip().replace('_', ' ').split() if p]
+    joined = ''.join(w.capitalize() for w in parts)
+    # Keep only alphanumerics
+    return ''.join(ch for ch in joined if ch.isalnum()) or 'Student'
+
+
+def normalize_simple_label(value: str) -> str:
+    # Convert to TitleCase words and remove spaces
+    parts = [p for p in value.strip().replace('_', ' ').split() if p]
+    labeled = ''.join(w.capitalize() for w in parts)
+    return ''.join(ch for ch in labeled if ch.isalnum()) or 'Value'
+
+
+def hash_file(path: Union[str, Path]) -> str:
+    """SHA-256 of a stored file, read in 1 MiB chunks."""
+    digest = hashlib.sha256()
+    with get_storage_backend().open(path) as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def find_duplicate(file_hash: str, student_email: Optional[str]) -> Optional[Job]:
+    """An active job by the same student with the same file contents."""
+    return Job.query.filter(
+        Job.file_hash == file_hash,
+        Job.student_email == student_email,
+        Job.status.in_(ACTIVE_STATUSES)
+    ).first()
+
+
+def create_job(form: Mapping, original_filename: str, file_hash: str,
+               place: Callable[[str], None], job_id: Optional[str] = None) -> Job:
+    """Place the upload under its standardized name and add the job and its metadata (not committed).
+
+    place(path) writes the model file to path through the storage backend.
+    """
+    # Generate job ID and standardized filenames
+    new_id = job_id or uuid4().hex
+    # Generate a human-friendly short id (ensure uniqueness by retrying with more chars if needed)
+    for length in (6, 7, 8, 9, 10, 11, 12):
+        candidate_short = new_id[:length]
+        if not Job.query.filter_by(short_id=candidate_short).first():
+            short_id = candidate_short
+            break
+    else:
+        short_id = new_id[:12]
+
+    # Prepare storage directory: STORAGE_PATH/Uploaded, or its shard when STORAGE_SHARDING is set
+    storage_dir = str(status_dir(storage_root(), 'UPLOADED', short_id))
+    backend = get_storage_backend()
+    ext = original_filename.rsplit('.', 1)[1].lower()
+    # Determine student name: prefer single field, else combine first/last
+    student_name = form.get('student_name')
+    if not student_name:
+        first_name = form.get('student_first_name')
+        last_name = form.get('student_last_name')
+        student_name = f"{first_name or ''} {last_name or ''}".strip()
+    normalized_student = normalize_name_for_filename(student_name or 'Student')
+
+    # Derive print method/material and color
+    raw_method = form.get('material') or form.get('print_method') or ''
+    raw_color = form.get('color') or ''
+    normalized_method = normalize_simple_label(raw_method or 'Method')
+    normalized_color = normalize_simple_label(raw_color or 'Color')
+
+    # Short/simple Job ID
+    simple_id = short_id
+    standardized_base = f"{normalized_student}_{normalized_method}_{normalized_color}_{simple_id}"
+    standardized_name = f"{standardized_base}.{ext}"
+    file_path = os.path.join(storage_dir, standardized_name)
+
+    # Save file (ensure unique by appending counter if exists)
+    base_name = standardized_base
+    candidate_name = standardized_name
+    candidate_path = file_path
+    counter = 1
+    while backend.exists(candidate_path):
+        candidate_name = f"{base_name}_{counter}.{ext}"
+        candidate_path = os.path.join(storage_dir, candidate_name)
+        counter += 1
+    place(candidate_path)
+
+    # Create metadata JSON
+    metadata = {
+        'student_name': student_name,
+        'student_email': form.get('student_email'),
+        'discipline': form.get('discipline'),
+        'class_number': form.get('class_number'),
+        'printer': form.get('printer'),
+        'color': raw_color,
+        'material': raw_method,
+        'status': 'UPLOADED',
+        'created_at': datetime.utcnow().isoformat()
+    }
+    metadata_base = base_name if counter == 1 else f"{base_name}_{counter-1}"
+    metadata_path = os.path.join(storage_dir, f"{metadata_base}_metadata.json")
+
+    job = Job(
+        id=new_id,
+        short_id=short_id,
+        student_name=student_name,
+        student_email=form.get('student_email'),
+        discipline=form.get('discipline'),
+        class_number=form.get('class_number'),
+        original_filename=original_filename,
+        display_name=candidate_name,
+        file_path=candidate_path,
+        metadata_path=metadata_path,
+        file_hash=file_hash,
+        printer=form.get('printer'),
+        color=raw_color,
+        material=raw_method
+    )
+    db.session.add(job)
+    # Stored in job_metadata; the JSON sidecar is written too with METADATA_SIDECAR_MODE=mirror
+    save_metadata(job, metadata)
+    return job
+
+
+def finish_job(job: Job) -> None:
+    """Steps after the job is committed: creation event, mesh analysis and the confirmation email."""
+    log_event(job.id, 'JobCreated', {'original_filename': job.original_filename})
+
+    # Mesh measurements for the approval form; never blocks the submission
+    try:
+        schedule_analysis(job)
+    except Exception:
+        current_app.logger.warning('Mesh analysis failed for job %s', job.id, exc_info=True)
+
+    # Fire-and-forget best-effort submission confirmation email
+    try:
+        send_submission_confirmation_email(job)
+    except Exception:
+        pass
+
+
+def accept_submission(form: Mapping, original_filename: str, stream: Union[bytes, BinaryIO]) -> Submission:
+    """Stream the upload to Incoming/ and record a queued submission (committed)."""
+    submission_id = uuid4().hex
+    ext = original_filename.rsplit('.', 1)[1].lower()
+    incoming_path = str(incoming_dir() / f'{submission_id}.{ext}')
+    get_storage_backend().write(incoming_path, stream)
+    submission = Submission(
+        id=submission_id,
+        form={key: form.get(key) for key in FORM_FIELDS if form.get(key) is not None},
+        original_filename=original_filename,
+        incoming_path=incoming_path,
+    )
+    db.session.add(submission)
+    db.session.commit()
+    return submission
+
+
+def queue_submission(submission: Submission) -> bool:
+    """Hand a submission to the worker; False when no queue is available."""
+    from app.services.queue_service import enqueue
+
+    return enqueue('app.tasks.process_submission', submission.id, queue='submissions', job_timeout=600) is not None
+
+
+def claim_submission(submission_id: str, reclaim_after: Optional[timedelta] = None) -> bool:
+    """Atomically move a submission to PROCESSING; False if another worker (or run) already has it.
+
+    QUEUED and FAILED submissions can be claimed; with reclaim_after, so can PROCESSING ones
+    untouched for that long (their worker died).
+    """
+    now = datetime.utcnow()
+    claimable = Submission.status.in_(('QUEUED', 'FAILED'))
+    if reclaim_after is not None:
+        claimable = sa.or_(claimable, sa.and_(Submission.status == 'PROCESSING',
+                                              Submission.updated_at < now - reclaim_after))
+    claimed = (Submission.query
+               .filter(Submission.id == submission_id, claimable)
+               .update({'status': 'PROCESSING', 'attempts': sa.func.coalesce(Submission.attempts, 0) + 1,
+                        'updated_at': now}, synchronize_session=False))
+    db.session.commit()
+    return claimed == 1
+
+
+def process_submission(submission_id: str, reclaim_after: Optional[timedelta] = None) -> Optional[Submission]:
+    """Build the job for a queued submission. Only the caller that claims it does the work, so the worker
+    and `flask process-submissions` never file it twice; others get its current state back."""
+    if db.session.get(Submission, submission_id) is None:
+        return None
+    claimed = claim_submission(submission_id, reclaim_after)
+    submission = db.session.get(Submission, submission_id)
+    db.session.refresh(submission)
+    if not claimed:
+        return submission
+
+    backend = get_storage_backend()
+    job = None
+    placed: list[str] = []
+
+    def place(dest: str) -> None:
+        # A rename (local) or server-side copy (object store): the upload is not written again
+        backend.move(submission.incoming_path, dest)
+        placed.append(dest)
+
+    try:
+        file_hash = hash_file(submission.incoming_path)
+        existing = find_duplicate(file_hash, submission.form.get('student_email'))
+        if existing:
+            submission.status = 'DUPLICATE'
+            submission.existing_job_id = existing.id
+        else:
+            job = create_job(submission.form, submission.original_filename, file_hash, place, job_id=submission.id)
+            submission.status = 'DONE'
+            submission.job_id = job.id
+        submission.error = None
+        db.session.commit()
+    except Exception as exc:
+        db.session.rollback()
+        current_app.logger.warning('Submission %s failed', submission_id, exc_info=True)
+        # Nothing was committed: put the upload back so a retry starts from the same state,
+        # and drop any sidecar written for the job that never existed
+        for dest in placed:
+            try:
+                backend.move(dest, submission.incoming_path)
+            except OSError:
+                pass
+        if job is not None and job.metadata_path:
+            try:
+                backend.delete(job.metadata_path)
+            except OSError:
+                pass
+        submission.status = 'FAILED'
+        submission.error = str(exc)
+        db.session.commit()
+        return submission
+
+    if job is None:
+        # Duplicate: the upload is not needed
+        try:
+            backend.delete(submission.incoming_path)
+        except OSError:
+            pass
+    else:
+        finish_job(job)
+    return submission
+
+
+def pending_submissions(stale_after: timedelta, include_failed: bool = False):
+    """Submissions the worker never finished: queued or processing for longer than stale_after."""
+    states = ['QUEUED', 'PROCESSING'] + (['FAILED'] if include_failed else [])
+    cutoff = datetime.utcnow() - stale_after
+    return (Submission.query
+            .filter(Submission.status.in_(states), Submission.updated_at < cutoff)
+            .order_by(Submission.created_at)
+            .all())
@@ -0,0 +1,108 @@
+"""Background tasks executed by the RQ worker (`rq worker --url $REDIS_URL`).
+
+Each task runs inside an app context created once per worker process.
+"""
+from __future__ import annotations
+from app import create_app
+
+_app = None
+
+
+def _get_app():
+    global _app
+    if _app is None:
+        _app = create_app()
+    return _app
+
+
+def run_audit_job(full: bool = False, integrity: bool = False) -> dict:
+    """Run the storage audit, cache the report, and return a short summary."""
+    from app.services.audit_service import perform_audit, save_cached_report
+    from app.services.queue_service import report_progress
+
+    with _get_app().app_context():
+        report = perform_audit(full=full, progress=report_progress, integrity=integrity)
+        save_cached_report(report)
+        return {
+            'report_generated_at': report['report_generated_at'],
+            'orphaned_files': len(report['orphaned_files']),
+            'broken_links': len(report['broken_links']),
+            'stale_files': len(report['stale_files']),
+            'integrity_issues': len(report['integrity_issues']),
+        }
+
+
+def analyze_mesh_job(job_id: str) -> dict:
+    """Measure a job's model file and store the result on job.analysis."""
+    from app import db
+    from app.models.job import Job
+    from app.services.mesh_service import analyze_job
+
+    with _get_app().app_context():
+        job = db.session.get(Job, job_id)
+        if job is None:
+            return {'job_id': job_id, 'error': 'job not found'}
+        result = analyze_job(job)
+        db.session.commit()
+        return {'job_id': job_id, **{k: result.get(k) for k in ('triangles', 'watertight', 'estimated_weight_g', 'error')}}
+
+
+def process_submission(submission_id: str) -> dict:
+    """Hash, de-duplicate and file an accepted upload as a job (SUBMIT_ASYNC)."""
+    from app.services.submission_service import process_submission as process
+
+    with _get_app().app_context():
+        submission = process(submission_id)
+        if submission is None:
+            return {'submission_id': submission_id, 'error': 'submission not found'}
+        return {'submission_id': submission_id, 'status': submission.status, 'job_id': submission.job_id}
+
+
+def compress_cold_files_job() -> dict:
+    """Compress model files of finished jobs past COLD_COMPRESSION_AGE_DAYS (schedule e.g. nightly)."""
+    from app.services.compression_service import compress_cold_files
+
+    with _get_app().app_context():
+        return compress_cold_files()
+
+
+def archive_jobs_job() -> dict:
+    """Archive finished jobs idle past ARCHIVE_AFTER_DAYS (schedule e.g. nightly)."""
+    from app.services.archive_service import archive_finished_jobs
+
+    with _get_app().app_context():
+        return archive_finished_jobs()
+
+
+def purge_jobs_job(days: float | None = None) -> dict:
+    """Delete jobs past the retention period (PURGE_AFTER_DAYS unless days is given)."""
+    from datetime import timedelta
+    from app.services.purge_service import purge_after, purge_expired_jobs
+    from app.services.queue_service import report_progress
+
+    with _get_app().app_context():
+        age = timedelta(days=days) if days is not None else purge_after()
+        if age is None:
+            return {'jobs': 0, 'error': 'no retention period configured'}
+
+        def progress(totals: dict) -> None:
+            report_progress(totals['jobs'] / max(totals['expected'], 1),
+                            f"{totals['jobs']} jobs purged ({totals['jobs_per_s']} jobs/s)")
+
+        return purge_expired_jobs(age, progress=progress)
+
+
+def sweep_confirmations_job() -> dict:
+    """Expire lapsed confirmation links and queue reminders (schedule e.g. every 15 minutes)."""
+    from app.services.confirmation_service import sweep_confirmations
+
+    with _get_app().app_context():
+        return sweep_confirmations()
+
+
+def send_confirmation_reminders(job_ids: list[str]) -> dict:
+    """Send one batch of confirmation reminders claimed by sweep_confirmations."""
+    from app.services.confirmation_service import send_reminders
+
+    with _get_app().app_context():
+        return {'jobs': len(job_ids), 'sent': send_reminders(job_ids)}
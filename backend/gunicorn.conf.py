@@ -0,0 +1,57 @@
+"""Gunicorn settings for the Flask API. Every value can be overridden via env.
+
+Sizing: the API is mostly I/O bound (database, storage share, SMTP), so a few
+processes with several threads each ("gthread") beats many sync workers.
+"""
+import multiprocessing
+import os
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    return os.environ.get(name, str(default)).lower() in ('1', 'true', 'yes')
+
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('GUNICORN_WORKERS', min(multiprocessing.cpu_count() * 2 + 1, 8)))
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+
+# Import the app once in the master so workers fork with it already loaded.
+# Note: with preloading, HUP reloads workers but not application code; restart to deploy.
+# Code auto-reload is left to the dev server (`python run.py`).
+preload_app = _env_bool('GUNICORN_PRELOAD', True)
+
+# Request handling
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+# Recycle workers periodically to bound memory growth; jitter avoids restarting all at once
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 100))
+# Uploads are buffered by Werkzeug; keep request line/header limits at gunicorn defaults
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-')
+errorlog = os.environ.get('GUNICORN_ERROR_LOG', '-')
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+
+
+def post_fork(server, worker):
+    """Drop connections and clients inherited from the master process."""
+    if not server.cfg.preload_app:
+        # Each worker imports its own app; there is nothing inherited to reset
+        return
+    from app import db
+    from wsgi import app
+
+    app.extensions.pop('redis_client', None)
+    # Watcher threads do not survive fork; each worker starts its own on first use
+    app.extensions.pop('storage_index', None)
+    with app.app_context():
+        db.engine.dispose(close=False)
+
+
+def worker_exit(server, worker):
+    """Write out sidecar updates still held by the metadata write-behind buffer."""
+    from app.services.metadata_service import flush_pending_writes
+
+    flush_pending_writes()
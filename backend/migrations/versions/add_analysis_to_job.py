@@ -0,0 +1,24 @@
+"""add mesh analysis to job
+
+Revision ID: 8d4e1a6c2f57
+Revises: 5b7c2e4d9a31
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d4e1a6c2f57'
+down_revision = '5b7c2e4d9a31'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('job', sa.Column('analysis', sa.JSON(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('job', 'analysis')
@@ -0,0 +1,90 @@
+"""add archive tables for finished jobs, events and payments
+
+Revision ID: a6e2c9f14b73
+Revises: 9f3b6d1e4a82
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a6e2c9f14b73'
+down_revision = '9f3b6d1e4a82'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('job_archive',
+    sa.Column('id', sa.String(), nullable=False),
+    sa.Column('short_id', sa.String(length=12), nullable=True),
+    sa.Column('student_name', sa.String(length=100), nullable=False),
+    sa.Column('student_email', sa.String(length=100), nullable=False),
+    sa.Column('discipline', sa.String(length=50), nullable=False),
+    sa.Column('class_number', sa.String(length=50), nullable=False),
+    sa.Column('original_filename', sa.String(length=256), nullable=False),
+    sa.Column('display_name', sa.String(length=256), nullable=False),
+    sa.Column('file_path', sa.String(length=512), nullable=False),
+    sa.Column('metadata_path', sa.String(length=512), nullable=False),
+    sa.Column('file_hash', sa.String(length=64), nullable=True),
+    sa.Column('status', sa.String(length=50), nullable=True),
+    sa.Column('printer', sa.String(length=64), nullable=False),
+    sa.Column('color', sa.String(length=32), nullable=False),
+    sa.Column('material', sa.String(length=32), nullable=False),
+    sa.Column('weight_g', sa.Float(), nullable=True),
+    sa.Column('time_hours', sa.Float(), nullable=True),
+    sa.Column('analysis', sa.JSON(), nullable=True),
+    sa.Column('cost_usd', sa.Numeric(precision=6, scale=2), nullable=True),
+    sa.Column('acknowledged_minimum_charge', sa.Boolean(), nullable=True),
+    sa.Column('student_confirmed', sa.Boolean(), nullable=True),
+    sa.Column('student_confirmed_at', sa.DateTime(), nullable=True),
+    sa.Column('confirm_token', sa.String(length=128), nullable=True),
+    sa.Column('confirm_token_expires', sa.DateTime(), nullable=True),
+    sa.Column('is_confirmation_expired', sa.Boolean(), nullable=True),
+    sa.Column('confirmation_last_sent_at', sa.DateTime(), nullable=True),
+    sa.Column('reject_reasons', sa.JSON(), nullable=True),
+    sa.Column('staff_viewed_at', sa.DateTime(), nullable=True),
+    sa.Column('last_updated_by', sa.String(length=100), nullable=True),
+    sa.Column('notes', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.Column('meta', sa.JSON(), nullable=True),
+    sa.Column('archived_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('event_archive',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('job_id', sa.String(), nullable=False),
+    sa.Column('timestamp', sa.DateTime(), nullable=True),
+    sa.Column('event_type', sa.String(length=50), nullable=False),
+    sa.Column('details', sa.JSON(), nullable=True),
+    sa.Column('triggered_by', sa.String(length=100), nullable=False),
+    sa.Column('workstation_id', sa.String(length=100), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('payment_archive',
+    sa.Column('job_id', sa.String(), nullable=False),
+    sa.Column('grams', sa.Float(), nullable=False),
+    sa.Column('price_cents', sa.Integer(), nullable=False),
+    sa.Column('txn_no', sa.String(length=50), nullable=False),
+    sa.Column('picked_up_by', sa.String(length=100), nullable=False),
+    sa.Column('paid_ts', sa.DateTime(), nullable=True),
+    sa.Column('paid_by_staff', sa.String(length=100), nullable=False),
+    sa.PrimaryKeyConstraint('job_id')
+    )
+    op.create_index('ix_job_archive_archived_at', 'job_archive', ['archived_at'], unique=False)
+    op.create_index('ix_job_archive_status', 'job_archive', ['status'], unique=False)
+    op.create_index('ix_job_archive_student_email', 'job_archive', ['student_email'], unique=False)
+    op.create_index('ix_event_archive_job_id', 'event_archive', ['job_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_event_archive_job_id', table_name='event_archive')
+    op.drop_index('ix_job_archive_student_email', table_name='job_archive')
+    op.drop_index('ix_job_archive_status', table_name='job_archive')
+    op.drop_index('ix_job_archive_archived_at', table_name='job_archive')
+    op.drop_table('payment_archive')
+    op.drop_table('event_archive')
+    op.drop_table('job_archive')
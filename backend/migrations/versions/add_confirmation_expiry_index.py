@@ -0,0 +1,24 @@
+"""index job (status, confirm_token_expires) for the confirmation sweep
+
+Revision ID: b3d8f5a27c19
+Revises: a6e2c9f14b73
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b3d8f5a27c19'
+down_revision = 'a6e2c9f14b73'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_job_status_confirm_token_expires', 'job', ['status', 'confirm_token_expires'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_job_status_confirm_token_expires', table_name='job')
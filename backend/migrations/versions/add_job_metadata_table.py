@@ -0,0 +1,31 @@
+"""add job_metadata table
+
+Revision ID: 5b7c2e4d9a31
+Revises: 3a1f9d2b7e10
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b7c2e4d9a31'
+down_revision = '3a1f9d2b7e10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('job_metadata',
+    sa.Column('job_id', sa.String(), nullable=False),
+    sa.Column('data', sa.JSON(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.Column('exported_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['job_id'], ['job.id'], ),
+    sa.PrimaryKeyConstraint('job_id')
+    )
+
+
+def downgrade():
+    op.drop_table('job_metadata')
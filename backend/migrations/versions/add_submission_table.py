@@ -0,0 +1,39 @@
+"""add submission table
+
+Revision ID: 9f3b6d1e4a82
+Revises: 8d4e1a6c2f57
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9f3b6d1e4a82'
+down_revision = '8d4e1a6c2f57'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('submission',
+    sa.Column('id', sa.String(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('form', sa.JSON(), nullable=False),
+    sa.Column('original_filename', sa.String(length=256), nullable=False),
+    sa.Column('incoming_path', sa.String(length=512), nullable=False),
+    sa.Column('job_id', sa.String(), nullable=True),
+    sa.Column('existing_job_id', sa.String(), nullable=True),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_submission_status', 'submission', ['status'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_submission_status', table_name='submission')
+    op.drop_table('submission')
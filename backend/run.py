@@ -1,3 +1,4 @@
+import os
 from app import create_app, db
 from app.models import Job, Event, Staff, Payment
 
@@ -18,4 +19,5 @@ def make_shell_context():
     }
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=True) 
\ No newline at end of file
+    # Development server only; production runs gunicorn with gunicorn.conf.py (see wsgi.py)
+    app.run(host='0.0.0.0', port=5000, debug=os.environ.get('FLASK_DEBUG', 'true').lower() == 'true')
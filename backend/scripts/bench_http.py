@@ -0,0 +1,109 @@
+"""Measure request throughput of list_jobs and submit_job against a running server.
+
+Usage:
+    python scripts/bench_http.py --base-url http://localhost:5000 --requests 500 --concurrency 8
+
+Run it once against `python run.py` (dev server) and once against gunicorn
+(`gunicorn -c gunicorn.conf.py wsgi:app`) with the same database to compare.
+Submission benchmarks need a generous SUBMIT_RATE_LIMIT on the server.
+"""
+from __future__ import annotations
+import argparse
+import json
+import time
+import urllib.error
+import urllib.request
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+
+def _login(base_url: str, workstation_id: str, password: str) -> str:
+    req = urllib.request.Request(
+        f'{base_url}/api/v1/auth/login',
+        data=json.dumps({'workstation_id': workstation_id, 'password': password}).encode(),
+        headers={'Content-Type': 'application/json'},
+    )
+    with urllib.request.urlopen(req) as resp:
+        return json.loads(resp.read())['token']
+
+
+def _list_jobs(base_url: str, token: str) -> int:
+    req = urllib.request.Request(f'{base_url}/api/v1/jobs', headers={'Authorization': f'Bearer {token}'})
+    with urllib.request.urlopen(req) as resp:
+        resp.read()
+        return resp.status
+
+
+def _submit_job(base_url: str) -> int:
+    boundary = uuid.uuid4().hex
+    fields = {
+        'student_name': 'Bench Student',
+        'student_email': f'bench-{boundary[:8]}@example.com',
+        'discipline': 'Engineering',
+        'class_number': 'BENCH 1000',
+        'printer': 'Prusa MK4S',
+        'color': 'Gray',
+        'material': 'Filament',
+    }
+    parts = []
+    for name, value in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    # Unique content per request so duplicate detection does not short-circuit
+    model = b'solid bench\n' + boundary.encode() * 256 + b'\nendsolid bench\n'
+    parts.append(
+        f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="bench.stl"\r\n'
+        'Content-Type: application/octet-stream\r\n\r\n'.encode() + model + b'\r\n'
+    )
+    parts.append(f'--{boundary}--\r\n'.encode())
+    req = urllib.request.Request(
+        f'{base_url}/api/v1/submit',
+        data=b''.join(parts),
+        headers={'Content-Type': f'multipart/form-data; boundary={boundary}'},
+    )
+    with urllib.request.urlopen(req) as resp:
+        resp.read()
+        return resp.status
+
+
+def run(name: str, fn, total: int, concurrency: int) -> dict:
+    def one(_):
+        try:
+            return fn()
+        except urllib.error.HTTPError as exc:
+            return exc.code
+        except Exception as exc:
+            return type(exc).__name__
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = Counter(pool.map(one, range(total)))
+    elapsed = time.perf_counter() - started
+    failures = {str(k): v for k, v in results.items() if not (isinstance(k, int) and 200 <= k < 300)}
+    return {'endpoint': name, 'requests': total, 'failures': failures, 'seconds': round(elapsed, 2),
+            'req_per_s': round(total / elapsed, 1)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--base-url', default='http://localhost:5000')
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--workstation-id', default='front-desk')
+    parser.add_argument('--password', default='password123')
+    parser.add_argument('--only', choices=['list_jobs', 'submit_job'])
+    args = parser.parse_args()
+
+    token = _login(args.base_url, args.workstation_id, args.password)
+    targets = {
+        'list_jobs': lambda: _list_jobs(args.base_url, token),
+        'submit_job': lambda: _submit_job(args.base_url),
+    }
+    for name, fn in targets.items():
+        if args.only and name != args.only:
+            continue
+        print(json.dumps(run(name, fn, args.requests, args.concurrency)))
+
+
+if __name__ == '__main__':
+    main()
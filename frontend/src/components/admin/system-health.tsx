@@ -7,10 +7,29 @@ type ServerAuditReport = {
   orphaned_files: string[];
   broken_links: { job_id: string; issues: string[]; file_path?: string; metadata_path?: string; expected_dir?: string; actual_dir?: string }[];
   stale_files: string[];
+  integrity_checked?: boolean;
+  integrity_issues?: { job_id: string; file_path: string; issue: string; expected_sha256?: string; actual_sha256?: string | null }[];
+  report_age_seconds?: number;
 };
 
+type AuditJobStatus = {
+  job_id: string | null;
+  status: string;
+  progress?: number;
+  stage?: string | null;
+  status_url?: string;
+};
+
+function formatAge(seconds?: number): string {
+  if (seconds === undefined) return "";
+  if (seconds < 60) return "just now";
+  if (seconds < 3600) return `${Math.round(seconds / 60)} min ago`;
+  if (seconds < 86400) return `${Math.round(seconds / 3600)} h ago`;
+  return `${Math.round(seconds / 86400)} d ago`;
+}
+
 export function SystemHealthPanel() {
-  const [currentAudit, setCurrentAudit] = useState<{ startedAt: string } | null>(null);
+  const [currentAudit, setCurrentAudit] = useState<{ startedAt: string; progress: number } | null>(null);
   const [lastReport, setLastReport] = useState<ServerAuditReport | null>(null);
   const [isStarting, setIsStarting] = useState(false);
   const [loadingReport, setLoadingReport] = useState(false);
@@ -24,6 +43,8 @@ export function SystemHealthPanel() {
         setError("");
         const res = await fetch("/api/v1/admin/audit/report", { headers: { Authorization: `Bearer ${token}` } });
         if (!res.ok) throw new Error("Failed to load audit report");
+        // 202: no report yet; the first audit is running on the worker
+        if (res.status === 202) return;
         const data: ServerAuditReport = await res.json();
         setLastReport(data);
       } catch (e) {
@@ -35,48 +56,86 @@ export function SystemHealthPanel() {
     fetchReport();
   }, []);
 
+  const fetchLatestReport = async () => {
+    const token = localStorage.getItem("token");
+    const res = await fetch("/api/v1/admin/audit/report", { headers: { Authorization: `Bearer ${token}` } });
+    if (res.status === 200) setLastReport(await res.json());
+  };
+
   const startAudit = async () => {
     setIsStarting(true);
+    setError("");
     try {
-      // For now, synchronous scan via report fetch
-      setCurrentAudit({ startedAt: new Date().toISOString() });
       const token = localStorage.getItem("token");
-      const res = await fetch("/api/v1/admin/audit/report", { headers: { Authorization: `Bearer ${token}` } });
-      if (res.ok) {
-        const data: ServerAuditReport = await res.json();
-        setLastReport(data);
+      const res = await fetch("/api/v1/admin/audit/run", {
+        method: "POST",
+        headers: { "Content-Type": "application/json", Authorization: `Bearer ${token}` },
+        body: JSON.stringify({}),
+      });
+      if (!res.ok) throw new Error("Failed to start audit");
+      let job: AuditJobStatus = await res.json();
+      setCurrentAudit({ startedAt: new Date().toISOString(), progress: job.progress ?? 0 });
+      setIsStarting(false);
+      // Audits run on the worker; poll until finished (inline runs return finished immediately)
+      while (job.job_id && job.status !== "finished" && job.status !== "failed") {
+        await new Promise((resolve) => setTimeout(resolve, 1000));
+        const poll = await fetch(`/api/v1/admin/audit/jobs/${job.job_id}`, { headers: { Authorization: `Bearer ${token}` } });
+        if (!poll.ok) throw new Error("Failed to poll audit");
+        job = await poll.json();
+        setCurrentAudit((prev) => (prev ? { ...prev, progress: job.progress ?? prev.progress } : prev));
       }
+      if (job.status === "failed") throw new Error("Audit failed");
+      await fetchLatestReport();
+    } catch {
+      setError("Audit failed to complete");
     } finally {
       setIsStarting(false);
+      setCurrentAudit(null);
     }
   };
 
+  // Deletions patch the server-side cached report; mirror that locally instead of re-scanning
+  const dropFromReport = (paths: string[]) => {
+    const removed = new Set(paths);
+    setLastReport((prev) =>
+      prev
+        ? {
+            ...prev,
+            orphaned_files: prev.orphaned_files.filter((p) => !removed.has(p)),
+            stale_files: prev.stale_files.filter((p) => !removed.has(p)),
+          }
+        : prev
+    );
+  };
+
   const cleanUpOrphans = async () => {
     if (!lastReport) return;
-    const token = localStorage.getItem("token");
-    for (const path of lastReport.orphaned_files) {
-      await fetch("/api/v1/admin/audit/orphaned-file", {
-        method: "DELETE",
+    try {
+      const token = localStorage.getItem("token");
+      const res = await fetch("/api/v1/admin/audit/cleanup", {
+        method: "POST",
         headers: { "Content-Type": "application/json", Authorization: `Bearer ${token}` },
-        body: JSON.stringify({ file_path: path, staff_name: "Admin User" }),
+        body: JSON.stringify({ file_paths: lastReport.orphaned_files, staff_name: "Admin User", kind: "orphaned" }),
       });
+      if (!res.ok) throw new Error("cleanup failed");
+      const result: { deleted: string[]; failed: string[] } = await res.json();
+      dropFromReport(result.deleted);
+      if (result.failed.length > 0) setError(`${result.failed.length} files could not be deleted`);
+    } catch {
+      setError("Failed to clean up orphaned files");
     }
-    // refresh
-    const res = await fetch("/api/v1/admin/audit/report", { headers: { Authorization: `Bearer ${token}` } });
-    if (res.ok) setLastReport(await res.json());
   };
 
   const deleteStale = async (path: string) => {
     try {
       const token = localStorage.getItem("token");
-      await fetch("/api/v1/admin/audit/stale-file", {
+      const res = await fetch("/api/v1/admin/audit/stale-file", {
         method: "DELETE",
         headers: { "Content-Type": "application/json", Authorization: `Bearer ${token}` },
         body: JSON.stringify({ file_path: path, staff_name: "Admin User" }),
       });
-      // refresh
-      const res = await fetch("/api/v1/admin/audit/report", { headers: { Authorization: `Bearer ${token}` } });
-      if (res.ok) setLastReport(await res.json());
+      if (!res.ok) throw new Error("delete failed");
+      dropFromReport([path]);
     } catch {
       setError("Failed to delete stale file");
     }
@@ -121,7 +180,7 @@ export function SystemHealthPanel() {
             <div className="mt-4 flex items-center space-x-2 p-3 bg-blue-50 rounded-lg">
               <Clock className="w-4 h-4 text-blue-600" />
               <span className="text-sm text-blue-800">
-                Audit in progress… Started at {new Date(currentAudit.startedAt).toLocaleTimeString()}
+                Audit in progress… {Math.round(currentAudit.progress * 100)}% (started at {new Date(currentAudit.startedAt).toLocaleTimeString()})
               </span>
             </div>
           )}
@@ -157,7 +216,10 @@ export function SystemHealthPanel() {
               </div>
             </div>
 
-            <div className="text-sm text-gray-500 mb-4">Generated: {new Date(lastReport.report_generated_at).toLocaleString()}</div>
+            <div className="text-sm text-gray-500 mb-4">
+              Generated: {new Date(lastReport.report_generated_at).toLocaleString()}
+              {lastReport.report_age_seconds !== undefined && ` (${formatAge(lastReport.report_age_seconds)})`}
+            </div>
 
             {(lastReport.orphaned_files?.length || 0) > 0 ? (
               <div className="flex items-center justify-between p-3 bg-orange-50 rounded-lg">
@@ -214,6 +276,25 @@ export function SystemHealthPanel() {
                 </ul>
               </div>
             )}
+
+            {/* Integrity Issues List */}
+            {(lastReport.integrity_issues?.length || 0) > 0 && (
+              <div className="mt-4">
+                <h3 className="text-sm font-medium text-gray-900 mb-2">Integrity Issues</h3>
+                <ul className="space-y-2 max-h-56 overflow-auto">
+                  {lastReport.integrity_issues!.map((i, idx) => (
+                    <li key={`${i.job_id}-${idx}`} className="text-xs bg-red-50 border border-red-100 rounded px-2 py-2">
+                      <div className="flex items-center justify-between">
+                        <div className="font-medium text-red-800">Job {i.job_id}</div>
+                        <button onClick={() => markReviewed(i.job_id, [i.issue])} className="text-red-800 hover:underline">Mark Reviewed</button>
+                      </div>
+                      <div className="text-red-700 mt-1">Issue: {i.issue}</div>
+                      <div className="text-gray-500">File: {i.file_path}</div>
+                    </li>
+                  ))}
+                </ul>
+              </div>
+            )}
           </div>
         </div>
       )}
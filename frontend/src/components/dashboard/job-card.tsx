@@ -1,5 +1,5 @@
 "use client";
-import React, { useState } from 'react';
+import React, { useEffect, useState } from 'react';
 import { User, Mail, Printer, Palette, FileText, CheckCircle, XCircle, Eye } from "lucide-react";
 import ReviewModal from './modals/review-modal';
 import RejectionModal from './modals/rejection-modal';
@@ -20,6 +20,38 @@ interface Job {
   created_at?: string;
   notes?: string;
   staff_viewed_at?: string;
+  analysis?: { preview?: { version?: string } } | null;
+}
+
+// Thumbnails need the auth header, so they are fetched rather than linked. The URL
+// carries the preview version, which lets the browser cache each one for a year.
+function JobThumbnail({ jobId, version }: { jobId: string; version: string }) {
+  const [src, setSrc] = useState<string | null>(null);
+
+  useEffect(() => {
+    let objectUrl: string | null = null;
+    let cancelled = false;
+    (async () => {
+      try {
+        const token = localStorage.getItem('token');
+        const res = await fetch(`/api/v1/jobs/${jobId}/preview/thumbnail.png?v=${version}`, {
+          headers: { Authorization: `Bearer ${token}` },
+        });
+        if (!res.ok || cancelled) return;
+        objectUrl = URL.createObjectURL(await res.blob());
+        if (!cancelled) setSrc(objectUrl);
+      } catch {
+        // non-fatal: the card simply has no preview
+      }
+    })();
+    return () => {
+      cancelled = true;
+      if (objectUrl) URL.revokeObjectURL(objectUrl);
+    };
+  }, [jobId, version]);
+
+  if (!src) return <div className="w-16 h-16 flex-shrink-0 rounded-lg bg-gray-50 border border-gray-100" />;
+  return <img src={src} alt="Model preview" loading="lazy" className="w-16 h-16 flex-shrink-0 rounded-lg bg-gray-50 border border-gray-100 object-contain" />;
 }
 
 interface JobCardProps {
@@ -143,12 +175,17 @@ export default function JobCard({ job, currentStatus = "UPLOADED", onApprove, on
           </div>
         )}
 
-        <div className="flex justify-between items-start mb-3">
-          <h3 className="text-lg font-semibold text-gray-900 truncate">{job.student_name || job.display_name || (job.short_id || job.id?.slice(0,8) + '…')}</h3>
-          <span className={`text-sm ${ageColor} font-medium`}>{timeElapsed}</span>
-        </div>
+        <div className="flex items-start gap-3 mb-3">
+          {job.analysis?.preview?.version && <JobThumbnail jobId={job.id} version={job.analysis.preview.version} />}
+          <div className="min-w-0 flex-1">
+            <div className="flex justify-between items-start mb-3">
+              <h3 className="text-lg font-semibold text-gray-900 truncate">{job.student_name || job.display_name || (job.short_id || job.id?.slice(0,8) + '…')}</h3>
+              <span className={`text-sm ${ageColor} font-medium`}>{timeElapsed}</span>
+            </div>
 
-        <p className="text-gray-600 text-sm mb-3 truncate">{job.display_name || job.original_filename || 'Unknown file'}</p>
+            <p className="text-gray-600 text-sm truncate">{job.display_name || job.original_filename || 'Unknown file'}</p>
+          </div>
+        </div>
 
         <div className="grid grid-cols-2 gap-2 mb-3">
           <div className="flex items-center text-sm text-gray-500">
@@ -2,7 +2,7 @@
 import React, { useEffect, useState } from 'react';
 import { useRouter } from 'next/navigation';
 import JobCard from './job-card.tsx';
-import ApprovalModal from './modals/approval-modal';
+import ApprovalModal, { type MeshAnalysis } from './modals/approval-modal';
 import StatusChangeModal from './modals/status-change-modal';
 import PaymentModal from './modals/payment-modal';
 import { JobListSkeleton } from './job-card-skeleton';
@@ -19,6 +19,7 @@ interface Job {
   created_at?: string;
   notes?: string;
   staff_viewed_at?: string;
+  analysis?: MeshAnalysis | null;
 }
 
 interface JobListFilters {
@@ -34,6 +35,7 @@ export default function JobList({ filters, onJobsMutated, refreshToken, onModalO
   const [error, setError] = useState('');
   const [approveJobId, setApproveJobId] = useState<string | null>(null);
   const [approveJobMaterial, setApproveJobMaterial] = useState<string | null>(null);
+  const [approveJobAnalysis, setApproveJobAnalysis] = useState<MeshAnalysis | null>(null);
   const [statusJobId, setStatusJobId] = useState<string | null>(null);
   const [statusAction, setStatusAction] = useState<"mark-printing" | "mark-complete" | "mark-picked-up" | null>(null);
 
@@ -79,12 +81,14 @@ export default function JobList({ filters, onJobsMutated, refreshToken, onModalO
     const job = jobs.find(j => j.id === jobId);
     setApproveJobId(jobId);
     setApproveJobMaterial(job?.material || null);
+    setApproveJobAnalysis(job?.analysis || null);
     onModalOpenChange?.(true);
   };
 
   const closeApproveModal = () => {
     setApproveJobId(null);
     setApproveJobMaterial(null);
+    setApproveJobAnalysis(null);
     onModalOpenChange?.(false);
   };
 
@@ -169,6 +173,7 @@ export default function JobList({ filters, onJobsMutated, refreshToken, onModalO
         <ApprovalModal
           jobId={approveJobId}
           material={approveJobMaterial || undefined}
+          analysis={approveJobAnalysis}
           onClose={closeApproveModal}
           onApproved={handleApprovedSuccess}
         />
@@ -3,18 +3,30 @@ import React, { useEffect, useMemo, useState } from "react";
 
 type Staff = { name: string; is_active: boolean };
 
+export type MeshAnalysis = {
+  volume_mm3?: number;
+  size_mm?: number[];
+  watertight?: boolean;
+  estimated_weight_g?: number | null;
+  error?: string;
+  preview?: { version?: string };
+};
+
 export interface ApprovalModalProps {
   jobId: string;
   material?: string | null;
+  analysis?: MeshAnalysis | null;
   onClose: () => void;
   onApproved: () => void; // parent removes job from list
 }
 
-export default function ApprovalModal({ jobId, material, onClose, onApproved }: ApprovalModalProps) {
+export default function ApprovalModal({ jobId, material, analysis, onClose, onApproved }: ApprovalModalProps) {
   const [staff, setStaff] = useState<Staff[]>([]);
   const [loadingStaff, setLoadingStaff] = useState(false);
   const [staffName, setStaffName] = useState("");
-  const [weightG, setWeightG] = useState<string>("");
+  // Pre-fill from the mesh analysis; staff can still overwrite it
+  const estimatedWeight = analysis?.estimated_weight_g;
+  const [weightG, setWeightG] = useState<string>(estimatedWeight ? String(estimatedWeight) : "");
   const [timeHours, setTimeHours] = useState<string>("");
   const [submitting, setSubmitting] = useState(false);
   const [error, setError] = useState<string>("");
@@ -251,6 +263,15 @@ export default function ApprovalModal({ jobId, material, onClose, onApproved }:
             </div>
           </div>
 
+          {analysis && !analysis.error && (
+            <p className="text-xs text-gray-500 -mt-2">
+              {estimatedWeight
+                ? `Weight estimated from the model (${((analysis.volume_mm3 ?? 0) / 1000).toFixed(1)} cm³). Check it against the slicer.`
+                : "Model is not watertight; no weight estimate."}
+              {analysis.size_mm && ` Size: ${analysis.size_mm.map((v) => v.toFixed(0)).join(" × ")} mm.`}
+            </p>
+          )}
+
           <div className="bg-gray-50 border rounded-lg p-3 text-sm text-gray-700">
             Estimated cost: <span className="font-semibold">${" "}{costPreview.toFixed(2)}</span> ({material ? material : "Filament"} @ ${rate.toFixed(2)}/g, $3.00 min)
           </div>
@@ -17,6 +17,24 @@ const printerOptions: Record<string, string[]> = {
   Resin: ['Formlabs Form 3']
 };
 
+// Poll an asynchronous submission until it settles; after the deadline the upload is still safely queued
+async function waitForSubmission(statusUrl: string, deadlineMs = 15000): Promise<{ status: string }> {
+  const started = Date.now();
+  while (Date.now() - started < deadlineMs) {
+    await new Promise(resolve => setTimeout(resolve, 1000));
+    try {
+      const res = await fetch(statusUrl);
+      if (res.ok) {
+        const data = await res.json();
+        if (data.status !== 'QUEUED' && data.status !== 'PROCESSING') return data;
+      }
+    } catch {
+      // Keep polling until the deadline
+    }
+  }
+  return { status: 'QUEUED' };
+}
+
 export default function SubmissionForm() {
   const router = useRouter();
   const [firstName, setFirstName] = useState('');
@@ -174,6 +192,18 @@ export default function SubmissionForm() {
       if (file) formData.append('file', file);
       const res = await fetch('/api/v1/submit', { method: 'POST', body: formData });
       const data = await res.json();
+      if (res.status === 202 && data.status_url) {
+        // Accepted for background processing: wait briefly for the duplicate check
+        const outcome = await waitForSubmission(data.status_url);
+        if (outcome.status === 'DUPLICATE') {
+          setSubmitError('You already have an active job for this file');
+        } else if (outcome.status === 'FAILED') {
+          setSubmitError('Submission failed, please try again');
+        } else {
+          router.push(`/submit/success?job=${data.id}`);
+        }
+        return;
+      }
       if (res.ok) {
         router.push(`/submit/success?job=${data.id}`);
       } else {
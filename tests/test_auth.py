@@ -29,4 +29,36 @@ def test_protected_with_token(client, token):
     )
     assert resp.status_code == 200
     data = resp.get_json()
-    assert data['workstation_id'] == 'front-desk'
\ No newline at end of file
+    assert data['workstation_id'] == 'front-desk'
+
+def test_repeated_requests_hit_token_cache(client, token):
+    headers = {'Authorization': f'Bearer {token}'}
+    for _ in range(3):
+        assert client.get('/api/v1/auth/protected', headers=headers).status_code == 200
+    stats = client.get('/api/v1/_diag', headers=headers).get_json()['token_cache']
+    assert stats['misses'] == 1
+    assert stats['hits'] >= 3
+    assert stats['size'] == 1
+
+
+def test_token_cache_honors_exp_and_bounds():
+    import time
+    import jwt
+    from app.services.auth_service import VerifiedTokenCache
+
+    cache = VerifiedTokenCache(maxsize=2)
+    cache.put(b'old', {'workstation_id': 'a', 'exp': time.time() - 1})
+    with pytest.raises(jwt.ExpiredSignatureError):
+        cache.get(b'old')
+    assert cache.get(b'old') is None
+
+    for key in (b'k1', b'k2', b'k3'):
+        cache.put(key, {'workstation_id': 'a', 'exp': time.time() + 60})
+    assert cache.get(b'k1') is None
+    assert cache.get(b'k3')['workstation_id'] == 'a'
+    assert cache.stats()['evictions'] == 1
+
+
+def test_tampered_token_rejected(client, token):
+    resp = client.get('/api/v1/auth/protected', headers={'Authorization': f'Bearer {token}x'})
+    assert resp.status_code == 401
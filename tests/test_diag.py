@@ -1,4 +1,5 @@
 # type: ignore
+import pytest
 
 
 def test_diag_requires_auth(client):
@@ -68,3 +69,260 @@ def test_admin_delete_stale_file(client, token, app, tmp_path):
     assert resp.status_code == 200
     assert not stale.exists()
 
+
+
+def test_admin_audit_reuses_snapshot_and_detects_changes(client, token, app, tmp_path, monkeypatch):
+    # Sidecars are the audited source of truth only when mirrored
+    monkeypatch.setenv('METADATA_SIDECAR_MODE', 'mirror')
+    import os
+    import json
+    from app import db
+    from app.models.job import Job
+    os.environ['STORAGE_PATH'] = str(tmp_path)
+    uploaded = tmp_path / 'Uploaded'
+    uploaded.mkdir(parents=True, exist_ok=True)
+    model = uploaded / 'a.stl'
+    model.write_text('solid')
+    meta = uploaded / 'a_metadata.json'
+    meta.write_text(json.dumps({'status': 'UPLOADED', 'file_path': str(model.resolve())}))
+    # Listings of directories changed within the last second are not trusted; age it
+    os.utime(uploaded, ns=(uploaded.stat().st_atime_ns, uploaded.stat().st_mtime_ns - 5 * 10**9))
+    with app.app_context():
+        db.session.add(Job(
+            student_name='A', student_email='a@example.com', discipline='Art', class_number='1',
+            original_filename='a.stl', display_name='a.stl', file_path=str(model), metadata_path=str(meta),
+            printer='Prusa', color='Red', material='Filament',
+        ))
+        db.session.commit()
+    headers = {'Authorization': f'Bearer {token}'}
+
+    first = client.get('/api/v1/admin/audit/report?refresh=true', headers=headers).get_json()
+    assert first['broken_links'] == []
+    assert first['stats']['jobs_checked'] == 1
+
+    second = client.get('/api/v1/admin/audit/report?refresh=true', headers=headers).get_json()
+    assert second['stats']['jobs_reused'] == 1
+    assert second['stats']['dirs_reused'] >= 1
+    assert second['stats'].get('metadata_parsed', 0) == 0
+
+    # Rewriting metadata in place does not touch the directory mtime but must still be noticed
+    meta.write_text(json.dumps({'status': 'PENDING', 'file_path': str(model.resolve())}))
+    os.utime(meta, ns=(meta.stat().st_atime_ns, meta.stat().st_mtime_ns + 10**9))
+    third = client.get('/api/v1/admin/audit/report?refresh=true', headers=headers).get_json()
+    assert third['broken_links'][0]['issues'] == ['metadata_mismatch']
+
+    # A new file appears as an orphan
+    (uploaded / 'stray.stl').write_text('x')
+    fourth = client.get('/api/v1/admin/audit/report?refresh=true', headers=headers).get_json()
+    assert str((uploaded / 'stray.stl').resolve()) in fourth['orphaned_files']
+
+
+def test_admin_audit_parallel_scan_matches_serial(client, token, app, tmp_path, monkeypatch):
+    monkeypatch.setenv('STORAGE_PATH', str(tmp_path))
+    for dirname in ('Uploaded', 'Printing', 'Completed'):
+        (tmp_path / dirname).mkdir()
+        for i in range(5):
+            (tmp_path / dirname / f'{dirname}_{i}.stl').write_text('x')
+    headers = {'Authorization': f'Bearer {token}'}
+    monkeypatch.setenv('AUDIT_SCAN_WORKERS', '1')
+    serial = client.get('/api/v1/admin/audit/report?full=true', headers=headers).get_json()
+    monkeypatch.setenv('AUDIT_SCAN_WORKERS', '4')
+    parallel = client.get('/api/v1/admin/audit/report?full=true', headers=headers).get_json()
+    assert parallel['orphaned_files'] == serial['orphaned_files']
+    assert len(parallel['orphaned_files']) == 15
+    stats = parallel['stats']
+    assert stats['scan_workers'] == 4
+    assert stats['files'] == 15 and stats['dirs_scanned'] == 3
+    for key in ('scan_ms', 'db_ms', 'metadata_ms', 'jobs_ms', 'duration_ms'):
+        assert key in stats
+
+
+def test_admin_audit_cached_report_patched_on_delete(client, token, app, tmp_path, monkeypatch):
+    monkeypatch.setenv('STORAGE_PATH', str(tmp_path))
+    (tmp_path / 'Uploaded').mkdir()
+    orphan = tmp_path / 'Uploaded' / 'gone.stl'
+    orphan.write_text('x')
+    headers = {'Authorization': f'Bearer {token}'}
+
+    # Without a queue the audit runs inline and caches its report
+    resp = client.post('/api/v1/admin/audit/run', json={}, headers=headers)
+    assert resp.status_code == 200
+    assert resp.get_json()['status'] == 'finished'
+    report = client.get('/api/v1/admin/audit/report', headers=headers).get_json()
+    assert str(orphan.resolve()) in report['orphaned_files']
+    assert report['report_age_seconds'] >= 0
+
+    # New files are not picked up until the next audit run...
+    (tmp_path / 'Uploaded' / 'later.stl').write_text('x')
+    report = client.get('/api/v1/admin/audit/report', headers=headers).get_json()
+    assert len(report['orphaned_files']) == 1
+
+    # ...but deletions patch the cached report in place
+    client.delete('/api/v1/admin/audit/orphaned-file', json={'file_path': str(orphan), 'staff_name': 'Admin'}, headers=headers)
+    report = client.get('/api/v1/admin/audit/report', headers=headers).get_json()
+    assert report['orphaned_files'] == []
+    assert 'report_patched_at' in report
+
+
+def test_admin_audit_report_refresh_is_queued_when_worker_available(client, token, app, tmp_path, monkeypatch):
+    from types import SimpleNamespace
+    from app.routes import admin
+
+    monkeypatch.setenv('STORAGE_PATH', str(tmp_path))
+    queued = []
+    monkeypatch.setattr(admin, 'enqueue', lambda *args, **kwargs: queued.append(args) or SimpleNamespace(id='rq-1'))
+    monkeypatch.setattr(admin, 'perform_audit', lambda **kwargs: pytest.fail('audit ran inside the request'))
+    resp = client.get('/api/v1/admin/audit/report?refresh=true&integrity=true',
+                      headers={'Authorization': f'Bearer {token}'})
+    assert resp.status_code == 202
+    assert resp.get_json() == {'job_id': 'rq-1', 'status': 'queued', 'status_url': '/api/v1/admin/audit/jobs/rq-1'}
+    assert queued == [('app.tasks.run_audit_job', False, True)]
+
+
+def test_admin_audit_job_status_unknown(client, token):
+    resp = client.get('/api/v1/admin/audit/jobs/nope', headers={'Authorization': f'Bearer {token}'})
+    assert resp.status_code == 404
+
+
+def test_admin_batch_cleanup(client, token, app, tmp_path, monkeypatch):
+    from app import db
+    from app.models.job import Job
+    from app.models.event import Event
+    monkeypatch.setenv('STORAGE_PATH', str(tmp_path))
+    (tmp_path / 'Uploaded').mkdir()
+    orphans = []
+    for i in range(20):
+        p = tmp_path / 'Uploaded' / f'orphan_{i}.stl'
+        p.write_text('x')
+        orphans.append(str(p))
+    kept = tmp_path / 'Uploaded' / 'kept.stl'
+    kept.write_text('x')
+    with app.app_context():
+        db.session.add(Job(
+            student_name='K', student_email='k@example.com', discipline='Art', class_number='1',
+            original_filename='kept.stl', display_name='kept.stl', file_path=str(kept.resolve()),
+            metadata_path=str(tmp_path / 'Uploaded' / 'kept_metadata.json'),
+            printer='Prusa', color='Red', material='Filament',
+        ))
+        db.session.commit()
+
+    resp = client.post(
+        '/api/v1/admin/audit/cleanup',
+        json={'file_paths': orphans + [str(kept), '/etc/passwd'], 'staff_name': 'Admin'},
+        headers={'Authorization': f'Bearer {token}'},
+    )
+    assert resp.status_code == 200
+    data = resp.get_json()
+    assert len(data['deleted']) == 20
+    assert {r['reason'] for r in data['rejected']} == {'referenced', 'outside_storage'}
+    assert kept.exists()
+    assert not any((tmp_path / 'Uploaded' / f'orphan_{i}.stl').exists() for i in range(20))
+    with app.app_context():
+        events = Event.query.filter_by(event_type='OrphanedFilesDeleted').all()
+        assert len(events) == 1
+        assert events[0].details['deleted'] == 20
+
+
+def test_admin_cleanup_keeps_archived_files_and_rejects_sibling_paths(client, token, app, tmp_path, monkeypatch):
+    from app import db
+    from app.models.job import Job
+    from app.services.archive_service import archive_jobs
+    root = tmp_path / 'storage'
+    sibling = tmp_path / 'storage2'
+    (root / 'Archived').mkdir(parents=True)
+    sibling.mkdir()
+    monkeypatch.setenv('STORAGE_PATH', str(root))
+    model, meta, outside = root / 'Archived' / 'old.stl', root / 'Archived' / 'old_metadata.json', sibling / 'x.stl'
+    for path in (model, meta, outside):
+        path.write_text('x')
+    with app.app_context():
+        db.session.add(Job(
+            id='archived-job', student_name='K', student_email='k@example.com', discipline='Art', class_number='1',
+            original_filename='old.stl', display_name='old.stl', file_path=str(model.resolve()),
+            metadata_path=str(meta.resolve()), status='PAIDPICKEDUP', printer='Prusa', color='Red', material='PLA',
+        ))
+        db.session.commit()
+        archive_jobs(['archived-job'])
+    headers = {'Authorization': f'Bearer {token}'}
+
+    for endpoint in ('orphaned-file', 'stale-file'):
+        resp = client.delete(f'/api/v1/admin/audit/{endpoint}', json={'file_path': str(model), 'staff_name': 'Admin'},
+                             headers=headers)
+        assert resp.status_code == 409
+        resp = client.delete(f'/api/v1/admin/audit/{endpoint}', json={'file_path': str(outside), 'staff_name': 'Admin'},
+                             headers=headers)
+        assert resp.status_code == 400
+    data = client.post('/api/v1/admin/audit/cleanup', json={'file_paths': [str(model), str(meta)], 'staff_name': 'Admin'},
+                       headers=headers).get_json()
+    assert data['deleted'] == [] and {r['reason'] for r in data['rejected']} == {'referenced'}
+    assert model.exists() and meta.exists() and outside.exists()
+
+
+def test_admin_audit_integrity_reuses_hashes_and_flags_mismatch(client, token, app, tmp_path, monkeypatch):
+    import hashlib
+    import os
+    from app import db
+    from app.models.job import Job
+    monkeypatch.setenv('STORAGE_PATH', str(tmp_path))
+    monkeypatch.setenv('AUDIT_HASH_WORKERS', '1')
+    uploaded = tmp_path / 'Uploaded'
+    uploaded.mkdir(parents=True, exist_ok=True)
+    model = uploaded / 'h.stl'
+    model.write_bytes(b'solid original')
+    meta = uploaded / 'h_metadata.json'
+    meta.write_text('{}')
+    with app.app_context():
+        db.session.add(Job(
+            student_name='H', student_email='h@example.com', discipline='Art', class_number='1',
+            original_filename='h.stl', display_name='h.stl', file_path=str(model), metadata_path=str(meta),
+            file_hash=hashlib.sha256(b'solid original').hexdigest(),
+            printer='Prusa', color='Red', material='Filament',
+        ))
+        db.session.commit()
+    headers = {'Authorization': f'Bearer {token}'}
+
+    first = client.get('/api/v1/admin/audit/report?integrity=true', headers=headers).get_json()
+    assert first['integrity_issues'] == []
+    assert first['stats']['hashes_computed'] == 1
+
+    second = client.get('/api/v1/admin/audit/report?integrity=true', headers=headers).get_json()
+    assert second['stats']['hashes_reused'] == 1
+    assert second['stats'].get('hashes_computed', 0) == 0
+
+    model.write_bytes(b'solid corrupted')
+    os.utime(model, ns=(model.stat().st_atime_ns, model.stat().st_mtime_ns + 10**9))
+    third = client.get('/api/v1/admin/audit/report?integrity=true', headers=headers).get_json()
+    assert [i['issue'] for i in third['integrity_issues']] == ['hash_mismatch']
+
+
+def test_admin_storage_usage_scan_and_live_index(client, token, app, tmp_path, monkeypatch):
+    monkeypatch.setenv('STORAGE_PATH', str(tmp_path))
+    monkeypatch.delenv('STORAGE_WATCH', raising=False)
+    (tmp_path / 'Uploaded' / 'ab').mkdir(parents=True)
+    (tmp_path / 'Uploaded' / 'a.stl').write_bytes(b'x' * 10)
+    (tmp_path / 'Uploaded' / 'ab' / 'b.stl').write_bytes(b'x' * 5)
+    (tmp_path / 'Completed').mkdir()
+    (tmp_path / 'Completed' / 'c.stl').write_bytes(b'x' * 7)
+    headers = {'Authorization': f'Bearer {token}'}
+
+    scanned = client.get('/api/v1/admin/storage/usage', headers=headers).get_json()
+    assert scanned['source'] == 'scan'
+    assert scanned['by_status_dir']['Uploaded'] == {'files': 2, 'bytes': 15}
+    assert scanned['total_files'] == 3 and scanned['total_bytes'] == 22
+
+    monkeypatch.setenv('STORAGE_WATCH', 'poll')
+    monkeypatch.setenv('STORAGE_WATCH_INTERVAL', '3600')
+    try:
+        live = client.get('/api/v1/admin/storage/usage', headers=headers).get_json()
+        assert live['source'] == 'index:poll'
+        assert live['by_status_dir'] == scanned['by_status_dir']
+
+        (tmp_path / 'Completed' / 'd.stl').write_bytes(b'x' * 3)
+        app.extensions['storage_index'].refresh()
+        assert client.get('/api/v1/admin/storage/usage', headers=headers).get_json()['total_files'] == 4
+
+        report = client.get('/api/v1/admin/audit/report?refresh=true', headers=headers).get_json()
+        assert report['stats']['dirs_from_index'] == 3
+        assert len(report['orphaned_files']) == 4
+    finally:
+        app.extensions['storage_index'].stop()
@@ -17,7 +17,8 @@ def _write_initial_files(tmp_path: Path) -> tuple[Path, Path]:
     return file_path, meta_path
 
 
-def test_filesystem_transitions_and_metadata_sync(client, token, app, tmp_path):
+def test_filesystem_transitions_and_metadata_sync(client, token, app, tmp_path, monkeypatch):
+    monkeypatch.setenv('METADATA_SIDECAR_MODE', 'mirror')
     os.environ['STORAGE_PATH'] = str(tmp_path)
 
     # Seed initial file + metadata in Uploaded/
@@ -119,3 +120,198 @@ def test_filesystem_transitions_and_metadata_sync(client, token, app, tmp_path):
     assert meta.get('authoritative_filename') == 'file.stl'
 
 
+
+
+def test_sharded_storage_submit_reshard_and_audit(client, token, app, tmp_path, monkeypatch):
+    import io
+    monkeypatch.setenv('STORAGE_PATH', str(tmp_path))
+    monkeypatch.setenv('METADATA_SIDECAR_MODE', 'mirror')
+    monkeypatch.delenv('STORAGE_SHARDING', raising=False)
+
+    def submit(email):
+        data = {
+            'student_name': 'Shard', 'student_email': email, 'discipline': 'Eng', 'class_number': '1',
+            'printer': 'Prusa', 'color': 'Red', 'material': 'Filament',
+            'file': (io.BytesIO(email.encode()), 'model.stl'),
+        }
+        resp = client.post('/api/v1/submit', data=data, content_type='multipart/form-data')
+        assert resp.status_code == 201
+        body = resp.get_json()
+        with app.app_context():
+            body['file_path'] = db.session.get(Job, body['id']).file_path
+        return body
+
+    flat = submit('flat@example.com')
+    flat_file = Path(flat['file_path'])
+    assert flat_file.parent == tmp_path / 'Uploaded'
+    companion = flat_file.parent / f"Shard_{flat['short_id']}.3mf"
+    companion.write_text('slicer project')
+
+    monkeypatch.setenv('STORAGE_SHARDING', '2')
+    result = app.test_cli_runner().invoke(args=['reshard-storage'])
+    assert result.exit_code == 0, result.output
+    assert 'moved 1 jobs' in result.output
+
+    shard_dir = tmp_path / 'Uploaded' / flat['short_id'][:2]
+    with app.app_context():
+        job = db.session.get(Job, flat['id'])
+        assert Path(job.file_path).parent == shard_dir.resolve()
+        assert Path(job.metadata_path).parent == shard_dir.resolve()
+    assert (shard_dir / companion.name).exists()
+    assert not flat_file.exists() and not companion.exists()
+
+    # Re-running is a no-op; new submissions land directly in their shard
+    assert 'moved 0 jobs' in app.test_cli_runner().invoke(args=['reshard-storage']).output
+    sharded = submit('sharded@example.com')
+    assert Path(sharded['file_path']).parent == tmp_path / 'Uploaded' / sharded['short_id'][:2]
+
+    report = client.get('/api/v1/admin/audit/report?refresh=true',
+                        headers={'Authorization': f'Bearer {token}'}).get_json()
+    issues = {i for b in report['broken_links'] for i in b['issues']}
+    assert not issues & {'file_missing', 'metadata_missing', 'dir_status_mismatch'}
+    assert str((shard_dir / companion.name).resolve()) in report['orphaned_files']
+    assert report['stats']['files'] == 5
+
+
+def test_on_demand_metadata_lives_in_db_until_exported(client, token, app, tmp_path, monkeypatch):
+    monkeypatch.setenv('STORAGE_PATH', str(tmp_path))
+    monkeypatch.setenv('METADATA_SIDECAR_MODE', 'on_demand')
+    headers = {'Authorization': f'Bearer {token}'}
+    file_path, meta_path = _write_initial_files(tmp_path)
+    meta_path.write_text(json.dumps({'status': 'UPLOADED', 'note': 'legacy'}))
+
+    with app.app_context():
+        job = Job(
+            student_name='Test', student_email='test@example.com', discipline='Art',
+            class_number='101', original_filename='file.stl', display_name='file.stl',
+            file_path=str(file_path), metadata_path=str(meta_path), printer='Prusa', color='Red', material='Filament'
+        )
+        db.session.add(job)
+        db.session.commit()
+        job_id = job.id
+    client.post('/api/v1/staff', json={'name': 'Operator'}, headers=headers)
+
+    resp = client.post(
+        f'/api/v1/jobs/{job_id}/approve',
+        json={'staff_name': 'Operator', 'weight_g': 10, 'time_hours': 1, 'authoritative_filename': 'file.stl'},
+        headers=headers,
+    )
+    assert resp.status_code == 200
+    # The sidecar is left alone; the existing one was imported into job_metadata
+    assert json.loads(meta_path.read_text()) == {'status': 'UPLOADED', 'note': 'legacy'}
+    body = client.get(f'/api/v1/jobs/{job_id}/metadata', headers=headers).get_json()
+    assert body['sidecar_mode'] == 'on_demand'
+    assert body['exported_at'] is None
+    assert body['metadata']['note'] == 'legacy'
+    assert body['metadata']['status'] == 'PENDING'
+    assert [h['to'] for h in body['metadata']['authoritative_history']] == ['file.stl']
+
+    # A missing sidecar is expected in this mode
+    meta_path.unlink()
+    report = client.get('/api/v1/admin/audit/report?refresh=true', headers=headers).get_json()
+    issues = [i for b in report['broken_links'] if b['job_id'] == job_id for i in b['issues']]
+    assert 'metadata_missing' not in issues and 'metadata_mismatch' not in issues
+
+    resp = client.post(f'/api/v1/jobs/{job_id}/metadata/export', headers=headers)
+    assert resp.status_code == 200
+    exported = json.loads(meta_path.read_text())
+    assert exported['status'] == 'PENDING'
+    assert exported['authoritative_filename'] == 'file.stl'
+    assert client.get(f'/api/v1/jobs/{job_id}/metadata', headers=headers).get_json()['exported_at']
+
+
+def test_metadata_writes_are_coalesced_and_flushed(client, token, app, tmp_path, monkeypatch):
+    from app.services import metadata_service
+
+    monkeypatch.setenv('STORAGE_PATH', str(tmp_path))
+    monkeypatch.setenv('METADATA_SIDECAR_MODE', 'mirror')
+    monkeypatch.setenv('METADATA_WRITE_DELAY', '60')
+    file_path, meta_path = _write_initial_files(tmp_path)
+    with app.app_context():
+        job = Job(
+            student_name='Test', student_email='test@example.com', discipline='Art',
+            class_number='101', original_filename='file.stl', display_name='file.stl',
+            file_path=str(file_path), metadata_path=str(meta_path), printer='Prusa', color='Red', material='Filament'
+        )
+        db.session.add(job)
+        db.session.commit()
+        for n in range(3):
+            metadata_service.save_metadata(job, {'status': 'UPLOADED', 'revision': n})
+        db.session.commit()
+        job_id = job.id
+
+    # Three updates within the window: nothing written yet, one write pending
+    assert json.loads(meta_path.read_text()) == {'status': 'UPLOADED'}
+    assert metadata_service._writer.pending() == 1
+    assert metadata_service.flush_pending_writes() == 1
+    assert json.loads(meta_path.read_text())['revision'] == 2
+    assert not [p for p in meta_path.parent.iterdir() if p.name.endswith('.tmp')]
+
+    # A status move writes out the queued update first, so nothing lands in the old directory
+    client.post('/api/v1/staff', json={'name': 'Operator'}, headers={'Authorization': f'Bearer {token}'})
+    with app.app_context():
+        job = db.session.get(Job, job_id)
+        metadata_service.save_metadata(job, {'status': 'UPLOADED', 'revision': 3})
+        db.session.commit()
+        token_val = generate_confirmation_token(job_id)
+    assert client.post(f'/api/v1/submit/confirm/{token_val}').status_code == 200
+    metadata_service.flush_pending_writes()
+    assert not meta_path.exists()
+    meta = json.loads((tmp_path / 'ReadyToPrint' / 'file_metadata.json').read_text())
+    assert meta['status'] == 'READYTOPRINT' and meta['revision'] == 3
+
+
+def test_cold_files_are_compressed_and_read_transparently(client, token, app, tmp_path, monkeypatch):
+    import io
+    from datetime import datetime, timedelta
+    from app.routes.jobs import _sync_authoritative_metadata
+    from app.services.file_service import move_authoritative
+
+    monkeypatch.setenv('STORAGE_PATH', str(tmp_path))
+    monkeypatch.setenv('AUDIT_HASH_WORKERS', '1')
+    model = b'solid part\n' + b'facet normal 0 0 1\n outer loop\n  vertex 1 2 3\n endloop\nendfacet\n' * 500
+    data = {
+        'student_name': 'Cold', 'student_email': 'cold@example.com', 'discipline': 'Eng', 'class_number': '1',
+        'printer': 'Prusa', 'color': 'Red', 'material': 'Filament', 'file': (io.BytesIO(model), 'part.stl'),
+    }
+    job_id = client.post('/api/v1/submit', data=data, content_type='multipart/form-data').get_json()['id']
+    with app.app_context():
+        job = db.session.get(Job, job_id)
+        job.status = 'COMPLETED'
+        move_authoritative(job, 'COMPLETED')
+        db.session.commit()
+        _sync_authoritative_metadata(job, Path(job.file_path).name, None, 'JobMarkedComplete')
+        original = Path(job.file_path)
+        # Recently finished jobs are left alone
+        assert 'compressed 0 files' in app.test_cli_runner().invoke(
+            args=['compress-cold-files', '--codec', 'gzip']).output
+        Job.query.filter_by(id=job_id).update({'updated_at': datetime.utcnow() - timedelta(days=60)})
+        db.session.commit()
+
+    result = app.test_cli_runner().invoke(args=['compress-cold-files', '--codec', 'gzip'])
+    assert result.exit_code == 0, result.output
+    assert 'compressed 1 files' in result.output
+    with app.app_context():
+        job = db.session.get(Job, job_id)
+        assert job.file_path == str(original) + '.gz'
+        # Compression does not restart the idle clock archiving and purging use
+        assert job.updated_at < datetime.utcnow() - timedelta(days=59)
+        stored = Path(job.file_path)
+    assert not original.exists() and stored.stat().st_size < len(model) // 5
+
+    headers = {'Authorization': f'Bearer {token}'}
+    resp = client.get(f'/api/v1/jobs/{job_id}/file', headers=headers)
+    assert resp.data == model
+    assert resp.headers['Content-Disposition'].endswith('.stl')
+    # Streamed while decompressing: no ranges, but conditional requests still revalidate
+    assert resp.headers['Accept-Ranges'] == 'none'
+    ranged = client.get(f'/api/v1/jobs/{job_id}/file', headers={**headers, 'Range': 'bytes=0-4'})
+    assert ranged.status_code == 200 and ranged.data == model
+    cached = client.get(f'/api/v1/jobs/{job_id}/file', headers={**headers, 'If-None-Match': resp.headers['ETag']})
+    assert cached.status_code == 304 and cached.data == b''
+    assert client.get(f'/api/v1/jobs/{job_id}/candidate-files', headers=headers).get_json()['files'][0] == stored.name
+
+    report = client.get('/api/v1/admin/audit/report?integrity=true', headers=headers).get_json()
+    assert report['integrity_issues'] == []
+    assert [b['issues'] for b in report['broken_links'] if b['job_id'] == job_id] == []
+    assert 'compressed 0 files' in app.test_cli_runner().invoke(args=['compress-cold-files', '--codec', 'gzip']).output
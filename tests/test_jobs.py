@@ -250,6 +250,46 @@ def test_candidate_files_stub_returns_original_filename(client, token, app):
     assert job.original_filename in data['files']
 
 
+
+def test_candidate_files_uses_directory_index(client, token, app, tmp_path, monkeypatch):
+    from app.services import file_service
+    uploaded = tmp_path / 'Uploaded'
+    uploaded.mkdir()
+    model = uploaded / 'Alice_Filament_Red_abc123.stl'
+    model.write_text('solid')
+    (uploaded / 'Other_Filament_Red_fff999.stl').write_text('solid')
+    (uploaded / 'Alice_Filament_Red_abc123_metadata.json').write_text('{}')
+    # Listings of directories changed within the last second are not trusted; age it
+    os.utime(uploaded, ns=(uploaded.stat().st_atime_ns, uploaded.stat().st_mtime_ns - 5 * 10**9))
+    with app.app_context():
+        job = Job(
+            short_id='abc123', student_name='Alice', student_email='alice@example.com', discipline='Art',
+            class_number='101', original_filename='model.stl', display_name=model.name,
+            file_path=str(model), metadata_path=str(uploaded / 'Alice_Filament_Red_abc123_metadata.json'),
+            printer='Prusa', color='Red', material='Filament'
+        )
+        db.session.add(job)
+        db.session.commit()
+        job_id = job.id
+    headers = {'Authorization': f'Bearer {token}'}
+
+    data = client.get(f'/api/v1/jobs/{job_id}/candidate-files', headers=headers).get_json()
+    assert data['files'] == [model.name, 'model.stl']
+
+    # Unchanged directory: the index is reused rather than rescanned
+    scans = []
+    real_scandir = os.scandir
+    monkeypatch.setattr(file_service.os, 'scandir', lambda d: scans.append(d) or real_scandir(d))
+    client.get(f'/api/v1/jobs/{job_id}/candidate-files', headers=headers)
+    assert scans == []
+
+    # A slicer file dropped next to the model is picked up and ranked first
+    (uploaded / 'abc123_plate.3mf').write_text('project')
+    data = client.get(f'/api/v1/jobs/{job_id}/candidate-files', headers=headers).get_json()
+    assert len(scans) == 1
+    assert data['recommended'] == 'abc123_plate.3mf'
+
+
 def test_reject_job_with_reasons(client, token, app):
     job = create_job(app)
     # Add active staff
@@ -346,4 +386,208 @@ def test_record_payment_moves_file_and_sets_status(client, token, app, tmp_path)
     assert data['status'] == 'PAIDPICKEDUP'
     # File moved to PaidPickedUp
     assert not (tmp_path / 'Completed' / 'file.stl').exists()
-    assert (tmp_path / 'PaidPickedUp' / 'file.stl').exists()
\ No newline at end of file
+    assert (tmp_path / 'PaidPickedUp' / 'file.stl').exists()
+
+def test_download_file_supports_ranges_and_conditional_requests(client, token, app, tmp_path, monkeypatch):
+    monkeypatch.setenv('STORAGE_PATH', str(tmp_path))
+    monkeypatch.delenv('FILE_ACCEL_REDIRECT_PREFIX', raising=False)
+    uploaded = tmp_path / 'Uploaded'
+    uploaded.mkdir()
+    model = uploaded / 'Alice_Filament_Red_abc123.3mf'
+    model.write_bytes(bytes(range(256)) * 4)
+    with app.app_context():
+        job = Job(
+            student_name='Alice', student_email='alice@example.com', discipline='Art',
+            class_number='101', original_filename='model.3mf', display_name=model.name,
+            file_path=str(model), metadata_path=str(uploaded / 'meta.json'),
+            printer='Prusa', color='Red', material='Filament'
+        )
+        db.session.add(job)
+        db.session.commit()
+        job_id = job.id
+    headers = {'Authorization': f'Bearer {token}'}
+
+    full = client.get(f'/api/v1/jobs/{job_id}/file', headers=headers)
+    assert full.status_code == 200
+    assert full.data == model.read_bytes()
+    assert full.headers['Accept-Ranges'] == 'bytes'
+    assert model.name in full.headers['Content-Disposition']
+    etag = full.headers['ETag']
+
+    partial = client.get(f'/api/v1/jobs/{job_id}/file', headers={**headers, 'Range': 'bytes=1000-'})
+    assert partial.status_code == 206
+    assert partial.data == model.read_bytes()[1000:]
+    assert partial.headers['Content-Range'] == 'bytes 1000-1023/1024'
+
+    cached = client.get(f'/api/v1/jobs/{job_id}/file', headers={**headers, 'If-None-Match': etag})
+    assert cached.status_code == 304
+
+    monkeypatch.setenv('FILE_ACCEL_REDIRECT_PREFIX', '/protected-storage/')
+    accel = client.get(f'/api/v1/jobs/{job_id}/file', headers=headers)
+    assert accel.status_code == 200 and accel.data == b''
+    assert accel.headers['X-Accel-Redirect'] == f'/protected-storage/Uploaded/{model.name}'
+
+    model.unlink()
+    assert client.get(f'/api/v1/jobs/{job_id}/file', headers=headers).status_code == 404
+
+
+def test_finished_jobs_are_archived_and_still_readable(client, token, app):
+    from datetime import datetime, timedelta
+    from app.models.archive import EventArchive, JobArchive, PaymentArchive
+    from app.models.event import Event
+    from app.models.job_metadata import JobMetadata
+    from app.models.payment import Payment
+
+    headers = {'Authorization': f'Bearer {token}'}
+    with app.app_context():
+        old = datetime.utcnow() - timedelta(days=400)
+        for job_id, status, updated in (('old-paid', 'PAIDPICKEDUP', old), ('old-open', 'PRINTING', old),
+                                        ('new-paid', 'PAIDPICKEDUP', datetime.utcnow())):
+            db.session.add(Job(id=job_id, student_name='Arch', student_email='arch@example.com', discipline='Art',
+                               class_number='1', original_filename='a.stl', display_name='a.stl',
+                               file_path=f'/tmp/{job_id}.stl', metadata_path=f'/tmp/{job_id}.json', status=status,
+                               printer='Prusa', color='Red', material='PLA'))
+        db.session.add(Event(job_id='old-paid', event_type='JobCreated', triggered_by='x', workstation_id='x'))
+        db.session.add(Payment(job_id='old-paid', grams=10, price_cents=300, txn_no='T1', picked_up_by='Arch',
+                               paid_by_staff='Staff'))
+        db.session.add(JobMetadata(job_id='old-paid', data={'status': 'PAIDPICKEDUP'}))
+        db.session.commit()
+        Job.query.filter(Job.id.in_(['old-paid', 'old-open'])).update({'updated_at': old}, synchronize_session=False)
+        db.session.commit()
+
+    result = app.test_cli_runner().invoke(args=['archive-jobs', '--batch-size', '1'])
+    assert 'Archived 1 jobs, 1 events, 1 payments.' in result.output, result.output
+    with app.app_context():
+        assert {j.id for j in Job.query.all()} == {'old-open', 'new-paid'}
+        assert Event.query.filter_by(job_id='old-paid').count() == 0
+        assert db.session.get(JobMetadata, 'old-paid') is None
+        assert db.session.get(JobArchive, 'old-paid').meta == {'status': 'PAIDPICKEDUP'}
+        assert EventArchive.query.count() == 1 and PaymentArchive.query.count() == 1
+
+    resp = client.get('/api/v1/jobs/old-paid', headers=headers)
+    assert resp.status_code == 404 and resp.get_json()['archive_url'] == '/api/v1/archive/jobs/old-paid'
+    listing = client.get('/api/v1/archive/jobs?status=PAIDPICKEDUP&search=ARCH', headers=headers).get_json()
+    assert listing['total'] == 1 and listing['jobs'][0]['archived'] is True
+    detail = client.get('/api/v1/archive/jobs/old-paid', headers=headers).get_json()
+    assert [e['event_type'] for e in detail['events']] == ['JobCreated']
+    assert detail['payment']['price_cents'] == 300
+    assert len(client.get('/api/v1/analytics/events?include_archived=true', headers=headers).get_json()) == 1
+
+    assert client.post('/api/v1/archive/jobs/old-paid/restore', headers=headers).status_code == 200
+    with app.app_context():
+        job = db.session.get(Job, 'old-paid')
+        assert job.payment.txn_no == 'T1' and job.meta_record.data == {'status': 'PAIDPICKEDUP'}
+        assert [e.event_type for e in job.events] == ['JobCreated', 'JobRestoredFromArchive']
+        assert JobArchive.query.count() == 0 and EventArchive.query.count() == 0
+
+
+def test_purge_deletes_expired_jobs_in_batches_with_their_files(client, token, app, tmp_path, monkeypatch):
+    from datetime import datetime, timedelta
+    from app.models.archive import JobArchive
+    from app.models.event import Event
+    from app.services.archive_service import archive_jobs
+
+    monkeypatch.setenv('STORAGE_PATH', str(tmp_path))
+    monkeypatch.delenv('PURGE_AFTER_DAYS', raising=False)
+    (tmp_path / 'Previews').mkdir()
+    files = {}
+    with app.app_context():
+        for job_id, status in (('purge-a', 'PAIDPICKEDUP'), ('purge-b', 'REJECTED'), ('keep-open', 'PRINTING'),
+                               ('keep-new', 'PAIDPICKEDUP')):
+            model, meta = tmp_path / f'{job_id}.stl', tmp_path / f'{job_id}_metadata.json'
+            model.write_text('solid')
+            meta.write_text('{}')
+            files[job_id] = (model, meta)
+            db.session.add(Job(id=job_id, student_name='Old', student_email='old@example.com', discipline='Art',
+                               class_number='1', original_filename='a.stl', display_name='a.stl',
+                               file_path=str(model), metadata_path=str(meta), status=status,
+                               printer='Prusa', color='Red', material='PLA'))
+            db.session.add(Event(job_id=job_id, event_type='JobCreated', triggered_by='x', workstation_id='x'))
+        (tmp_path / 'Previews' / 'purge-a.thumb.png').write_bytes(b'png')
+        db.session.commit()
+        old = datetime.utcnow() - timedelta(days=400)
+        Job.query.filter(Job.id != 'keep-new').update({'updated_at': old}, synchronize_session=False)
+        db.session.commit()
+    # One expired job lives in the archive
+    with app.app_context():
+        archive_jobs(['purge-b'])
+
+    runner = app.test_cli_runner()
+    assert 'PURGE_AFTER_DAYS' in runner.invoke(args=['purge']).output
+    assert 'Would purge 2 jobs.' in runner.invoke(args=['purge', '--days', '365', '--dry-run']).output
+
+    result = runner.invoke(args=['purge', '--days', '365', '--batch-size', '1'])
+    assert result.exit_code == 0, result.output
+    assert '1/2 jobs' in result.output and 'Purged 2 jobs and 5 files' in result.output
+    with app.app_context():
+        assert {j.id for j in Job.query.all()} == {'keep-open', 'keep-new'}
+        assert JobArchive.query.count() == 0
+        assert {e.job_id for e in Event.query.all()} == {'keep-open', 'keep-new'}
+    for job_id, paths in files.items():
+        assert all(p.exists() for p in paths) == job_id.startswith('keep')
+    assert not (tmp_path / 'Previews' / 'purge-a.thumb.png').exists()
+    # Nothing left to do on a re-run
+    assert 'Purged 0 jobs' in runner.invoke(args=['purge', '--days', '365']).output
+
+
+def test_confirmation_sweep_expires_lapsed_links_and_sends_reminders(client, token, app, tmp_path, monkeypatch):
+    from datetime import datetime, timedelta
+    from app.models.event import Event
+    from app.services import confirmation_service
+
+    monkeypatch.setenv('STORAGE_PATH', str(tmp_path))
+    monkeypatch.delenv('CONFIRM_REMINDER_HOURS', raising=False)
+    reminded = []
+    monkeypatch.setattr(confirmation_service, 'send_confirmation_reminder_email',
+                        lambda job, url: reminded.append((job.id, url)) or True)
+    # Approval syncs the job's metadata (and its sidecar in mirror mode): keep its files in tmp_path
+    with app.app_context():
+        job = Job(student_name='Alice', student_email='alice@example.com', discipline='Art', class_number='101',
+                  original_filename='file.stl', display_name='file.stl', file_path=str(tmp_path / 'file.stl'),
+                  metadata_path=str(tmp_path / 'file_metadata.json'), printer='Prusa', color='Red',
+                  material='Filament')
+        db.session.add(job)
+        db.session.commit()
+    client.post('/api/v1/staff', json={'name': 'Jane Doe'}, headers={'Authorization': f'Bearer {token}'})
+    resp = client.post(f'/api/v1/jobs/{job.id}/approve', json={'staff_name': 'Jane Doe', 'weight_g': 50, 'time_hours': 1},
+                       headers={'Authorization': f'Bearer {token}'})
+    assert resp.status_code == 200
+    now = datetime.utcnow()
+    with app.app_context():
+        approved = db.session.get(Job, job.id)
+        assert approved.confirm_token and approved.confirmation_last_sent_at is not None
+        assert approved.confirm_token_expires - now > timedelta(hours=71)
+        confirm_token = approved.confirm_token
+        # Lapsed link, one about to lapse, one recently approved, one already confirmed
+        approved.confirm_token_expires = now - timedelta(minutes=1)
+        for job_id, status, expires in (('soon', 'PENDING', now + timedelta(hours=2)),
+                                        ('fresh', 'PENDING', now + timedelta(hours=60)),
+                                        ('done', 'READYTOPRINT', now - timedelta(hours=1))):
+            db.session.add(Job(id=job_id, student_name='B', student_email='b@example.com', discipline='Art',
+                               class_number='1', original_filename='a.stl', display_name='a.stl', file_path='p',
+                               metadata_path='m', status=status, printer='Prusa', color='Red', material='PLA',
+                               confirm_token=f'tok-{job_id}', confirm_token_expires=expires,
+                               confirmation_last_sent_at=expires - timedelta(hours=72)))
+        db.session.commit()
+
+    runner = app.test_cli_runner()
+    result = runner.invoke(args=['sweep-confirmations'])
+    assert result.exit_code == 0, result.output
+    assert 'Expired 1 confirmations' in result.output and 'sent 1' in result.output
+    assert [job_id for job_id, _ in reminded] == ['soon'] and reminded[0][1].endswith('/confirm/tok-soon')
+    with app.app_context():
+        assert db.session.get(Job, job.id).is_confirmation_expired is True
+        assert not db.session.get(Job, 'done').is_confirmation_expired
+        assert Event.query.filter_by(job_id=job.id, event_type='ConfirmationExpired').count() == 1
+        assert Event.query.filter_by(job_id='soon', event_type='ConfirmationReminderSent').count() == 1
+    # Re-running neither re-expires nor re-reminds
+    assert 'Expired 0 confirmations' in runner.invoke(args=['sweep-confirmations']).output
+    assert len(reminded) == 1
+
+    assert client.post(f'/api/v1/submit/confirm/{confirm_token}').status_code == 410
+    resp = client.post(f'/api/v1/jobs/{job.id}/resend-confirmation', json={'staff_name': 'Jane Doe'},
+                       headers={'Authorization': f'Bearer {token}'})
+    assert resp.status_code == 200 and resp.get_json()['is_confirmation_expired'] is False
+    with app.app_context():
+        revived = db.session.get(Job, job.id)
+        assert revived.confirm_token_expires > now + timedelta(hours=71)
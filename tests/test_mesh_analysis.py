@@ -0,0 +1,164 @@
+# type: ignore
+import io
+import zipfile
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from app.services import mesh_service  # noqa: E402
+
+# 10 mm cube: 8 corners, 6 quads
+CUBE_V = [(0, 0, 0), (10, 0, 0), (10, 10, 0), (0, 10, 0), (0, 0, 10), (10, 0, 10), (10, 10, 10), (0, 10, 10)]
+CUBE_Q = [(0, 3, 2, 1), (4, 5, 6, 7), (0, 1, 5, 4), (1, 2, 6, 5), (2, 3, 7, 6), (3, 0, 4, 7)]
+CUBE_T = [(q[0], q[k], q[k + 1]) for q in CUBE_Q for k in (1, 2)]
+
+
+def _binary_stl(triangles) -> bytes:
+    records = np.zeros(len(triangles), mesh_service._STL_RECORD)
+    records['vertices'] = triangles
+    return b'\0' * 80 + np.uint32(len(triangles)).tobytes() + records.tobytes()
+
+
+def _cube_files() -> dict:
+    tris = [[CUBE_V[i] for i in t] for t in CUBE_T]
+    ascii_stl = 'solid cube\n' + ''.join(
+        'facet normal 0 0 0\nouter loop\n' + ''.join('vertex %g %g %g\n' % p for p in t) + 'endloop\nendfacet\n'
+        for t in tris
+    ) + 'endsolid cube\n'
+    obj = '\n'.join(['v %g %g %g' % v for v in CUBE_V] + ['f ' + ' '.join(str(i + 1) for i in q) for q in CUBE_Q])
+    model = (
+        '<?xml version="1.0"?><model unit="centimeter" xmlns="http://schemas.microsoft.com/3dmanufacturing/core/2015/02">'
+        '<resources><object id="1"><mesh><vertices>'
+        + ''.join('<vertex x="%g" y="%g" z="%g"/>' % (x / 10, y / 10, z / 10) for x, y, z in CUBE_V)
+        + '</vertices><triangles>'
+        + ''.join('<triangle v1="%d" v2="%d" v3="%d"/>' % t for t in CUBE_T)
+        + '</triangles></mesh></object></resources><build><item objectid="1"/></build></model>'
+    )
+    package = io.BytesIO()
+    with zipfile.ZipFile(package, 'w') as zf:
+        zf.writestr('3D/3dmodel.model', model)
+    return {
+        '.stl': _binary_stl(tris),
+        'ascii.stl': ascii_stl.encode(),
+        '.obj': obj.encode(),
+        '.3mf': package.getvalue(),
+    }
+
+
+def test_mesh_formats_measure_the_same_cube():
+    for name, data in _cube_files().items():
+        result = mesh_service.analyze_file(data, '.' + name.rsplit('.', 1)[-1], 'Filament')
+        assert result['triangles'] == 12 and result['vertices'] == 8, name
+        assert result['volume_mm3'] == pytest.approx(1000.0), name
+        assert result['surface_area_mm2'] == pytest.approx(600.0), name
+        assert result['size_mm'] == [10.0, 10.0, 10.0], name
+        assert result['watertight'] is True, name
+        assert result['estimated_weight_g'] == pytest.approx(1.24 * 0.45, abs=0.05), name
+
+    # An open box (top face removed) is not watertight and gets no weight estimate
+    open_box = [[CUBE_V[i] for i in t] for t in CUBE_T[:2] + CUBE_T[4:]]
+    result = mesh_service.analyze_file(_binary_stl(open_box), '.stl')
+    assert result['watertight'] is False
+    assert result['boundary_edges'] == 4
+    assert result['estimated_weight_g'] is None
+
+    with pytest.raises(mesh_service.MeshError):
+        mesh_service.analyze_file(b'not a mesh', '.stl')
+
+
+def test_3mf_rejects_oversized_model_parts_before_inflating(monkeypatch):
+    # 64 MB of zeros compresses to ~64 KB: a small upload that would inflate in the worker
+    bomb = io.BytesIO()
+    with zipfile.ZipFile(bomb, 'w', zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr('3D/3dmodel.model', b'\0' * (64 * 1024 ** 2))
+    assert len(bomb.getvalue()) < 1024 ** 2
+    monkeypatch.setenv('MESH_3MF_MAX_PART_MB', '16')
+    with pytest.raises(mesh_service.MeshError, match='too large'):
+        mesh_service.parse_3mf(bomb.getvalue())
+    # The cube package is far below the limit
+    assert mesh_service.parse_3mf(_cube_files()['.3mf']).shape == (12, 3, 3)
+
+
+def test_submit_analyzes_mesh_and_staff_can_rerun(client, token, tmp_path, monkeypatch):
+    monkeypatch.setenv('STORAGE_PATH', str(tmp_path))
+    data = {
+        'student_name': 'Mesh', 'student_email': 'mesh@example.com', 'discipline': 'Eng',
+        'class_number': '101', 'printer': 'Prusa', 'color': 'Blue', 'material': 'Resin',
+        'file': (io.BytesIO(_cube_files()['.stl']), 'cube.stl'),
+    }
+    resp = client.post('/api/v1/submit', data=data, content_type='multipart/form-data')
+    assert resp.status_code == 201
+    job_id = resp.get_json()['id']
+
+    headers = {'Authorization': f'Bearer {token}'}
+    analysis = client.get(f'/api/v1/jobs/{job_id}', headers=headers).get_json()['analysis']
+    assert analysis['format'] == 'stl' and analysis['watertight'] is True
+    assert analysis['volume_mm3'] == pytest.approx(1000.0)
+    assert analysis['estimated_weight_g'] == pytest.approx(1.1, abs=0.05)
+
+    resp = client.post(f'/api/v1/jobs/{job_id}/analyze', headers=headers)
+    assert resp.status_code == 200
+    assert resp.get_json()['triangles'] == 12
+
+
+def test_previews_are_generated_and_served_with_long_cache(client, token, tmp_path, monkeypatch):
+    import struct
+    from app.services import preview_service
+
+    monkeypatch.setenv('STORAGE_PATH', str(tmp_path))
+    monkeypatch.setenv('PREVIEW_THUMBNAIL_SIZE', '64')
+    data = {
+        'student_name': 'Preview', 'student_email': 'preview@example.com', 'discipline': 'Eng',
+        'class_number': '101', 'printer': 'Prusa', 'color': 'Blue', 'material': 'Filament',
+        'file': (io.BytesIO(_cube_files()['.obj']), 'cube.obj'),
+    }
+    resp = client.post('/api/v1/submit', data=data, content_type='multipart/form-data')
+    assert resp.status_code == 201
+    job_id = resp.get_json()['id']
+    headers = {'Authorization': f'Bearer {token}'}
+    version = client.get(f'/api/v1/jobs/{job_id}', headers=headers).get_json()['analysis']['preview']['version']
+
+    resp = client.get(f'/api/v1/jobs/{job_id}/preview/thumbnail.png?v={version}', headers=headers)
+    assert resp.status_code == 200
+    assert resp.mimetype == 'image/png'
+    assert resp.data.startswith(b'\x89PNG\r\n\x1a\n')
+    assert struct.unpack('>II', resp.data[16:24]) == (64, 64)
+    assert 'immutable' in resp.headers['Cache-Control']
+    resp = client.get(f'/api/v1/jobs/{job_id}/preview/thumbnail.png?v={version}',
+                      headers={**headers, 'If-None-Match': f'"{version}"'})
+    assert resp.status_code == 304
+    # Without the current version the response must be revalidated
+    resp = client.get(f'/api/v1/jobs/{job_id}/preview/thumbnail.png', headers=headers)
+    assert 'no-cache' in resp.headers['Cache-Control']
+
+    mesh = client.get(f'/api/v1/jobs/{job_id}/preview/mesh.bin?v={version}', headers=headers).data
+    assert mesh[:4] == preview_service.MESH_MAGIC
+    _, flags, vertices, triangles = struct.unpack('<HHII', mesh[4:16])
+    assert (flags, vertices, triangles) == (0, 8, 12)
+    assert struct.unpack('<6f', mesh[16:40]) == (0.0, 0.0, 0.0, 10.0, 10.0, 10.0)
+    assert len(mesh) == 40 + 8 * 6 + 12 * 3 * 2
+
+    assert client.delete(f'/api/v1/jobs/{job_id}', headers=headers).status_code == 204
+    assert not any((tmp_path / preview_service.PREVIEW_DIRNAME).iterdir())
+
+
+def test_decimate_keeps_large_meshes_within_budget():
+    from app.services import preview_service
+
+    # Finely tessellated 40 mm square plate, top face only: 2 * 200 * 200 triangles
+    n = 200
+    xs = np.linspace(0, 40, n + 1)
+    grid = np.stack(np.meshgrid(xs, xs, indexing='ij'), axis=-1)
+    a, b, c, d = grid[:-1, :-1], grid[1:, :-1], grid[1:, 1:], grid[:-1, 1:]
+    quads = np.stack([a, b, c, d], axis=2).reshape(-1, 4, 2)
+    flat = np.concatenate([quads[:, [0, 1, 2]], quads[:, [0, 2, 3]]])
+    triangles = np.concatenate([flat, np.zeros(flat.shape[:2] + (1,))], axis=2)
+
+    vertices, faces = preview_service.decimate(triangles, 5000)
+    assert 0 < len(faces) <= 5000
+    assert vertices.min(axis=0)[:2] == pytest.approx([0, 0], abs=1.0)
+    assert vertices.max(axis=0)[:2] == pytest.approx([40, 40], abs=1.0)
+    # Cluster means pull the rim in by about half a cell; the plate still covers most of its area
+    tri = vertices[faces]
+    area = np.linalg.norm(np.cross(tri[:, 1] - tri[:, 0], tri[:, 2] - tri[:, 0]), axis=1).sum() / 2
+    assert area == pytest.approx(1600, rel=0.1)
@@ -0,0 +1,77 @@
+# type: ignore
+from datetime import datetime, timedelta
+from app import db
+from app.models.job import Job
+from app.services.schedule_service import plan_printer
+
+
+def _queued(job_id, hours, material='PLA', color='Red', age_h=0):
+    return {'id': job_id, 'material': material, 'color': color, 'hours': hours,
+            'created_at': datetime(2026, 1, 1) + timedelta(hours=age_h)}
+
+
+def test_plan_batches_filament_and_orders_shortest_first():
+    queued = [_queued('red-long', 4), _queued('blue', 1, color='Blue'), _queued('red-short', 1),
+              _queued('red-mid', 2)]
+    plan = plan_printer(1, [], queued, swap=0.25)
+    order = [j['id'] for j in plan['units'][0]['jobs']]
+    # Blue (mean 1h) before red (mean 2.33h); reds stay together, shortest first
+    assert order == ['blue', 'red-short', 'red-mid', 'red-long']
+    assert plan['swaps'] == 1 and plan['makespan_hours'] == 8.25
+
+    # Two units, one still busy: a swap is taken only when it starts the job sooner than waiting
+    # for a unit already loaded with its filament
+    running = [{'id': 'printing', 'material': 'PLA', 'color': 'Blue', 'remaining': 0.5}]
+    plan = plan_printer(2, running, queued, swap=0.25)
+    units = {u['unit']: [j['id'] for j in u['jobs']] for u in plan['units']}
+    assert units[1] == ['printing', 'red-short', 'red-long'] and units[2] == ['blue', 'red-mid']
+    assert plan['swaps'] == 2 and plan['makespan_hours'] == 5.75
+    # A unit already loaded with the filament wins when it frees up before a swap would finish
+    running = [{'id': 'red-printing', 'material': 'PLA', 'color': 'Red', 'remaining': 0.5},
+               {'id': 'blue-printing', 'material': 'PLA', 'color': 'Blue', 'remaining': 0.4}]
+    plan = plan_printer(2, running, [_queued('red', 1)], swap=0.25)
+    assert [j['id'] for j in plan['units'][1]['jobs']] == ['red-printing', 'red']
+    assert plan['swaps'] == 0 and plan['mean_wait_hours'] == 0.5
+
+
+def test_plan_scales_to_thousands_of_jobs():
+    queued = [_queued(f'j{i}', 0.5 + (i * 7) % 13, color=('Red', 'Blue', 'White', 'Black')[i % 4], age_h=i)
+              for i in range(5000)]
+    plan = plan_printer(4, [], queued, swap=0.25)
+    assert plan['queued'] == 5000
+    assert sum(len(u['jobs']) for u in plan['units']) == 5000
+    # Batching keeps swaps near one per filament group per unit
+    assert plan['swaps'] <= 4 * 4
+
+
+def test_queue_endpoint_plans_per_printer_and_replans_only_changed_models(client, token, app, monkeypatch):
+    monkeypatch.setenv('PRINTER_UNITS', 'Prusa MK4S=2')
+    headers = {'Authorization': f'Bearer {token}'}
+    with app.app_context():
+        for job_id, printer, color, hours in (('a', 'Prusa MK4S', 'Red', 3), ('b', 'Prusa MK4S', 'Blue', 1),
+                                              ('c', 'Prusa MK4S', 'Red', 2), ('x', 'Prusa XL', 'Red', None)):
+            db.session.add(Job(id=job_id, student_name='S', student_email='s@example.com', discipline='Art',
+                               class_number='1', original_filename='a.stl', display_name=f'{job_id}.stl',
+                               file_path='p', metadata_path='m', status='READYTOPRINT', printer=printer,
+                               color=color, material='PLA', time_hours=hours))
+        db.session.commit()
+
+    data = client.get('/api/v1/queue', headers=headers).get_json()
+    assert data['replanned'] == ['Prusa MK4S', 'Prusa XL']
+    mk4s, xl = data['printers']
+    assert mk4s['unit_count'] == 2 and mk4s['queued'] == 3 and mk4s['swaps'] == 1
+    assert [[j['id'] for j in u['jobs']] for u in mk4s['units']] == [['b', 'a'], ['c']]
+    assert xl['unit_count'] == 1 and xl['units'][0]['jobs'][0]['estimated'] is True
+    assert xl['units'][0]['jobs'][0]['start'] and xl['units'][0]['jobs'][0]['end']
+
+    # Unchanged: served from the cached plan; a change on one model re-plans only that model
+    assert client.get('/api/v1/queue', headers=headers).get_json()['replanned'] == []
+    with app.app_context():
+        db.session.get(Job, 'x').status = 'PRINTING'
+        db.session.commit()
+    data = client.get('/api/v1/queue', headers=headers).get_json()
+    assert data['replanned'] == ['Prusa XL']
+    assert data['printers'][1]['queued'] == 0 and data['printers'][1]['units'][0]['jobs'][0]['running'] is True
+
+    data = client.get('/api/v1/queue?printer=Prusa%20MK4S', headers=headers).get_json()
+    assert [p['printer'] for p in data['printers']] == ['Prusa MK4S']
@@ -0,0 +1,34 @@
+# type: ignore
+from app import create_app, db
+
+
+def test_confirm_endpoint_is_rate_limited(app, client):
+    app.config['CONFIRM_RATE_LIMIT'] = '2 per minute'
+    codes = [client.post('/api/v1/submit/confirm/not-a-token').status_code for _ in range(3)]
+    assert codes == [400, 400, 429]
+
+
+def test_submit_endpoint_is_rate_limited(app, client):
+    app.config['SUBMIT_RATE_LIMIT'] = '1 per minute'
+    data = {'student_name': 'Dana'}
+    assert client.post('/api/v1/submit', data=data, content_type='multipart/form-data').status_code == 400
+    assert client.post('/api/v1/submit', data=data, content_type='multipart/form-data').status_code == 429
+
+
+def test_unreachable_redis_falls_back_to_memory(monkeypatch):
+    monkeypatch.setenv('DATABASE_URL', 'sqlite:///:memory:')
+    monkeypatch.setenv('RATELIMIT_STORAGE_URI', 'redis://127.0.0.1:1/0')
+    monkeypatch.setenv('RATELIMIT_STRATEGY', 'moving-window')
+    app = create_app()
+    app.config['TESTING'] = True
+    app.config['LOGIN_RATE_LIMIT'] = '2 per minute'
+    with app.app_context():
+        db.create_all()
+    try:
+        client = app.test_client()
+        creds = {'workstation_id': 'front-desk', 'password': 'password123'}
+        codes = [client.post('/api/v1/auth/login', json=creds).status_code for _ in range(3)]
+        assert codes == [200, 200, 429]
+    finally:
+        with app.app_context():
+            db.drop_all()
@@ -0,0 +1,44 @@
+# type: ignore
+from app import db
+from app.models.staff import Staff
+from app.services.staff_service import get_active_staff, invalidate_staff_cache
+
+
+def _names(client, token):
+    resp = client.get('/api/v1/staff', headers={'Authorization': f'Bearer {token}'})
+    assert resp.status_code == 200
+    return [s['name'] for s in resp.get_json()['staff']]
+
+
+def test_staff_list_reflects_add_and_deactivate(client, token):
+    assert _names(client, token) == []
+    client.post('/api/v1/staff', json={'name': 'Operator'}, headers={'Authorization': f'Bearer {token}'})
+    assert _names(client, token) == ['Operator']
+    client.patch('/api/v1/staff/Operator', json={'is_active': False}, headers={'Authorization': f'Bearer {token}'})
+    assert _names(client, token) == []
+    # Inactive members are still listed on request
+    resp = client.get('/api/v1/staff?include_inactive=true', headers={'Authorization': f'Bearer {token}'})
+    assert [s['name'] for s in resp.get_json()['staff']] == ['Operator']
+
+
+def test_staff_cache_serves_reads_until_invalidated(app):
+    app.config['STAFF_CACHE_TTL'] = 3600
+    with app.app_context():
+        db.session.add(Staff(name='Cached'))
+        db.session.commit()
+        assert 'Cached' in get_active_staff()
+        # A write that bypasses the routes (e.g. another process) is not seen yet
+        db.session.add(Staff(name='Direct'))
+        db.session.commit()
+        assert 'Direct' not in get_active_staff()
+        invalidate_staff_cache()
+        assert 'Direct' in get_active_staff()
+
+
+def test_staff_cache_reloads_after_ttl_without_shared_version(app):
+    app.config['STAFF_CACHE_TTL'] = 0
+    with app.app_context():
+        assert get_active_staff() == {}
+        db.session.add(Staff(name='Later'))
+        db.session.commit()
+        assert 'Later' in get_active_staff()
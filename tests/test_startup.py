@@ -0,0 +1,31 @@
+# type: ignore
+import os
+import subprocess
+import sys
+from app import create_app
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+# Cold start (interpreter + imports + create_app) must stay within this budget
+COLD_START_BUDGET_MS = float(os.environ.get('COLD_START_BUDGET_MS', 3000))
+
+
+def test_create_app_does_not_connect_to_database(monkeypatch, tmp_path):
+    # Parent directory does not exist, so any connection attempt would fail
+    monkeypatch.setenv('DATABASE_URL', f'sqlite:///{tmp_path}/missing/dir/app.db')
+    app = create_app()
+    timings = app.extensions['startup_timings']
+    assert set(timings) == {'config_ms', 'extensions_ms', 'blueprints_ms', 'total_ms'}
+    assert not (tmp_path / 'missing').exists()
+
+
+def test_cold_start_within_budget(tmp_path):
+    code = (
+        'import time; t = time.perf_counter(); '
+        'from app import create_app; app = create_app(); '
+        'print((time.perf_counter() - t) * 1000)'
+    )
+    env = dict(os.environ, DATABASE_URL=f'sqlite:///{tmp_path}/app.db')
+    out = subprocess.run([sys.executable, '-c', code], cwd=BACKEND_DIR, env=env,
+                         capture_output=True, text=True, check=True)
+    elapsed_ms = float(out.stdout.strip().splitlines()[-1])
+    assert elapsed_ms < COLD_START_BUDGET_MS, f'cold start took {elapsed_ms:.0f} ms'
@@ -0,0 +1,92 @@
+# type: ignore
+import io
+import os
+from pathlib import Path
+from app.services import storage_backend
+from app.services.storage_backend import DirectoryObjectClient, ObjectStorage
+
+
+def test_object_storage_multipart_upload_and_server_side_copy(tmp_path, monkeypatch):
+    client = DirectoryObjectClient(tmp_path / 'objects')
+    root = tmp_path / 'storage'
+    store = ObjectStorage(client, 'fablab', root, part_size=5 * 1024 ** 2, multipart_threshold=1024)
+    data = os.urandom(11 * 1024 ** 2)
+
+    store.write(root / 'Uploaded' / 'big.3mf', io.BytesIO(data))
+    assert client.calls['upload_part'] == 3 and client.calls['complete_multipart_upload'] == 1
+    assert store.read(root / 'Uploaded' / 'big.3mf') == data
+    assert not (tmp_path / 'objects' / '.multipart').exists() or not any((tmp_path / 'objects' / '.multipart').iterdir())
+
+    store.move(root / 'Uploaded' / 'big.3mf', root / 'Printing' / 'big.3mf')
+    assert client.calls['copy_object'] == 1 and client.calls.get('get_object') == 1  # only the read above
+    assert not store.exists(root / 'Uploaded' / 'big.3mf')
+    assert store.listdir(root / 'Printing') == {'big.3mf': store.stat(root / 'Printing' / 'big.3mf')}
+
+    # Above the single-request copy limit the copy is assembled from ranged part copies
+    monkeypatch.setattr(storage_backend, 'MAX_SINGLE_COPY', 1024)
+    store.copy(root / 'Printing' / 'big.3mf', root / 'Completed' / 'big.3mf')
+    assert client.calls['upload_part_copy'] == 3
+    assert store.read(root / 'Completed' / 'big.3mf') == data
+    assert store.stat(root / 'Missing' / 'x.stl') is None
+
+
+def test_object_backend_end_to_end(client, token, app, tmp_path, monkeypatch):
+    from app import db
+    from app.models.job import Job
+    from app.services.token_service import generate_confirmation_token
+    monkeypatch.setenv('STORAGE_PATH', str(tmp_path / 'storage'))
+    monkeypatch.setenv('STORAGE_BACKEND', 's3')
+    monkeypatch.setenv('OBJECT_STORE_DIR', str(tmp_path / 'objects'))
+    monkeypatch.setenv('METADATA_SIDECAR_MODE', 'mirror')
+    headers = {'Authorization': f'Bearer {token}'}
+    bucket = tmp_path / 'objects' / 'fablab'
+
+    data = {
+        'student_name': 'Obj', 'student_email': 'obj@example.com', 'discipline': 'Eng', 'class_number': '1',
+        'printer': 'Prusa', 'color': 'Red', 'material': 'Filament',
+        'file': (io.BytesIO(b'solid object'), 'model.stl'),
+    }
+    job = client.post('/api/v1/submit', data=data, content_type='multipart/form-data').get_json()
+    stored = bucket / 'Uploaded' / job['display_name']
+    assert stored.read_bytes() == b'solid object'
+    assert not (tmp_path / 'storage').exists()
+
+    files = client.get(f"/api/v1/jobs/{job['id']}/candidate-files", headers=headers).get_json()['files']
+    assert files[0] == job['display_name']
+
+    client.post('/api/v1/staff', json={'name': 'Operator'}, headers=headers)
+    resp = client.post(f"/api/v1/jobs/{job['id']}/approve", headers=headers, json={
+        'staff_name': 'Operator', 'weight_g': 10, 'time_hours': 1, 'authoritative_filename': job['display_name'],
+    })
+    assert resp.status_code == 200
+    with app.app_context():
+        confirm = generate_confirmation_token(job['id'])
+    assert client.post(f'/api/v1/submit/confirm/{confirm}').status_code == 200
+
+    moved = bucket / 'ReadyToPrint' / job['display_name']
+    assert moved.read_bytes() == b'solid object' and not stored.exists()
+    assert app.extensions['storage_backend'][1].client.calls['copy_object'] == 2
+    with app.app_context():
+        assert Path(db.session.get(Job, job['id']).file_path).parent.name == 'ReadyToPrint'
+
+    report = client.get('/api/v1/admin/audit/report?refresh=true&integrity=true', headers=headers).get_json()
+    assert report['broken_links'] == [] and report['integrity_issues'] == []
+    assert report['orphaned_files'] == []
+
+    download = client.get(f"/api/v1/jobs/{job['id']}/file", headers=headers)
+    assert download.status_code == 200 and download.data == b'solid object'
+
+    usage = client.get('/api/v1/admin/storage/usage', headers=headers).get_json()
+    assert usage['source'] == 'object_store' and usage['total_files'] == 2
+
+
+def test_incomplete_backend_fails_at_construction():
+    import pytest
+
+    class ReadOnly(storage_backend.StorageBackend):
+        def read(self, path):
+            return b''
+
+    with pytest.raises(TypeError, match='abstract'):
+        ReadOnly()
+    storage_backend.LocalStorage()
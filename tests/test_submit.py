@@ -56,4 +56,100 @@ def test_submit_duplicate(client):
     # Duplicate submission - recreate file stream to avoid closed file
     data['file'] = (io.BytesIO(b'dupe data'), 'dup.stl')
     resp2 = client.post('/api/v1/submit', data=data, content_type='multipart/form-data')
-    assert resp2.status_code == 409
\ No newline at end of file
+    assert resp2.status_code == 409
+
+def test_submit_async_accepts_then_worker_files_the_job(app, client, tmp_path, monkeypatch):
+    from app.services import submission_service
+
+    monkeypatch.setenv('STORAGE_PATH', str(tmp_path))
+    monkeypatch.setenv('SUBMIT_ASYNC', 'true')
+    queued = []
+    monkeypatch.setattr('app.routes.submit.get_queue', lambda name: object())
+    monkeypatch.setattr('app.routes.submit.queue_submission', lambda sub: queued.append(sub.id) or True)
+
+    def form():
+        return {
+            'student_name': 'Grace', 'student_email': 'grace@example.com', 'discipline': 'Eng',
+            'class_number': '505', 'printer': 'Prusa', 'color': 'Blue', 'material': 'Filament',
+            'file': (io.BytesIO(b'solid async'), 'model.stl'),
+        }
+
+    resp = client.post('/api/v1/submit', data=form(), content_type='multipart/form-data')
+    assert resp.status_code == 202
+    body = resp.get_json()
+    assert queued == [body['id']] and body['status'] == 'QUEUED'
+    # Only the raw upload exists until the worker runs
+    assert [p.name for p in (tmp_path / 'Incoming').iterdir()] == [f"{body['id']}.stl"]
+    assert not (tmp_path / 'Uploaded').exists()
+    assert client.get(body['status_url']).get_json()['status'] == 'QUEUED'
+
+    with app.app_context():
+        assert submission_service.process_submission(body['id']).status == 'DONE'
+        # Re-running a finished submission is a no-op
+        assert submission_service.process_submission(body['id']).status == 'DONE'
+    status = client.get(body['status_url']).get_json()
+    assert status['job']['id'] == body['id'] and status['job']['status'] == 'UPLOADED'
+    assert not any((tmp_path / 'Incoming').iterdir())
+    assert len(list((tmp_path / 'Uploaded').glob('Grace_*.stl'))) == 1
+
+    # The same file again is accepted, then found to be a duplicate by the worker
+    resp = client.post('/api/v1/submit', data=form(), content_type='multipart/form-data')
+    second = resp.get_json()['id']
+    with app.app_context():
+        assert submission_service.process_submission(second).status == 'DUPLICATE'
+    status = client.get(f'/api/v1/submit/status/{second}').get_json()
+    assert status['existing_job_id'] == body['id']
+    assert client.get('/api/v1/submit/status/unknown').status_code == 404
+
+    # Without a worker queue the upload takes the synchronous path and is written once
+    monkeypatch.undo()
+    monkeypatch.setenv('STORAGE_PATH', str(tmp_path))
+    monkeypatch.setenv('SUBMIT_ASYNC', 'true')
+    data = form()
+    data['file'] = (io.BytesIO(b'solid inline'), 'model.stl')
+    resp = client.post('/api/v1/submit', data=data, content_type='multipart/form-data')
+    assert resp.status_code == 201 and resp.get_json()['student_name'] == 'Grace'
+    assert not any((tmp_path / 'Incoming').iterdir())
+
+
+def test_submissions_are_claimed_once_and_failures_keep_the_upload(app, client, tmp_path, monkeypatch):
+    from datetime import datetime, timedelta
+    from app import db
+    from app.models.submission import Submission
+    from app.services import submission_service
+
+    monkeypatch.setenv('STORAGE_PATH', str(tmp_path))
+    form = {'student_name': 'Ada', 'student_email': 'ada@example.com', 'discipline': 'Eng', 'class_number': '1',
+            'printer': 'Prusa', 'color': 'Red', 'material': 'Filament'}
+    with app.app_context():
+        sub = submission_service.accept_submission(form, 'part.stl', b'solid claimed')
+        incoming = tmp_path / 'Incoming' / f'{sub.id}.stl'
+        # Another worker holds it: neither the RQ task nor the recovery command touches it yet
+        assert submission_service.claim_submission(sub.id)
+        assert not submission_service.claim_submission(sub.id)
+        assert submission_service.process_submission(sub.id).status == 'PROCESSING'
+        assert submission_service.process_submission(sub.id, reclaim_after=timedelta(minutes=10)).status == 'PROCESSING'
+        assert incoming.exists()
+
+        # A failed commit moves the placed upload back and leaves no job file behind
+        Submission.query.filter_by(id=sub.id).update({'updated_at': datetime.utcnow() - timedelta(hours=1)})
+        db.session.commit()
+        real_commit = db.session.commit
+        calls = []
+
+        def failing_commit():
+            calls.append(1)
+            if len(calls) == 2:
+                raise RuntimeError('database went away')
+            return real_commit()
+
+        with monkeypatch.context() as patched:
+            patched.setattr(db.session, 'commit', failing_commit)
+            result = submission_service.process_submission(sub.id, reclaim_after=timedelta(minutes=10))
+        assert result.status == 'FAILED' and 'went away' in result.error
+        assert incoming.exists()
+        assert not list((tmp_path / 'Uploaded').glob('*.stl'))
+
+        # The retry files it
+        assert submission_service.process_submission(sub.id).status == 'DONE'
+        assert not incoming.exists() and len(list((tmp_path / 'Uploaded').glob('Ada_*.stl'))) == 1